@@ -0,0 +1,275 @@
+"""
+Accrual module for the Account Management System.
+
+This module runs periodic interest and fee postings over every account
+of the `data` store, as one batch job instead of millions of calls to
+`operations.credit`. A rate schedule picks, for each account, the tier
+matching its balance; the account is then posted its interest for the
+period minus the tier fee:
+
+    schedule = [accrual.Tier(0, "0", 500), accrual.Tier(100000, "0.001")]
+    accrual.run(schedule, "accrual-2024-06.ckpt")
+
+Interest is computed with int arithmetic and rounds exactly like
+`(balance * rate).quantize(Decimal("0.01"))` (half-even). A posting that
+would leave a balance below zero is rejected, as `debit` would reject it.
+
+The store is walked in chunks of slots. Each chunk is computed and posted
+atomically (see `data.post_chunk_cents`) and made durable with one
+commit, so memory stays flat whatever the number of accounts. With a
+checkpoint file, the job saves its progress after every chunk and, just
+before posting one, the balances it is about to post to. A run that is
+interrupted, even by a crash between posting a chunk and saving its
+progress, resumes where it stopped and posts every account exactly once.
+Once complete, the checkpoint is kept and marked done, so running the
+same period again posts nothing; use one checkpoint file per period.
+"""
+
+import json
+import os
+import time
+from bisect import bisect_right
+from decimal import Decimal
+from typing import NamedTuple
+
+import data
+
+CHUNK_SIZE = 10000
+"""
+Number of accounts posted per chunk.
+"""
+
+
+class Tier(NamedTuple):
+    """
+    One tier of a rate schedule.
+    Attributes:
+        minimum (int): Lowest balance, in cents, the tier applies to.
+        rate (Decimal | str): Interest for the period, as a fraction of the balance.
+        fee (int): Fee for the period, in cents.
+    """
+    minimum: int
+    rate: Decimal | str = Decimal(0)
+    fee: int = 0
+
+
+class AccrualStats(NamedTuple):
+    """
+    Summary of an accrual run, including the chunks posted before a resume.
+    Attributes:
+        accounts (int): Number of accounts processed.
+        posted (int): Number of postings applied.
+        rejected (int): Number of postings rejected for insufficient funds.
+        credited (int): Total of the applied credits, in cents.
+        debited (int): Total of the applied debits, in cents.
+        seconds (float): Wall-clock duration of this call.
+    """
+    accounts: int
+    posted: int
+    rejected: int
+    credited: int
+    debited: int
+    seconds: float
+
+
+class Schedule:
+    """
+    Rate schedule: turns a balance into the amount posted for the period.
+    """
+
+    def __init__(self, tiers):
+        """
+        Create a schedule.
+        Args:
+            tiers (Iterable[Tier]): The tiers, in any order. Balances below the
+                                    lowest minimum are posted nothing.
+        Raises:
+            ValueError: If there is no tier, two tiers share a minimum, or a rate
+                        is not a finite number.
+        """
+        tiers = sorted(Tier(t.minimum, Decimal(t.rate), t.fee) for t in tiers)
+        if not tiers:
+            raise ValueError("A schedule needs at least one tier.")
+        if any(a.minimum == b.minimum for a, b in zip(tiers, tiers[1:])):
+            raise ValueError("Tiers must have distinct minimums.")
+        if not all(t.rate.is_finite() for t in tiers):
+            raise ValueError("Rates must be finite numbers.")
+        self.tiers = tiers
+        self._minimums = [t.minimum for t in tiers]
+        self._terms = [t.rate.as_integer_ratio() + (t.fee,) for t in tiers]
+
+    def fingerprint(self) -> list:
+        """
+        Return the schedule as JSON-serializable data, to tell schedules apart.
+        """
+        return [[t.minimum, str(t.rate), t.fee] for t in self.tiers]
+
+    def postings(self, balances) -> list[int]:
+        """
+        Return the amount posted to every balance: its interest minus the fee.
+        Args:
+            balances (Sequence[int]): The balances, in cents.
+        Returns:
+            list[int]: The signed posting of every balance, in cents.
+        """
+        minimums = self._minimums
+        terms = self._terms
+        out = []
+        for cents in balances:
+            tier = bisect_right(minimums, cents) - 1
+            if tier < 0:
+                out.append(0)
+                continue
+            numerator, denominator, fee = terms[tier]
+            # A Decimal rate is an exact ratio of ints, so the only rounding
+            # is this division: half to even, as `quantize` rounds by default.
+            interest, remainder = divmod(cents * numerator, denominator)
+            twice = 2 * remainder
+            if twice > denominator or (twice == denominator and interest & 1):
+                interest += 1
+            out.append(interest - fee)
+        return out
+
+
+def _save(path: str, state: dict) -> None:
+    """
+    Atomically and durably replace the checkpoint file.
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(json.dumps(state))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _load(path: str | None, schedule: Schedule) -> dict:
+    """
+    Return the saved state of a run, or the state of a new one.
+    Raises:
+        ValueError: If the checkpoint was written by a run with another schedule.
+    """
+    totals = {"accounts": 0, "posted": 0, "rejected": 0, "credited": 0, "debited": 0}
+    state = {"schedule": schedule.fingerprint(), "next": 0, "totals": totals,
+             "pending": None, "done": False}
+    if path is None or not os.path.exists(path):
+        return state
+    with open(path, encoding="utf-8") as f:
+        saved = json.load(f)
+    if saved["schedule"] != state["schedule"]:
+        raise ValueError(f"Checkpoint {path} belongs to a run with another schedule.")
+    return saved
+
+
+def _resume_postings(before: list[int], planned: list[int], start: int):
+    """
+    Return the postings function repeating an interrupted chunk: accounts
+    still holding their saved balance are posted, those already posted are not.
+    Args:
+        before (list[int]): The balances saved before the chunk was posted.
+        planned (list[int]): The postings computed from them.
+        start (int): The first slot of the chunk.
+    """
+    def postings(balances):
+        if len(balances) < len(before):
+            raise ValueError("Accounts were removed since the interrupted run.")
+        out = []
+        for i, (old, posting) in enumerate(zip(before, planned)):
+            cents = balances[i]
+            if cents == old:
+                out.append(posting)
+            elif cents == old + posting:
+                out.append(0)
+            else:
+                raise ValueError(f"Slot {start + i} changed since the interrupted run; "
+                                 "cannot tell whether it was posted.")
+        return out
+
+    return postings
+
+
+def _add(totals: dict, balances, planned: list[int]) -> None:
+    """
+    Count the postings of one chunk into the run totals.
+    """
+    for cents, posting in zip(balances, planned):
+        if not posting:
+            continue
+        # One posting per account: it bounces exactly when a debit would
+        # take the balance below zero (`post_chunk_cents` with floor=0).
+        if posting < 0 and cents + posting < 0:
+            totals["rejected"] += 1
+            continue
+        totals["posted"] += 1
+        if posting > 0:
+            totals["credited"] += posting
+        else:
+            totals["debited"] -= posting
+    totals["accounts"] += len(balances)
+
+
+def run(schedule, checkpoint: str | None = None, chunk_size: int = CHUNK_SIZE) -> AccrualStats:
+    """
+    Post a rate schedule to every account of the store, chunk by chunk.
+    Accounts opened while the job runs are posted if the job has not
+    yet passed their slot.
+    Args:
+        schedule (Schedule | Iterable[Tier]): The rate schedule.
+        checkpoint (str | None): The checkpoint file. When given, an
+                                 interrupted run with it resumes where it stopped.
+        chunk_size (int): Number of accounts posted per chunk.
+    Returns:
+        AccrualStats: Counts and totals of the whole run.
+    Raises:
+        ValueError: If the checkpoint belongs to another schedule or cannot
+                    be resumed, or a backend holds the balances.
+    """
+    if not isinstance(schedule, Schedule):
+        schedule = Schedule(schedule)
+    started = time.perf_counter()
+    state = _load(checkpoint, schedule)
+    while not state["done"]:
+        start = state["next"]
+        pending = state["pending"]
+        if pending is None:
+            stop = start + chunk_size
+            planned = []
+
+            def postings(balances):
+                if checkpoint is not None:
+                    _save(checkpoint, dict(state, pending={"before": balances.tolist()}))
+                planned.extend(schedule.postings(balances))
+                return planned
+        else:
+            stop = start + len(pending["before"])
+            planned = schedule.postings(pending["before"])
+            postings = _resume_postings(pending["before"], planned, start)
+        balances, _ = data.post_chunk_cents(start, stop, postings, floor=0)
+        data.commit()
+        if pending is not None:
+            balances = pending["before"]
+        _add(state["totals"], balances, planned)
+        state["next"] = start + len(balances)
+        state["pending"] = None
+        state["done"] = not len(balances)
+        if checkpoint is not None:
+            _save(checkpoint, state)
+    return AccrualStats(seconds=time.perf_counter() - started, **state["totals"])
+
+
+def parse_tier(text: str) -> Tier:
+    """
+    Parse a tier given on the command line as "MINIMUM:RATE[:FEE]", in
+    amounts (not cents), e.g. "1000:0.001" or "0:0:5.00".
+    Raises:
+        ValueError: If the text is not such a tier.
+    """
+    parts = text.split(":")
+    if len(parts) not in (2, 3):
+        raise ValueError(f"Invalid tier {text!r}; expected MINIMUM:RATE[:FEE].")
+    try:
+        minimum, rate = data.to_cents(Decimal(parts[0])), Decimal(parts[1])
+        fee = data.to_cents(Decimal(parts[2])) if len(parts) == 3 else 0
+    except (ArithmeticError, ValueError):
+        raise ValueError(f"Invalid tier {text!r}; expected MINIMUM:RATE[:FEE].") from None
+    return Tier(minimum, rate, fee)
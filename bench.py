@@ -0,0 +1,469 @@
+"""
+Benchmark suite for the Account Management System.
+
+This script times the hot paths of the `operations` and `data` modules,
+both one operation at a time and on bulk workloads, and reports the
+cost per operation. Results can be saved as JSON and compared against a
+saved baseline, so regressions show up before a release:
+
+    python3 bench.py --save baseline.json
+    python3 bench.py --compare baseline.json --threshold 0.10
+
+Every benchmark resets the store first, so runs are reproducible.
+
+`--startup` also times one-shot `main.py` invocations in fresh
+interpreters, and fails when `main.py total` adds more than
+`STARTUP_BUDGET_MS` to bare interpreter startup. The test suite checks
+instead that it imports no optional subsystem, which does not depend on
+how busy the machine is.
+"""
+
+import builtins
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from decimal import Decimal
+from typing import Callable, NamedTuple
+
+import amounts
+import data
+import operations
+
+BULK_SIZE = 10000
+"""
+Number of records in every bulk workload.
+"""
+
+
+class Benchmark(NamedTuple):
+    """
+    A benchmark definition.
+    Attributes:
+        name (str): Unique benchmark name.
+        setup (Callable[[], Callable[[], None]]): Prepares the store and returns
+                                                  the function to time.
+        ops (int): Number of operations performed by one call of that function.
+        answer (str | None): For interactive operations, the reply given to every
+                             input() prompt; printed output is discarded.
+    """
+    name: str
+    setup: Callable[[], Callable[[], None]]
+    ops: int
+    answer: str | None = None
+
+
+class _Sink(io.TextIOBase):
+    """
+    Text stream that discards everything written to it.
+    """
+
+    def write(self, s: str) -> int:
+        return len(s)
+
+
+@contextlib.contextmanager
+def _console(answer: str | None):
+    """
+    Answer every input() prompt with `answer` and discard printed output.
+    Does nothing if `answer` is None.
+    """
+    if answer is None:
+        yield
+        return
+    real_input = builtins.input
+    builtins.input = lambda prompt="": answer
+    try:
+        with contextlib.redirect_stdout(_Sink()):
+            yield
+    finally:
+        builtins.input = real_input
+
+
+def _fresh_store(accounts: int = 1000) -> list[str]:
+    """
+    Reset the store and open `accounts` accounts with 1000.00 each.
+    Returns:
+        list[str]: The account ids.
+    """
+    data.reset()
+    ids = [f"ACC{i:07d}" for i in range(accounts)]
+    for account_id in ids:
+        data.write_cents(100000, account_id)
+    return ids
+
+
+def _records(ids: list[str], n: int) -> list[tuple]:
+    """
+    Build a deterministic mixed workload of CREDIT/DEBIT/TOTAL records.
+    """
+    kinds = ("CREDIT", "DEBIT", "TOTAL", "DEBIT")
+    return [(kinds[i % 4], ids[(i * 7919) % len(ids)], f"{i % 5000 / 100 + 0.01:.2f}")
+            for i in range(n)]
+
+
+def _setup_parse_amount():
+    return lambda: operations._parse_amount("amount: ")
+
+
+def _setup_credit():
+    _fresh_store()
+    return operations.credit
+
+
+def _setup_debit():
+    _fresh_store()
+    data.write_cents(10 ** 15)
+    return operations.debit
+
+
+def _setup_execute_dispatch():
+    _fresh_store()
+    return lambda: operations.execute(" total ")
+
+
+def _setup_validate_amount():
+    return lambda: operations.validate_amount("123.45")
+
+
+def _setup_parse_cents():
+    return lambda: operations.parse_cents("123.45")
+
+
+def _setup_strict_amount():
+    return lambda: amounts.parse(b"123.45")
+
+
+def _setup_decimal_amount():
+    return lambda: Decimal("123.45")
+
+
+def _amount_column() -> list[bytes]:
+    return [f"{i % 500000 / 100 + 0.01:.2f}".encode() for i in range(BULK_SIZE)]
+
+
+def _setup_bulk_strict_amounts():
+    column = _amount_column()
+    return lambda: amounts.parse_column(column)
+
+
+def _setup_bulk_decimal_amounts():
+    column = [v.decode() for v in _amount_column()]
+    return lambda: [Decimal(v) for v in column]
+
+
+def _setup_read_balance():
+    ids = _fresh_store()
+    account_id = ids[500]
+    return lambda: data.read_balance(account_id)
+
+
+def _setup_read_balance_cached():
+    ids = _fresh_store()
+    account_id = ids[500]
+    data.enable_cache(len(ids))
+    return lambda: data.read_balance(account_id)
+
+
+def _setup_write_balance():
+    ids = _fresh_store()
+    account_id = ids[500]
+    amount = Decimal("123.45")
+    return lambda: data.write_balance(amount, account_id)
+
+
+def _setup_apply():
+    ids = _fresh_store()
+    account_id = ids[500]
+    return lambda: operations.apply("CREDIT", account_id, "1.00")
+
+
+def _setup_bulk_apply_batch():
+    ids = _fresh_store()
+    records = _records(ids, BULK_SIZE)
+    return lambda: operations.apply_batch(records)
+
+
+def _setup_bulk_apply_batch_cents():
+    ids = _fresh_store()
+    records = _records(ids, BULK_SIZE)
+    return lambda: operations.apply_batch_cents(records)
+
+
+def _setup_bulk_settle_cents():
+    ids = _fresh_store()
+    slots = data.account_slots(ids[(i * 7919) % len(ids)] for i in range(BULK_SIZE))
+    deltas = [(i % 5000 + 1) * (-1 if i % 2 else 1) for i in range(BULK_SIZE)]
+    return lambda: operations.settle_cents(slots, deltas)
+
+
+def _setup_bulk_read_balance():
+    ids = _fresh_store(BULK_SIZE)
+    read = data.read_balance
+    return lambda: [read(account_id) for account_id in ids]
+
+
+def _setup_bulk_write_balance():
+    ids = _fresh_store(BULK_SIZE)
+    amount = Decimal("5.00")
+    write = data.write_balance
+    return lambda: [write(amount, account_id) for account_id in ids]
+
+
+def _setup_bulk_new_accounts():
+    data.reset()
+    counter = iter(range(10 ** 12))
+    write = data.write_cents
+
+    def run():
+        base = next(counter) * BULK_SIZE
+        for i in range(BULK_SIZE):
+            write(100, f"NEW{base + i}")
+    return run
+
+
+BENCHMARKS = [
+    Benchmark("single.parse_amount", _setup_parse_amount, 1, "123.45"),
+    Benchmark("single.credit", _setup_credit, 1, "1.00"),
+    Benchmark("single.debit", _setup_debit, 1, "1.00"),
+    Benchmark("single.execute_dispatch", _setup_execute_dispatch, 1, ""),
+    Benchmark("single.validate_amount", _setup_validate_amount, 1),
+    Benchmark("single.parse_cents", _setup_parse_cents, 1),
+    Benchmark("single.strict_amount", _setup_strict_amount, 1),
+    Benchmark("single.decimal_amount", _setup_decimal_amount, 1),
+    Benchmark("single.read_balance", _setup_read_balance, 1),
+    Benchmark("single.read_balance_cached", _setup_read_balance_cached, 1),
+    Benchmark("single.write_balance", _setup_write_balance, 1),
+    Benchmark("single.apply", _setup_apply, 1),
+    Benchmark("bulk.apply_batch", _setup_bulk_apply_batch, BULK_SIZE),
+    Benchmark("bulk.apply_batch_cents", _setup_bulk_apply_batch_cents, BULK_SIZE),
+    Benchmark("bulk.settle_cents", _setup_bulk_settle_cents, BULK_SIZE),
+    Benchmark("bulk.read_balance", _setup_bulk_read_balance, BULK_SIZE),
+    Benchmark("bulk.write_balance", _setup_bulk_write_balance, BULK_SIZE),
+    Benchmark("bulk.new_accounts", _setup_bulk_new_accounts, BULK_SIZE),
+    Benchmark("bulk.strict_amounts", _setup_bulk_strict_amounts, BULK_SIZE),
+    Benchmark("bulk.decimal_amounts", _setup_bulk_decimal_amounts, BULK_SIZE),
+]
+
+SPEEDUPS = {
+    "single.strict_amount": "single.decimal_amount",
+    "bulk.strict_amounts": "bulk.decimal_amounts",
+}
+"""
+Benchmarks reported as a speedup over a reference benchmark of the same
+run: the strict amount parser against bare `Decimal(...)` conversions.
+The goal was several times the speed of `Decimal`; it is not met, since
+one `parse` call is about 2-3x slower and a uniform column only about
+1.5x faster, so the report records the measured ratios instead.
+"""
+
+
+STARTUP = {
+    "startup.interpreter": ["-c", "pass"],
+    "startup.total": ["main.py", "total"],
+}
+"""
+Command lines timed by `run_startup`, as interpreter arguments.
+"""
+
+STARTUP_BUDGET_MS = 30.0
+"""
+Most milliseconds `main.py total` may add to bare interpreter startup.
+"""
+
+
+def run_startup(repeat: int = 10) -> dict:
+    """
+    Time the `STARTUP` command lines, each in a fresh interpreter.
+    Args:
+        repeat (int): Number of runs of each command line; the best is reported.
+    Returns:
+        dict: One entry per command line, shaped like `run_benchmark` results
+              (one operation is one process run).
+    """
+    results = {}
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    for name, args in STARTUP.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, *args], cwd=cwd, check=True,
+                           stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        results[name] = {
+            "ns_per_op": best * 1e9,
+            "median_ns_per_op": statistics.median(timings) * 1e9,
+            "ops_per_s": 1 / best,
+            "loops": repeat,
+        }
+    return results
+
+
+def startup_overhead_ms(results: dict) -> float:
+    """
+    Return how many milliseconds `main.py total` adds to bare interpreter startup.
+    Args:
+        results (dict): Results of `run_startup`.
+    """
+    return (results["startup.total"]["ns_per_op"] - results["startup.interpreter"]["ns_per_op"]) / 1e6
+
+
+def run_benchmark(bench: Benchmark, repeat: int = 5, min_time: float = 0.05) -> dict:
+    """
+    Time one benchmark.
+    The function is called in loops long enough to last `min_time`, and
+    the loop is repeated `repeat` times; the best and median loop are reported.
+    Args:
+        bench (Benchmark): The benchmark to run.
+        repeat (int): Number of timed loops.
+        min_time (float): Minimum duration of one loop, in seconds.
+    Returns:
+        dict: {"ns_per_op": best, "median_ns_per_op": median, "ops_per_s": ..., "loops": ...}.
+    """
+    fn = bench.setup()
+    with _console(bench.answer):
+        fn()
+        loops = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time or loops >= 1 << 20:
+                break
+            loops *= 2
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            timings.append((time.perf_counter() - start) / (loops * bench.ops))
+    data.disable_cache()
+    data.reset()
+    best = min(timings)
+    return {
+        "ns_per_op": best * 1e9,
+        "median_ns_per_op": statistics.median(timings) * 1e9,
+        "ops_per_s": 1 / best if best > 0 else 0.0,
+        "loops": loops,
+    }
+
+
+def run_all(name_filter: str = "", repeat: int = 5, min_time: float = 0.05) -> dict:
+    """
+    Run every benchmark whose name contains `name_filter`.
+    Returns:
+        dict: Machine-readable report with environment details and one entry per benchmark.
+    """
+    results = {}
+    for bench in BENCHMARKS:
+        if name_filter in bench.name:
+            results[bench.name] = run_benchmark(bench, repeat, min_time)
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "results": results,
+        "speedups": speedups(results),
+    }
+
+
+def speedups(results: dict) -> dict:
+    """
+    Return the speedup of every `SPEEDUPS` benchmark over its reference.
+    Args:
+        results (dict): The "results" entry of a report.
+    Returns:
+        dict: Reference ns/op divided by ns/op (above 1 when faster), for the
+              benchmarks that ran along with their reference.
+    """
+    return {name: results[reference]["ns_per_op"] / results[name]["ns_per_op"]
+            for name, reference in SPEEDUPS.items() if name in results and reference in results}
+
+
+def compare(report: dict, baseline: dict, threshold: float = 0.10) -> list[str]:
+    """
+    Find benchmarks that got slower than a baseline.
+    Args:
+        report (dict): The current report, as returned by `run_all`.
+        baseline (dict): A previously saved report.
+        threshold (float): Allowed slowdown, as a fraction (0.10 = 10%).
+    Returns:
+        list[str]: One message per regression; empty if there is none.
+    """
+    regressions = []
+    for name, result in report["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        ratio = result["ns_per_op"] / before["ns_per_op"]
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{name}: {before['ns_per_op']:.0f} -> {result['ns_per_op']:.0f} ns/op "
+                f"(+{(ratio - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Run the benchmark suite from the command line.
+    Args:
+        argv (list[str] | None): Command-line arguments (defaults to sys.argv).
+    Returns:
+        int: 0 on success, 1 if a regression was found against the baseline
+             or startup is over budget.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the account operations hot paths.")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="timed loops per benchmark (default: 5)")
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per timed loop (default: 0.05)")
+    parser.add_argument("--save", metavar="PATH", help="write the JSON report to this file")
+    parser.add_argument("--compare", metavar="PATH", help="baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed slowdown against the baseline (default: 0.10)")
+    parser.add_argument("--json", action="store_true", help="print the JSON report instead of a table")
+    parser.add_argument("--startup", action="store_true",
+                        help=f"also time CLI startup and fail above {STARTUP_BUDGET_MS:g} ms of overhead")
+    args = parser.parse_args(argv)
+
+    report = run_all(args.filter, args.repeat, args.min_time)
+    over_budget = False
+    if args.startup:
+        startup = run_startup(max(args.repeat, 10))
+        report["results"].update(startup)
+        overhead = startup_overhead_ms(startup)
+        over_budget = overhead > STARTUP_BUDGET_MS
+        if over_budget:
+            print(f"STARTUP OVER BUDGET main.py total: +{overhead:.1f} ms "
+                  f"(budget {STARTUP_BUDGET_MS:g} ms)", file=sys.stderr)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for name, result in report["results"].items():
+            print(f"{name:32} {result['ns_per_op']:12.0f} ns/op {result['ops_per_s']:14.0f} ops/s")
+        for name, ratio in report["speedups"].items():
+            print(f"{name:32} {ratio:12.2f}x {SPEEDUPS[name]}")
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        return 1 if regressions or over_budget else 0
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
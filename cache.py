@@ -0,0 +1,109 @@
+"""
+Cache module for the Account Management System.
+
+This module provides the LRU cache that `data` can put in front of the
+balance store (see `data.enable_cache`). Balance enquiries that hit the
+cache cost one dictionary lookup, whatever backs the store; writers
+invalidate the entry of every account they change, so a cached balance
+is never stale.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class BalanceCache:
+    """
+    Bounded least-recently-used map from account id to balance in cents,
+    with hit, miss and eviction counters.
+    Lookups take no lock, so under heavy thread contention the hit and
+    miss counters may undercount slightly; the cached balances are exact.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Create an empty cache.
+        Args:
+            capacity (int): Most balances held at once.
+        Raises:
+            ValueError: If the capacity is not positive.
+        """
+        if capacity <= 0:
+            raise ValueError("Cache capacity must be positive.")
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """
+        Return the number of cached balances.
+        """
+        return len(self._entries)
+
+    def get(self, account_id: str) -> int | None:
+        """
+        Look up a balance and mark it as recently used.
+        Args:
+            account_id (str): The account identifier.
+        Returns:
+            int | None: The cached balance in cents, or None on a miss.
+        """
+        # Lock-free: each dict operation is atomic, and an entry evicted
+        # between the two calls simply counts as a miss.
+        try:
+            cents = self._entries[account_id]
+            self._entries.move_to_end(account_id)
+        except KeyError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return cents
+
+    def put(self, account_id: str, cents: int) -> None:
+        """
+        Cache a balance, evicting the least recently used one if full.
+        Args:
+            account_id (str): The account identifier.
+            cents (int): The balance in cents.
+        """
+        with self._lock:
+            self._entries[account_id] = cents
+            self._entries.move_to_end(account_id)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, account_id: str) -> None:
+        """
+        Drop the cached balance of an account, if any.
+        Args:
+            account_id (str): The account identifier.
+        """
+        self._entries.pop(account_id, None)
+
+    def clear(self) -> None:
+        """
+        Drop every cached balance. The counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Return the cache counters.
+        Returns:
+            dict: {"hits", "misses", "evictions", "size", "capacity", "hit_rate"}.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
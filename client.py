@@ -0,0 +1,191 @@
+"""
+Network client module for the Account Management System.
+
+This module talks to the `server` module's line protocol and includes
+a local load generator for benchmarking:
+
+    python3 main.py serve --port 7070
+    python3 client.py --port 7070 --connections 100 --requests 10000 --depth 32
+"""
+
+import asyncio
+import random
+import time
+from typing import NamedTuple
+
+
+class Client:
+    """
+    Connection to an account server, with support for pipelined requests.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Wrap an open connection. Use `Client.connect` to create one.
+        """
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect(cls, host: str = "127.0.0.1", port: int = 7070) -> "Client":
+        """
+        Open a connection to a server.
+        Args:
+            host (str): The server address.
+            port (int): The server port.
+        Returns:
+            Client: The connected client.
+        """
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def pipeline(self, requests: list[str]) -> list[str]:
+        """
+        Send several requests at once, then read their responses.
+        Args:
+            requests (list[str]): Request lines, without newlines (e.g. "CREDIT A 1.00").
+        Returns:
+            list[str]: The response lines, in request order (e.g. "OK 1.00").
+        Raises:
+            ConnectionError: If the server closes the connection early.
+        """
+        self._writer.write("".join(f"{r}\n" for r in requests).encode())
+        await self._writer.drain()
+        responses = []
+        for _ in requests:
+            line = await self._reader.readline()
+            if not line:
+                raise ConnectionError("Server closed the connection.")
+            responses.append(line.decode().rstrip("\n"))
+        return responses
+
+    async def request(self, request: str) -> str:
+        """
+        Send one request and wait for its response.
+        Args:
+            request (str): The request line, without newline.
+        Returns:
+            str: The response line.
+        """
+        return (await self.pipeline([request]))[0]
+
+    async def close(self) -> None:
+        """
+        Close the connection.
+        """
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+class LoadReport(NamedTuple):
+    """
+    Outcome of a load-generation run.
+    Attributes:
+        requests (int): Number of requests answered.
+        errors (int): Number of ERR responses.
+        seconds (float): Wall-clock duration of the run.
+        latencies (list[float]): Round-trip time of every pipelined window, in seconds.
+    """
+    requests: int
+    errors: int
+    seconds: float
+    latencies: list[float]
+
+    @property
+    def rate(self) -> float:
+        """
+        Throughput in requests per second.
+        """
+        return self.requests / self.seconds if self.seconds > 0 else 0.0
+
+    def percentile(self, p: float) -> float:
+        """
+        Return a window latency percentile, in seconds.
+        Args:
+            p (float): The percentile, between 0 and 100.
+        """
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def _random_request(rng: random.Random, accounts: int) -> str:
+    """
+    Build a random TOTAL/CREDIT/DEBIT request line.
+    """
+    account = f"ACC{rng.randrange(accounts)}"
+    op = rng.choice(("TOTAL", "CREDIT", "DEBIT"))
+    if op == "TOTAL":
+        return f"TOTAL {account}"
+    return f"{op} {account} {rng.randrange(1, 10000) / 100:.2f}"
+
+
+async def run_load(host: str, port: int, connections: int = 10, requests: int = 1000,
+                   depth: int = 16, accounts: int = 1000, seed: int = 0) -> LoadReport:
+    """
+    Drive a server with concurrent connections sending pipelined random requests.
+    Args:
+        host (str): The server address.
+        port (int): The server port.
+        connections (int): Number of concurrent connections.
+        requests (int): Requests sent by each connection.
+        depth (int): Requests per pipelined window.
+        accounts (int): Number of distinct accounts targeted.
+        seed (int): Seed of the request generator.
+    Returns:
+        LoadReport: Counts, duration and window latencies.
+    """
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker(n: int) -> None:
+        nonlocal errors
+        rng = random.Random(seed * 100003 + n)
+        client = await Client.connect(host, port)
+        try:
+            left = requests
+            while left > 0:
+                window = [_random_request(rng, accounts) for _ in range(min(depth, left))]
+                start = time.perf_counter()
+                responses = await client.pipeline(window)
+                latencies.append(time.perf_counter() - start)
+                errors += sum(1 for r in responses if r.startswith("ERR"))
+                left -= len(window)
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(connections)))
+    return LoadReport(connections * requests, errors, time.perf_counter() - start, latencies)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Run the load generator from the command line and print a summary.
+    Args:
+        argv (list[str] | None): Command-line arguments (defaults to sys.argv).
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load generator for the account server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7070)
+    parser.add_argument("--connections", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per connection")
+    parser.add_argument("--depth", type=int, default=16, help="pipelined requests per window")
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_load(args.host, args.port, args.connections, args.requests,
+                                  args.depth, args.accounts, args.seed))
+    print(
+        f"{report.requests} requests ({report.errors} errors) in {report.seconds:.2f}s "
+        f"({report.rate:.0f} requests/s); window latency "
+        f"p50={report.percentile(50) * 1000:.2f}ms p99={report.percentile(99) * 1000:.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+"""
+Columnar balance file module for the Account Management System.
+
+This module keeps a memory-mapped copy of the balance store for readers
+in other processes, such as reporting jobs, which scan it in place
+instead of calling `data.read_balance` once per account (see
+`data.open_balance_file`):
+
+    reader = columnar.Reader("balances.col")
+    reader.summary()                     # count, total, overdrawn, min, max
+    ids, cents, versions = reader.arrays()   # NumPy views, no copy
+
+The file holds one row per store slot, in three fixed-width columns:
+the account id (UTF-8, NUL-padded to the id width), the balance in cents
+(int64) and the version of the row (int64, the number of writes to the
+account since the store was loaded). Each column is contiguous and
+8-byte aligned after a 64-byte header, so a column is read as a
+`memoryview` or a NumPy array straight from the mapping, with no copy
+and no parsing.
+
+The writer is the `data` module: it appends a row for every new account
+and updates the cents, then the version, of a row on every write. The
+row count in the header is raised only once the new row is filled.
+Readers take no lock. A scan sees every row as of some moment during
+the scan, not one point in time for all rows; read a row's version
+before and after its cents to tell whether it changed meanwhile.
+
+The file is created with spare rows and, when they run out, the writer
+copies it to a larger file which replaces the old one, and then marks
+the old one stale. The same happens when the store is reloaded as a
+whole, for instance from a snapshot, except that versions start again
+from 0. Every new file has a generation one higher than the file it
+replaces. `Reader.refresh` follows a replaced file.
+
+The file is a derived copy for reading, not a durable store: the writer
+never syncs it to disk, and `data.open_balance_file` rewrites it from
+the store.
+"""
+
+import mmap
+import os
+import struct
+from array import array
+from typing import NamedTuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b"BALCOL01"
+"""
+First bytes of a columnar balance file.
+"""
+
+ID_WIDTH = 32
+"""
+Default width of the account id column, in bytes.
+"""
+
+HEADER_SIZE = 64
+_HEADER = struct.Struct("<8s5q")
+"""
+Magic, id width, capacity, row count, generation and stale flag.
+"""
+_COUNT = 3
+_STALE = 5
+_MIN_CAPACITY = 1024
+
+
+class Summary(NamedTuple):
+    """
+    Aggregates of every balance in a file.
+    Attributes:
+        accounts (int): Number of accounts.
+        total (int): Sum of the balances, in cents.
+        overdrawn (int): Number of balances below zero.
+        minimum (int): Lowest balance, in cents (0 without accounts).
+        maximum (int): Highest balance, in cents (0 without accounts).
+    """
+    accounts: int
+    total: int
+    overdrawn: int
+    minimum: int
+    maximum: int
+
+
+def _offsets(capacity: int) -> tuple[int, int, int]:
+    """
+    Return the offsets of the cents, versions and ids columns for a capacity.
+    """
+    cents = HEADER_SIZE
+    versions = cents + 8 * capacity
+    return cents, versions, versions + 8 * capacity
+
+
+def _size(capacity: int, width: int) -> int:
+    """
+    Return the size of a file of `capacity` rows (the id column ends the file).
+    """
+    return _offsets(capacity)[2] + width * capacity
+
+
+def _encode(account_id: str, width: int) -> bytes:
+    """
+    Encode an account id for the id column.
+    Raises:
+        ValueError: If the id does not fit the column or contains NUL.
+    """
+    raw = account_id.encode("utf-8")
+    if len(raw) > width or b"\0" in raw:
+        raise ValueError(f"Account id {account_id!r} does not fit a {width}-byte id column.")
+    return raw.ljust(width, b"\0")
+
+
+def _create(path: str, width: int, capacity: int, generation: int, ids: bytes,
+            cents: bytes, versions: bytes | None) -> None:
+    """
+    Write a new file to a temporary path and move it over `path`.
+    Args:
+        ids (bytes): The encoded id column of the rows.
+        cents (bytes): The cents column of the rows.
+        versions (bytes | None): The versions column of the rows, or None for zeros.
+    """
+    count = len(cents) // 8
+    cents_at, versions_at, ids_at = _offsets(capacity)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.truncate(_size(capacity, width))
+        f.write(_HEADER.pack(MAGIC, width, capacity, count, generation, 0))
+        f.seek(cents_at)
+        f.write(cents)
+        if versions is not None:
+            f.seek(versions_at)
+            f.write(versions)
+        f.seek(ids_at)
+        f.write(ids)
+    os.replace(tmp, path)
+
+
+class _Mapping:
+    """
+    An open file and its column views.
+    """
+
+    def __init__(self, path: str, writable: bool):
+        with open(path, "r+b" if writable else "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        header = _HEADER.unpack_from(self.map) if len(self.map) >= HEADER_SIZE else (b"", 0, 0, 0, 0, 0)
+        magic, self.width, self.capacity, _, self.generation, _ = header
+        if magic != MAGIC or len(self.map) < _size(self.capacity, self.width):
+            self.map.close()
+            raise ValueError(f"{path} is not a columnar balance file.")
+        cents_at, versions_at, ids_at = _offsets(self.capacity)
+        view = memoryview(self.map)
+        self.header = view[:HEADER_SIZE].cast("q")
+        self.cents = view[cents_at:versions_at].cast("q")
+        self.versions = view[versions_at:ids_at].cast("q")
+        self.ids = view[ids_at:ids_at + self.width * self.capacity]
+
+    def close(self) -> None:
+        try:
+            for view in (self.header, self.cents, self.versions, self.ids):
+                view.release()
+            self.map.close()
+        except BufferError:
+            # Arrays handed out by `Reader.arrays` still use the mapping;
+            # it is unmapped when the last one is dropped.
+            pass
+
+
+class Writer:
+    """
+    Keeps a columnar balance file in sync with a store, one row per slot.
+    Callers serialize writes to a row and row appends, and pause every
+    writer around `grow` and `load`.
+    """
+
+    def __init__(self, path: str, account_ids, cents, width: int = ID_WIDTH):
+        """
+        Create (or replace) the file with the given rows.
+        Args:
+            path (str): The file path.
+            account_ids (Sequence[str]): The account id of every slot.
+            cents (Sequence[int]): The balance of every slot, in cents.
+            width (int): Width of the account id column, in bytes.
+        Raises:
+            ValueError: If an account id does not fit the id column.
+        """
+        self.path = path
+        self._width = width
+        try:
+            # Readers of a previous file at this path are sent to the new one.
+            self._map = _Mapping(path, writable=True)
+            self._generation = self._map.generation
+        except (OSError, ValueError):
+            self._map = None
+            self._generation = 0
+        self.load(account_ids, cents)
+
+    def _replace(self, capacity: int, ids: bytes, cents: bytes, versions: bytes | None) -> None:
+        """
+        Move to a new file with the given rows, and mark the old one stale.
+        """
+        self._generation += 1
+        _create(self.path, self._width, capacity, self._generation, ids, cents, versions)
+        old = self._map
+        self._map = _Mapping(self.path, writable=True)
+        self._cents = self._map.cents
+        self._versions = self._map.versions
+        if old is not None:
+            old.header[_STALE] = 1
+            old.close()
+
+    def load(self, account_ids, cents) -> None:
+        """
+        Replace every row, after the whole store was replaced.
+        Args:
+            account_ids (Sequence[str]): The account id of every slot.
+            cents (Sequence[int]): The balance of every slot, in cents.
+        Raises:
+            ValueError: If an account id does not fit the id column.
+        """
+        ids = b"".join(_encode(account_id, self._width) for account_id in account_ids)
+        column = array("q", cents).tobytes()
+        self._replace(max(_MIN_CAPACITY, 2 * len(account_ids)), ids, column, None)
+
+    def fits(self, account_id: str) -> bool:
+        """
+        Return True if an account id fits the id column (see `append`).
+        """
+        raw = account_id.encode("utf-8")
+        return len(raw) <= self._width and b"\0" not in raw
+
+    @property
+    def full(self) -> bool:
+        """
+        True when every row is used and the next `append` needs `grow` first.
+        """
+        return self._map.header[_COUNT] == self._map.capacity
+
+    def grow(self) -> None:
+        """
+        Move to a file with twice the rows. Writes to the old file made
+        meanwhile would be lost, so the caller pauses every writer.
+        """
+        m = self._map
+        count = m.header[_COUNT]
+        self._replace(2 * m.capacity, m.ids[:self._width * count].tobytes(),
+                      m.cents[:count].tobytes(), m.versions[:count].tobytes())
+
+    def append(self, account_id: str, cents: int = 0) -> None:
+        """
+        Add a row for a new account, in the next slot.
+        Raises:
+            ValueError: If the account id does not fit the id column.
+            IndexError: If the file is full (see `grow`).
+        """
+        raw = _encode(account_id, self._width)
+        m = self._map
+        count = m.header[_COUNT]
+        if count == m.capacity:
+            raise IndexError("The balance file is full; grow it first.")
+        m.ids[count * self._width:(count + 1) * self._width] = raw
+        m.cents[count] = cents
+        m.header[_COUNT] = count + 1
+
+    def set(self, slot: int, cents: int) -> None:
+        """
+        Update the balance of a row and bump its version.
+        Args:
+            slot (int): The slot of the account.
+            cents (int): The new balance, in cents.
+        """
+        self._cents[slot] = cents
+        self._versions[slot] += 1
+
+    def close(self) -> None:
+        """
+        Unmap the file. It is left on disk for readers.
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+class Reader:
+    """
+    Read-only, zero-copy view of a columnar balance file, for any process.
+    """
+
+    def __init__(self, path: str):
+        """
+        Map a file.
+        Args:
+            path (str): The file path.
+        Raises:
+            ValueError: If the file is not a columnar balance file.
+        """
+        self.path = path
+        self._map = _Mapping(path, writable=False)
+
+    @property
+    def generation(self) -> int:
+        """
+        Generation of the mapped file; a replacement file has a higher one.
+        """
+        return self._map.generation
+
+    def refresh(self) -> bool:
+        """
+        Map the file that replaced the mapped one, if the writer replaced it.
+        Returns:
+            bool: True if a new file was mapped.
+        """
+        if not self._map.header[_STALE]:
+            return False
+        old = self._map
+        self._map = _Mapping(self.path, writable=False)
+        old.close()
+        return True
+
+    def __len__(self) -> int:
+        """
+        Return the number of accounts.
+        """
+        return self._map.header[_COUNT]
+
+    def cents(self) -> memoryview:
+        """
+        Return the balances column, in cents, as a memoryview of int64 over the mapping.
+        """
+        return self._map.cents[:len(self)]
+
+    def versions(self) -> memoryview:
+        """
+        Return the versions column as a memoryview of int64 over the mapping.
+        """
+        return self._map.versions[:len(self)]
+
+    def account_id(self, row: int) -> str:
+        """
+        Return the account id of a row.
+        """
+        if not 0 <= row < len(self):
+            raise IndexError("row out of range")
+        width = self._map.width
+        return bytes(self._map.ids[row * width:(row + 1) * width]).rstrip(b"\0").decode("utf-8")
+
+    def arrays(self):
+        """
+        Return the columns as NumPy arrays over the mapping, without copying.
+        Returns:
+            tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]: The account ids
+            (fixed-width bytes), the balances in cents and the versions.
+        Raises:
+            RuntimeError: If NumPy is not installed.
+        """
+        if numpy is None:
+            raise RuntimeError("NumPy is not installed.")
+        m = self._map
+        n = len(self)
+        return (numpy.frombuffer(m.ids, dtype=f"S{m.width}", count=n),
+                numpy.frombuffer(m.cents, dtype=numpy.int64, count=n),
+                numpy.frombuffer(m.versions, dtype=numpy.int64, count=n))
+
+    def summary(self) -> Summary:
+        """
+        Aggregate every balance in one pass over the cents column.
+        """
+        cents = self.cents()
+        if not len(cents):
+            return Summary(0, 0, 0, 0, 0)
+        if numpy is not None:
+            column = numpy.frombuffer(cents, dtype=numpy.int64)
+            low, high = int(column.min()), int(column.max())
+            if max(-low, high) * len(column) < 2 ** 63:
+                total = int(column.sum())
+            else:
+                # The int64 sum could overflow: add the high and low 32-bit
+                # halves separately, neither of which can.
+                total = (int((column >> 32).sum()) << 32) + int((column & 0xFFFFFFFF).sum())
+            return Summary(len(column), total, int(numpy.count_nonzero(column < 0)), low, high)
+        return Summary(len(cents), sum(cents), sum(1 for c in cents if c < 0), min(cents), max(cents))
+
+    def close(self) -> None:
+        """
+        Unmap the file.
+        """
+        self._map.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Print the aggregates of a columnar balance file.
+    Args:
+        argv (list[str] | None): Command-line arguments (defaults to sys.argv).
+    """
+    import argparse
+    import time
+    import data
+
+    parser = argparse.ArgumentParser(description="Aggregate a columnar balance file.")
+    parser.add_argument("path")
+    args = parser.parse_args(argv)
+    reader = Reader(args.path)
+    try:
+        start = time.perf_counter()
+        s = reader.summary()
+        elapsed = time.perf_counter() - start
+    finally:
+        reader.close()
+    print(f"{s.accounts} accounts, total {data.from_cents(s.total)}, {s.overdrawn} overdrawn, "
+          f"min {data.from_cents(s.minimum)}, max {data.from_cents(s.maximum)} ({elapsed * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
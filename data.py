@@ -1,32 +1,1292 @@
 """
 Data module for the Account Management System.
 
-This module provides in-memory storage for the account balance
-and functions to read and update it.
+This module provides in-memory storage for the account balances
+and functions to read and update them.
+
+Balances are keyed by account id. To hold millions of accounts in one
+process, they are not kept as a dict of `Decimal` objects: each balance
+is stored as a signed 64-bit count of cents in a single `array.array`,
+and a dict maps every account id to its slot in that array. Conversion
+to and from `Decimal` only happens at the `read_balance`/`write_balance`
+boundary; the `*_cents` functions skip it entirely for int-only callers.
+
+Writes can optionally be recorded in a write-ahead journal (see the
+`journal` module) with `open_journal`. Journaled writes are appended
+before the store changes and become durable at the next `commit`.
+`enable_cache` puts an LRU cache of balances in front of the store for
+read-heavy workloads; every write invalidates the entry it changes.
+`open_history` also records every balance change in an indexed
+history (see the `history` module) for statements and as-of queries.
+`open_events` switches to event sourcing (see the `events` module):
+every change and every overdraft rejection is recorded as an event,
+views such as daily totals are maintained from the events, and
+`rebuild_from_events` restores the balances from the log.
+`checkpoint` saves the store to a snapshot (see the `snapshot` module)
+and drops the journal records it covers, so startup only loads the
+snapshot and replays the journal tail.
+`open_backend` keeps the balances in a storage backend instead (see the
+`storage` module), such as a SQLite database; its writes become durable
+at the next `commit` as well.
+`open_balance_file` keeps a memory-mapped columnar copy of the balances
+(see the `columnar` module) that reporting jobs in other processes scan
+in place.
+
+The store is safe to share between threads. Every account maps to one
+of `LOCK_STRIPES` locks, and `apply_delta` and `compare_and_set` run
+their read-check-write sequence under that lock, so workers touching
+different accounts rarely contend while updates to one account are
+serialized. `transfer_cents` takes the locks of both accounts in stripe
+order, so concurrent transfers in opposite directions cannot deadlock.
+`apply_deltas_cents` settles whole columns of postings at once (see the
+`settle` module) while holding every lock.
 """
 
+import contextlib
+import threading
+import time
+from array import array
 from decimal import Decimal
+
+CENT = Decimal("0.01")
+
+DEFAULT_ACCOUNT = "DEFAULT"
+"""
+Account used when no account id is given (the original single account).
+"""
+
+_INITIAL_CENTS = 100000
+"""
+Opening balance of the default account, in cents (1000.00).
+"""
+
+MAX_CENTS = 2 ** 63 - 1
+MIN_CENTS = -2 ** 63
 """
-Ixn-memory storage for the account balance.
+Range of a balance in cents: balances are stored as signed 64-bit integers.
 """
-_STORAGE_BALANCE: Decimal = Decimal("1000.00")
 
+MAX_ID_BYTES = 0xFFFF
+"""
+Longest account id, in UTF-8 bytes: journal records store its length in 16 bits.
+"""
+
+"""
+In-memory storage for the account balances, in cents, one slot per account.
+"""
+_STORAGE_BALANCE: array = array("q")
+_ACCOUNT_INDEX: dict[str, int] = {}
+
+_SNAPSHOT_IDS: bytes | None = None
+"""
+Ids column of the last loaded snapshot ("\\n" before and after every id),
+while its accounts are not yet all in `_ACCOUNT_INDEX`. Decoding millions
+of ids into the dict costs seconds, so a background thread indexes the
+column `_INDEX_CHUNK` bytes at a time into `_SNAPSHOT_INDEX` and swaps the
+result in when done. Until then, lookups check the partial index and only
+search the part of the column it has not reached.
+"""
+_SNAPSHOT_INDEX: dict[str, int] = {}
+_SNAPSHOT_COUNT = 0
+_SNAPSHOT_DONE = 0
+_SNAPSHOT_SLOTS = 0
+_INDEX_CHUNK = 1 << 18
+_INDEXER: threading.Thread | None = None
+
+_JOURNAL = None
+"""
+The attached `journal.Journal`, or None when writes are memory-only.
+"""
+_KEY_RECORD = "\x00key\x00"
+"""
+Prefix of the journal records holding an idempotency key (see `journal_key`)
+instead of a balance; their cents field is when the key was first used.
+"""
+_GROUP_RECORD = "\x00group"
+"""
+Prefix the journal reserves for its group records (see
+`journal.Journal.append_group`); no account id may start with it.
+"""
+_REPLAYED_KEYS: list[tuple[str, int]] = []
+_KEY_SOURCE = None
+"""
+Returns the live idempotency key records as (record, time) pairs, so a
+checkpoint can journal them again (see `track_keys`).
+"""
+_SNAPSHOT_PATH: str | None = None
+_HISTORY = None
+"""
+The attached `history.History`, or None when changes are not recorded.
+"""
+_EVENTS = None
+"""
+The attached `events.EventLog`, or None when not event-sourced.
+"""
+_COLUMNS = None
+"""
+The `columnar.Writer` mirroring the store to a balance file, or None.
+"""
+_CACHE = None
+"""
+The `cache.BalanceCache` in front of the store, or None when reads are uncached.
+"""
+_METRICS = None
+"""
+The `metrics.Metrics` registry set by `metrics.enable`, or None when disabled.
+"""
+_BACKEND = None
+"""
+The attached `storage.Backend` holding the balances, or None when they live
+in `_STORAGE_BALANCE`. Accounts get no slot while a backend is attached.
+"""
+_CHECKPOINT_EVERY = 0
+_WRITES_SINCE_CHECKPOINT = 0
 
-def read_balance() -> Decimal:
+LOCK_STRIPES = 256
+"""
+Number of account locks. Accounts are spread over them by hash.
+"""
+_LOCKS = [threading.Lock() for _ in range(LOCK_STRIPES)]
+_INDEX_LOCK = threading.RLock()
+"""
+Guards slot allocation and the lazy snapshot index.
+"""
+
+
+def to_cents(balance: Decimal) -> int:
+    """
+    Convert a balance to an exact number of cents.
+    Rounds like `quantize(Decimal("0.01"))` (half-even).
+    Args:
+        balance (Decimal): The balance, rounded to 2 decimal places.
+    Returns:
+        int: The balance expressed in cents.
+    """
+    return int(balance.quantize(CENT).scaleb(2))
+
+
+def from_cents(cents: int) -> Decimal:
+    """
+    Convert a number of cents back to a 2-decimal balance.
+    Args:
+        cents (int): The balance expressed in cents.
+    Returns:
+        Decimal: The balance with exactly 2 decimal places.
     """
-    Return the current account balance.
+    return Decimal(cents).scaleb(-2)
+
+
+def _index_chunk(column: bytes) -> bool:
+    """
+    Add the next `_INDEX_CHUNK` bytes of a snapshot ids column to `_SNAPSHOT_INDEX`.
+    After the last chunk, the finished index replaces `_ACCOUNT_INDEX`,
+    keeping the index keys in slot order.
+    Args:
+        column (bytes): The ids column being indexed.
     Returns:
-        Decimal: The current balance stored in memory.
+        bool: Whether chunks remain; False as well once another column
+              (or none) has replaced `column`.
     """
-    return _STORAGE_BALANCE
+    global _SNAPSHOT_IDS, _SNAPSHOT_INDEX, _SNAPSHOT_DONE, _SNAPSHOT_SLOTS, _ACCOUNT_INDEX
+    with _INDEX_LOCK:
+        if _SNAPSHOT_IDS is not column:
+            return False
+        start = _SNAPSHOT_DONE
+        end = column.find(b"\n", min(start + _INDEX_CHUNK, len(column) - 1))
+        if end > start:
+            ids = str(column[start + 1:end], "utf-8").split("\n")
+            _SNAPSHOT_INDEX.update(zip(ids, range(_SNAPSHOT_SLOTS, _SNAPSHOT_SLOTS + len(ids))))
+            _SNAPSHOT_SLOTS += len(ids)
+            _SNAPSHOT_DONE = end
+        if end < len(column) - 1:
+            return True
+        index = _SNAPSHOT_INDEX
+        index.update((k, v) for k, v in _ACCOUNT_INDEX.items() if v >= _SNAPSHOT_COUNT)
+        # Rebind rather than refill, so lock-free readers never see a partial index.
+        _ACCOUNT_INDEX = index
+        _SNAPSHOT_INDEX = {}
+        _SNAPSHOT_IDS = None
+        return False
 
 
-def write_balance(balance: Decimal) -> None:
+def _index_in_background(column: bytes) -> None:
     """
-    Update the account balance.
+    Index a snapshot ids column chunk by chunk (the snapshot indexer thread).
+    Args:
+        column (bytes): The ids column to index.
+    """
+    while _index_chunk(column):
+        # Let lookups waiting on the index lock in between chunks.
+        time.sleep(0)
+
+
+def _materialize_index() -> None:
+    """
+    Move every account of the loaded snapshot into `_ACCOUNT_INDEX` now,
+    finishing in this thread whatever the indexer has not done yet.
+    """
+    column = _SNAPSHOT_IDS
+    while column is not None and _index_chunk(column):
+        pass
+
+
+def _find_slot(account_id: str) -> int | None:
+    """
+    Look up an account missing from `_ACCOUNT_INDEX` in the loaded snapshot.
+    Args:
+        account_id (str): The account identifier.
+    Returns:
+        int | None: The slot of the account, or None if it does not exist.
+    """
+    if _SNAPSHOT_IDS is None:
+        return None
+    with _INDEX_LOCK:
+        slot = _ACCOUNT_INDEX.get(account_id)
+        if slot is not None or _SNAPSHOT_IDS is None:
+            return slot
+        slot = _SNAPSHOT_INDEX.get(account_id)
+        if slot is None:
+            # Only the part of the column the indexer has not reached is searched.
+            pos = _SNAPSHOT_IDS.find(b"\n" + account_id.encode("utf-8") + b"\n", _SNAPSHOT_DONE)
+            if pos < 0:
+                return None
+            slot = _SNAPSHOT_SLOTS + _SNAPSHOT_IDS.count(b"\n", _SNAPSHOT_DONE, pos)
+        _ACCOUNT_INDEX[account_id] = slot
+        return slot
+
+
+def _slot(account_id: str) -> int:
+    """
+    Return the storage slot of an account, allocating one if needed.
+    New accounts open with a balance of 0.00.
+    Args:
+        account_id (str): The account identifier.
+    Returns:
+        int: The index of the account in `_STORAGE_BALANCE`,
+             or -1 when a backend holds the balances.
+    Raises:
+        ValueError: If the account is new and its id cannot be stored (see
+                    `account_fits`); no slot is allocated.
+    """
+    slot = _ACCOUNT_INDEX.get(account_id)
+    if slot is not None:
+        return slot
+    if _BACKEND is not None:
+        return -1
+    with _INDEX_LOCK:
+        slot = _ACCOUNT_INDEX.get(account_id)
+        if slot is None:
+            slot = _find_slot(account_id)
+        if slot is None:
+            if not account_fits(account_id):
+                raise ValueError(f"Account id {account_id!r} cannot be stored.")
+            if _COLUMNS is not None:
+                if _COLUMNS.full:
+                    with _exclusive():
+                        _COLUMNS.grow()
+                _COLUMNS.append(account_id)
+            slot = len(_STORAGE_BALANCE)
+            _STORAGE_BALANCE.append(0)
+            _ACCOUNT_INDEX[account_id] = slot
+        return slot
+
+
+def account_fits(account_id: str) -> bool:
+    """
+    Return True if an account can be stored. New account ids must be
+    valid UTF-8 of at most `MAX_ID_BYTES` bytes, which the journal can
+    record, must not contain a newline, which snapshots cannot hold, nor
+    start with the prefix the journal reserves for group records, and
+    must fit the id column of the balance file if one is attached (see
+    `open_balance_file`).
+    Args:
+        account_id (str): The account identifier.
+    Returns:
+        bool: False if the account is new and its id cannot be stored.
+    """
+    if account_id in _ACCOUNT_INDEX:
+        return True
+    if "\n" in account_id or account_id.startswith(_GROUP_RECORD):
+        return False
+    try:
+        if len(account_id.encode("utf-8")) > MAX_ID_BYTES:
+            return False
+    except UnicodeEncodeError:
+        return False
+    columns = _COLUMNS
+    return columns is None or columns.fits(account_id)
+
+
+def _lock_for(account_id: str) -> threading.Lock:
+    """
+    Return the lock that serializes updates to an account.
+    """
+    return _LOCKS[hash(account_id) % LOCK_STRIPES]
+
+
+def _backend_read(account_id: str) -> int:
+    """
+    Return the balance of an account in cents from the backend, 0 if never written.
+    """
+    cents = _BACKEND.read(account_id)
+    return 0 if cents is None else cents
+
+
+@contextlib.contextmanager
+def _exclusive():
+    """
+    Hold every account lock and the index lock, pausing all writers.
+    """
+    with _INDEX_LOCK:
+        for lock in _LOCKS:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in _LOCKS:
+                lock.release()
+
+
+def _store(slot: int, account_id: str, cents: int, journaled: bool = False) -> None:
+    """
+    Journal and store a new balance. The caller holds the account lock.
+    Args:
+        slot (int): The slot of the account.
+        account_id (str): The account identifier.
+        cents (int): The new balance in cents.
+        journaled (bool): True if the caller already journaled the balance,
+                          as part of a group (see `journal.Journal.append_group`).
+    Raises:
+        OverflowError: If the balance is outside [MIN_CENTS, MAX_CENTS];
+                       nothing is changed or recorded.
+    """
+    global _WRITES_SINCE_CHECKPOINT
+    if not MIN_CENTS <= cents <= MAX_CENTS:
+        # Refused before the journal, history or events see the change.
+        raise OverflowError("Balance out of the storable range.")
+    backend = _BACKEND
+    if _HISTORY is not None or _EVENTS is not None:
+        old = _STORAGE_BALANCE[slot] if backend is None else _backend_read(account_id)
+        if _EVENTS is not None:
+            # The event comes first; the balance stored is the one it yields.
+            cents = _EVENTS.change(account_id, cents - old)
+        if _HISTORY is not None:
+            _HISTORY.record(account_id, cents - old, cents)
+    if _JOURNAL is not None and not journaled:
+        _JOURNAL.append(account_id, cents)
+        _WRITES_SINCE_CHECKPOINT += 1
+    if backend is None:
+        _STORAGE_BALANCE[slot] = cents
+        if _COLUMNS is not None:
+            _COLUMNS.set(slot, cents)
+    else:
+        backend.write(account_id, cents)
+    cache = _CACHE
+    if cache is not None:
+        cache.invalidate(account_id)
+
+
+def read_cents(account_id: str = DEFAULT_ACCOUNT) -> int:
+    """
+    Return the current balance of an account in cents.
+    Goes through the cache when one is enabled (see `enable_cache`).
+    Args:
+        account_id (str): The account to read. Defaults to the default account.
+    Returns:
+        int: The balance in cents, or 0 if the account has never been written.
+    """
+    cache = _CACHE
+    if cache is not None:
+        return _read_through(cache, account_id)
+    slot = _ACCOUNT_INDEX.get(account_id)
+    if slot is None:
+        slot = _find_slot(account_id)
+        if slot is None:
+            return 0 if _BACKEND is None else _backend_read(account_id)
+    return _STORAGE_BALANCE[slot]
+
+
+def _read_through(cache, account_id: str) -> int:
+    """
+    Return the balance of an account in cents from the cache, filling it on a miss.
+    """
+    cents = cache.get(account_id)
+    if cents is not None:
+        return cents
+    if account_id not in _ACCOUNT_INDEX:
+        # Index a snapshot account now: the index lock must not be taken under an account lock.
+        _find_slot(account_id)
+    # Fill under the account lock, so a concurrent write cannot be overtaken.
+    with _lock_for(account_id):
+        slot = _ACCOUNT_INDEX.get(account_id)
+        if _BACKEND is not None:
+            cents = _backend_read(account_id)
+        else:
+            cents = 0 if slot is None else _STORAGE_BALANCE[slot]
+        cache.put(account_id, cents)
+    return cents
+
+
+def read_balance(account_id: str = DEFAULT_ACCOUNT) -> Decimal:
+    """
+    Return the current balance of an account.
+    Args:
+        account_id (str): The account to read. Defaults to the default account.
+    Returns:
+        Decimal: The current balance stored in memory,
+                 or 0.00 if the account has never been written.
+    """
+    return from_cents(read_cents(account_id))
+
+
+def write_cents(cents: int, account_id: str = DEFAULT_ACCOUNT) -> None:
+    """
+    Update the balance of an account, given in cents.
+    Args:
+        cents (int): The new balance in cents.
+        account_id (str): The account to update. Defaults to the default account.
+    Raises:
+        OverflowError: If the balance is outside [MIN_CENTS, MAX_CENTS].
+    """
+    slot = _slot(account_id)
+    with _lock_for(account_id):
+        _store(slot, account_id, cents)
+
+
+def write_all_cents(balances) -> None:
+    """
+    Atomically update the balances of several accounts, given in cents.
+    With a journal attached they are journaled as one record, so after a
+    crash either every one of them or none is replayed.
+    Args:
+        balances (Sequence[tuple[str, int]]): (account id, new balance in cents) pairs,
+                                              each account at most once.
+    Raises:
+        OverflowError: If a balance is outside [MIN_CENTS, MAX_CENTS]; no
+                       balance is changed.
+        ValueError: If a backend holds the balances.
+    """
+    _require_slots()
+    if not all(MIN_CENTS <= cents <= MAX_CENTS for _, cents in balances):
+        raise OverflowError("Balance out of the storable range.")
+    slots = [_slot(account_id) for account_id, _ in balances]
+    with _exclusive():
+        journaled = _journal_group(balances)
+        for slot, (account_id, cents) in zip(slots, balances):
+            _store(slot, account_id, cents, journaled)
+
+
+def _journal_group(balances) -> bool:
+    """
+    Journal balances as one group record, if a journal is attached.
+    Returns:
+        bool: True if they were journaled.
+    """
+    global _WRITES_SINCE_CHECKPOINT
+    journal = _JOURNAL
+    if journal is None:
+        return False
+    journal.append_group(balances)
+    _WRITES_SINCE_CHECKPOINT += len(balances)
+    return True
+
+
+def write_balance(balance: Decimal, account_id: str = DEFAULT_ACCOUNT) -> None:
+    """
+    Update the balance of an account.
     Args:
         balance (Decimal): The new balance to store.
                            The value is rounded to 2 decimal places.
+        account_id (str): The account to update. Defaults to the default account.
+    """
+    metrics = _METRICS
+    if metrics is None:
+        write_cents(to_cents(balance), account_id)
+        return
+    start = time.perf_counter_ns()
+    write_cents(to_cents(balance), account_id)
+    metrics.observe("write_balance_seconds", time.perf_counter_ns() - start)
+
+
+def apply_delta_cents(delta: int, account_id: str = DEFAULT_ACCOUNT,
+                      floor: int | None = None) -> int | None:
+    """
+    Atomically add a number of cents to an account balance.
+    The read, the check and the write happen under the account lock, so
+    concurrent updates of the same account are never lost.
+    Args:
+        delta (int): The cents to add (negative to subtract).
+        account_id (str): The account to update. Defaults to the default account.
+        floor (int | None): If given, the update is refused when the new
+                            balance in cents would fall below it.
+    Returns:
+        int | None: The new balance in cents, or None if the floor refused the update.
+    Raises:
+        OverflowError: If the new balance is outside [MIN_CENTS, MAX_CENTS];
+                       the balance is left unchanged.
+    """
+    slot = _slot(account_id)
+    with _lock_for(account_id):
+        cents = (_STORAGE_BALANCE[slot] if _BACKEND is None else _backend_read(account_id)) + delta
+        if floor is not None and cents < floor:
+            if _EVENTS is not None:
+                _EVENTS.reject(account_id, -delta)
+            return None
+        _store(slot, account_id, cents)
+    return cents
+
+
+def apply_delta(delta: Decimal, account_id: str = DEFAULT_ACCOUNT,
+                floor: Decimal | None = None) -> Decimal | None:
+    """
+    Atomically add an amount to an account balance (see `apply_delta_cents`).
+    Args:
+        delta (Decimal): The amount to add (negative to subtract).
+                         The value is rounded to 2 decimal places.
+        account_id (str): The account to update. Defaults to the default account.
+        floor (Decimal | None): If given, the update is refused when the new
+                                balance would fall below it.
+    Returns:
+        Decimal | None: The new balance, or None if the floor refused the update.
+    """
+    cents = apply_delta_cents(to_cents(delta), account_id,
+                              None if floor is None else to_cents(floor))
+    return None if cents is None else from_cents(cents)
+
+
+def transfer_cents(cents: int, source: str, target: str,
+                   floor: int | None = None) -> tuple[int, int] | None:
+    """
+    Atomically move a number of cents from one account to another.
+    Both accounts are locked for the whole move, always in stripe order,
+    so concurrent transfers never deadlock and no reader of either lock
+    sees one side without the other.
+    Args:
+        cents (int): The amount to move, in cents.
+        source (str): The account to debit.
+        target (str): The account to credit.
+        floor (int | None): If given, the transfer is refused when the source
+                            balance in cents would fall below it.
+    Returns:
+        tuple[int, int] | None: The new source and target balances in cents,
+        or None if the floor refused the transfer.
+    Raises:
+        OverflowError: If a new balance is outside [MIN_CENTS, MAX_CENTS];
+                       neither balance is changed.
     """
-    global _STORAGE_BALANCE
-    _STORAGE_BALANCE = balance.quantize(Decimal("0.01"))
+    source_slot = _slot(source)
+    target_slot = _slot(target)
+    first = hash(source) % LOCK_STRIPES
+    second = hash(target) % LOCK_STRIPES
+    if first > second:
+        first, second = second, first
+    with _LOCKS[first]:
+        if second != first:
+            _LOCKS[second].acquire()
+        try:
+            backend = _BACKEND
+            balance = (_STORAGE_BALANCE[source_slot] if backend is None else _backend_read(source)) - cents
+            if floor is not None and balance < floor:
+                if _EVENTS is not None:
+                    _EVENTS.reject(source, cents)
+                return None
+            if source == target:
+                return balance + cents, balance + cents
+            credited = (_STORAGE_BALANCE[target_slot] if backend is None else _backend_read(target)) + cents
+            if not MIN_CENTS <= credited <= MAX_CENTS:
+                raise OverflowError("Balance out of the storable range.")
+            journaled = _journal_group(((source, balance), (target, credited)))
+            _store(source_slot, source, balance, journaled)
+            _store(target_slot, target, credited, journaled)
+        finally:
+            if second != first:
+                _LOCKS[second].release()
+    return balance, credited
+
+
+def account_slots(account_ids) -> list[int]:
+    """
+    Return the storage slot of every account, for the columnar APIs.
+    Missing accounts are opened with a balance of 0.00.
+    Args:
+        account_ids (Iterable[str]): The account identifiers.
+    Returns:
+        list[int]: The slot of every account, in the same order.
+    Raises:
+        ValueError: If a backend holds the balances.
+    """
+    _require_slots()
+    return [_slot(account_id) for account_id in account_ids]
+
+
+def apply_deltas_cents(slots, deltas, floor: int | None = None):
+    """
+    Atomically apply columns of postings, in order (see the `settle` module).
+    Gives the same balances and rejections as calling `apply_delta_cents`
+    once per posting, but runs vectorized when NumPy is installed. Each
+    changed account is journaled (and recorded in the history) once, with
+    its final balance.
+    Args:
+        slots (Sequence[int]): The slot of every posting (see `account_slots`).
+        deltas (Sequence[int]): The signed amount of every posting, in cents.
+        floor (int | None): If given, a debit is refused when the balance would
+                            fall below it; credits always apply.
+    Returns:
+        Sequence[bool]: The rejection mask, in posting order.
+    Raises:
+        ValueError: If the columns differ in length, or a backend holds the balances.
+        IndexError: If a slot does not belong to an account.
+    """
+    _require_slots()
+    with _exclusive():
+        return _apply_deltas(slots, deltas, floor)
+
+
+def _apply_deltas(slots, deltas, floor: int | None):
+    """
+    Apply columns of postings (see `apply_deltas_cents`). The caller holds every lock.
+    """
+    global _WRITES_SINCE_CHECKPOINT
+    import settle
+
+    before = None
+    if _HISTORY is not None or _EVENTS is not None:
+        count = len(_STORAGE_BALANCE)
+        before = {slot: _STORAGE_BALANCE[slot] for slot in set(slots) if 0 <= slot < count}
+    rejected, touched = settle.apply(_STORAGE_BALANCE, slots, deltas, floor)
+    if touched and (_JOURNAL is not None or before is not None):
+        account_ids = _account_ids()
+        for slot in touched:
+            cents = _STORAGE_BALANCE[slot]
+            if before is not None and cents != before[slot]:
+                # Settled postings are recorded as one net change per account,
+                # before the balance is journaled or reaches the balance file.
+                if _EVENTS is not None:
+                    _EVENTS.change(account_ids[slot], cents - before[slot])
+                if _HISTORY is not None:
+                    _HISTORY.record(account_ids[slot], cents - before[slot], cents)
+            if _JOURNAL is not None:
+                _JOURNAL.append(account_ids[slot], cents)
+        if _JOURNAL is not None:
+            _WRITES_SINCE_CHECKPOINT += len(touched)
+    if _COLUMNS is not None:
+        for slot in touched:
+            _COLUMNS.set(slot, _STORAGE_BALANCE[slot])
+    if _EVENTS is not None and floor is not None:
+        account_ids = _account_ids()
+        for i, bounced in enumerate(rejected):
+            if bounced:
+                _EVENTS.reject(account_ids[int(slots[i])], -int(deltas[i]))
+    if touched and _CACHE is not None:
+        _CACHE.clear()
+    return rejected
+
+
+def post_chunk_cents(start: int, stop: int, postings, floor: int | None = None):
+    """
+    Atomically post one amount to every account of a range of slots, computed
+    from their current balances, for jobs that walk the whole store (see the
+    `accrual` module). Writers are paused while `postings` runs, so no
+    balance changes between being read and being posted to.
+    Args:
+        start (int): The first slot.
+        stop (int): The slot after the last one; clamped to the number of accounts.
+        postings (Callable[[array], Sequence[int]]): Given the balances of the
+            range in cents, returns the signed amount posted to each account.
+        floor (int | None): If given, a debit is refused when the balance would
+                            fall below it; credits always apply.
+    Returns:
+        tuple[array, list[bool]]: The balances before posting and the rejection
+                                  mask, in slot order.
+    Raises:
+        ValueError: If `postings` returns a column of another length, or a
+                    backend holds the balances.
+    """
+    _require_slots()
+    with _exclusive():
+        balances = _STORAGE_BALANCE[start:stop]
+        deltas = postings(balances)
+        if len(deltas) != len(balances):
+            raise ValueError("Every account of the range needs exactly one posting.")
+        # Accounts with nothing to post are neither touched nor journaled.
+        posted = [i for i, delta in enumerate(deltas) if delta]
+        rejected = [False] * len(balances)
+        if posted:
+            mask = _apply_deltas([start + i for i in posted], [deltas[i] for i in posted], floor)
+            for i, bounced in zip(posted, mask):
+                if bounced:
+                    rejected[i] = True
+    return balances, rejected
+
+
+def compare_and_set(expected: Decimal, balance: Decimal,
+                    account_id: str = DEFAULT_ACCOUNT) -> bool:
+    """
+    Atomically replace an account balance if it still holds an expected value.
+    Args:
+        expected (Decimal): The balance the caller last read.
+        balance (Decimal): The new balance to store, rounded to 2 decimal places.
+        account_id (str): The account to update. Defaults to the default account.
+    Returns:
+        bool: True if the balance was replaced, False if it had changed meanwhile.
+    """
+    expected_cents = to_cents(expected)
+    cents = to_cents(balance)
+    slot = _slot(account_id)
+    with _lock_for(account_id):
+        current = _STORAGE_BALANCE[slot] if _BACKEND is None else _backend_read(account_id)
+        if current != expected_cents:
+            return False
+        _store(slot, account_id, cents)
+    return True
+
+
+def commit() -> None:
+    """
+    Block until every journaled (or backend) write is durable, and every
+    event of an event log kept in a file before them.
+    Then takes a checkpoint when the periodic checkpoint interval is reached.
+    A periodic checkpoint that fails does not fail the commit: the journal
+    still holds every write, and the checkpoint is tried again after
+    another interval.
+    Does nothing when no journal, backend or event log file is attached.
+    """
+    global _WRITES_SINCE_CHECKPOINT
+    if _EVENTS is not None:
+        _EVENTS.sync()
+    if _JOURNAL is not None:
+        _JOURNAL.commit()
+        if _CHECKPOINT_EVERY and _WRITES_SINCE_CHECKPOINT >= _CHECKPOINT_EVERY:
+            try:
+                checkpoint()
+            except (OSError, ValueError):
+                _WRITES_SINCE_CHECKPOINT = 0
+    elif _BACKEND is not None:
+        _BACKEND.commit()
+
+
+def load_snapshot(path: str) -> None:
+    """
+    Replace the whole store with the contents of a snapshot file.
+    Args:
+        path (str): The snapshot file path.
+    Raises:
+        ValueError: If a backend holds the balances.
+    """
+    global _SNAPSHOT_IDS, _SNAPSHOT_INDEX, _SNAPSHOT_COUNT, _SNAPSHOT_DONE, _SNAPSHOT_SLOTS, _INDEXER
+    import snapshot
+
+    _require_slots()
+    cents, ids_column = snapshot.load(path)
+    column = b"\n" + ids_column
+    with _INDEX_LOCK:
+        del _STORAGE_BALANCE[:]
+        _STORAGE_BALANCE.extend(cents)
+        _ACCOUNT_INDEX.clear()
+        _SNAPSHOT_IDS = column
+        _SNAPSHOT_INDEX = {}
+        _SNAPSHOT_COUNT = len(cents)
+        _SNAPSHOT_DONE = _SNAPSHOT_SLOTS = 0
+    _INDEXER = threading.Thread(target=_index_in_background, args=(column,),
+                                name="snapshot-indexer", daemon=True)
+    _INDEXER.start()
+    if _CACHE is not None:
+        _CACHE.clear()
+    _reload_columns()
+
+
+def checkpoint(path: str | None = None) -> None:
+    """
+    Save the store to a snapshot, then drop the journal records it covers.
+    Writers are paused while the store is copied.
+    Args:
+        path (str | None): The snapshot file path. Defaults to the path given
+                           to `open_journal`.
+    Raises:
+        ValueError: If no snapshot path is known, or a backend holds the balances.
+    """
+    global _WRITES_SINCE_CHECKPOINT
+    import snapshot
+
+    _require_slots()
+    path = path or _SNAPSHOT_PATH
+    if path is None:
+        raise ValueError("No snapshot path configured.")
+    _materialize_index()
+    # Freeze writers only while copying the store, not while writing the file.
+    with _exclusive():
+        offset = _JOURNAL.mark() if _JOURNAL is not None else None
+        cents = array("q", _STORAGE_BALANCE)
+        account_ids = _account_ids()
+        if offset is not None:
+            # Key records before the mark go with the rest; journal the live ones again.
+            keys = _REPLAYED_KEYS + (_KEY_SOURCE() if _KEY_SOURCE is not None else [])
+            for record, stamp in keys:
+                _JOURNAL.append(_KEY_RECORD + record, stamp)
+    snapshot.write(path, cents, account_ids)
+    if offset is not None:
+        _JOURNAL.discard_before(offset)
+    _WRITES_SINCE_CHECKPOINT = 0
+
+
+def open_journal(path: str, max_batch: int = 256, max_delay: float = 0.002,
+                 snapshot_path: str | None = None, checkpoint_every: int = 0):
+    """
+    Rebuild the store from a snapshot and a journal, then journal every later write.
+    If `snapshot_path` names an existing snapshot, it replaces the store first.
+    Balances found in the journal then overwrite those in memory, and the
+    idempotency key records it holds are kept for `replayed_keys`.
+    Args:
+        path (str): The journal file path. It is created if missing.
+        max_batch (int): Pending records that force a group commit.
+        max_delay (float): Maximum seconds a write stays pending before a group commit.
+        snapshot_path (str | None): The snapshot file used by `checkpoint`.
+        checkpoint_every (int): Take a checkpoint at the first commit after this
+                                many journaled writes (0 disables periodic checkpoints).
+    Returns:
+        journal.Journal: The attached journal.
+    Raises:
+        ValueError: If a backend holds the balances.
+    """
+    global _JOURNAL, _SNAPSHOT_PATH, _CHECKPOINT_EVERY, _WRITES_SINCE_CHECKPOINT
+    import os
+    import journal
+
+    _require_slots()
+    close_journal()
+    if snapshot_path is not None and os.path.exists(snapshot_path):
+        load_snapshot(snapshot_path)
+    del _REPLAYED_KEYS[:]
+    for account_id, cents in journal.replay(path):
+        if account_id.startswith(_KEY_RECORD):
+            _REPLAYED_KEYS.append((account_id[len(_KEY_RECORD):], cents))
+            continue
+        _STORAGE_BALANCE[_slot(account_id)] = cents
+    if _CACHE is not None:
+        _CACHE.clear()
+    _reload_columns()
+    _JOURNAL = journal.Journal(path, max_batch, max_delay)
+    _SNAPSHOT_PATH = snapshot_path
+    _CHECKPOINT_EVERY = checkpoint_every if snapshot_path else 0
+    _WRITES_SINCE_CHECKPOINT = 0
+    return _JOURNAL
+
+
+def journal_key(record: str, stamp: int) -> None:
+    """
+    Journal an idempotency key record, so it is as durable as the balance
+    writes journaled before it. Does nothing when no journal is attached.
+    Args:
+        record (str): The key and the outcome of its operation, encoded by
+                      the caller.
+        stamp (int): When the key was first used, in wall-clock ms.
+    """
+    journal = _JOURNAL
+    if journal is not None:
+        journal.append(_KEY_RECORD + record, stamp)
+
+
+def replayed_keys() -> list[tuple[str, int]]:
+    """
+    Take the idempotency key records found by the last `open_journal`.
+    Returns:
+        list[tuple[str, int]]: (record, wall-clock time in ms) pairs, in journal
+        order; later calls return an empty list until the next `open_journal`.
+    """
+    if not _REPLAYED_KEYS:
+        return []
+    records = _REPLAYED_KEYS[:]
+    del _REPLAYED_KEYS[:]
+    return records
+
+
+def track_keys(source) -> None:
+    """
+    Name the function that lists the live idempotency key records, which
+    `checkpoint` journals again after dropping the older records.
+    Args:
+        source (Callable[[], Iterable[tuple[str, int]]] | None): Returns
+            (record, wall-clock time in ms) pairs; None stops tracking.
+    """
+    global _KEY_SOURCE
+    _KEY_SOURCE = source
+
+
+def close_journal() -> None:
+    """
+    Commit and detach the current journal, if any. Later writes are memory-only.
+    """
+    global _JOURNAL, _SNAPSHOT_PATH, _CHECKPOINT_EVERY
+    if _JOURNAL is not None:
+        _JOURNAL.close()
+        _JOURNAL = None
+    _SNAPSHOT_PATH = None
+    _CHECKPOINT_EVERY = 0
+
+
+def _require_slots() -> None:
+    """
+    Refuse slot-based and snapshot operations while a backend holds the balances.
+    """
+    if _BACKEND is not None:
+        raise ValueError("Not available while a storage backend is attached.")
+
+
+def open_backend(backend):
+    """
+    Keep every balance in a storage backend instead of memory.
+    The in-memory store is dropped, and the default account is opened with
+    the initial balance (1000.00) if the backend does not hold it yet.
+    Slot-based APIs, snapshots and the journal are unavailable until
+    `close_backend`; the backend itself makes writes durable at `commit`.
+    Args:
+        backend (storage.Backend): The backend, for instance a `storage.SQLiteBackend`.
+    Returns:
+        storage.Backend: The attached backend.
+    Raises:
+        ValueError: If a journal or a balance file is attached.
+    """
+    global _BACKEND, _SNAPSHOT_IDS
+    if _JOURNAL is not None:
+        raise ValueError("Close the journal before attaching a storage backend.")
+    if _COLUMNS is not None:
+        raise ValueError("Close the balance file before attaching a storage backend.")
+    close_backend()
+    with _exclusive():
+        del _STORAGE_BALANCE[:]
+        _ACCOUNT_INDEX.clear()
+        _SNAPSHOT_IDS = None
+        if backend.read(DEFAULT_ACCOUNT) is None:
+            backend.write(DEFAULT_ACCOUNT, _INITIAL_CENTS)
+            backend.commit()
+        _BACKEND = backend
+        if _CACHE is not None:
+            _CACHE.clear()
+    return backend
+
+
+def close_backend() -> None:
+    """
+    Close and detach the current backend, if any.
+    Balances go back to a fresh in-memory store (see `reset`).
+    """
+    global _BACKEND
+    backend = _BACKEND
+    if backend is None:
+        return
+    with _exclusive():
+        _BACKEND = None
+        backend.close()
+    reset()
+
+
+def _account_ids() -> list[str]:
+    """
+    Return the account id of every slot, in slot order.
+    """
+    _materialize_index()
+    # Slots are allocated in insertion order, so the index keys are in slot order.
+    return list(_ACCOUNT_INDEX)
+
+
+def open_history(clock=None):
+    """
+    Start recording every balance change in a new, empty history.
+    Args:
+        clock (Callable[[], int] | None): Returns the current time in nanoseconds.
+                                          Defaults to `time.time_ns`.
+    Returns:
+        history.History: The attached history.
+    """
+    global _HISTORY
+    import history
+
+    _HISTORY = history.History() if clock is None else history.History(clock)
+    return _HISTORY
+
+
+def close_history() -> None:
+    """
+    Stop recording balance changes and drop the history.
+    """
+    global _HISTORY
+    _HISTORY = None
+
+
+def current_history():
+    """
+    Return the attached history.
+    Returns:
+        history.History: The history recording balance changes.
+    Raises:
+        ValueError: If no history is attached.
+    """
+    if _HISTORY is None:
+        raise ValueError("No history attached; call open_history() first.")
+    return _HISTORY
+
+
+def statement(account_id: str = DEFAULT_ACCOUNT, start: int | None = None,
+              end: int | None = None) -> list:
+    """
+    Return the balance changes of an account between two times, oldest first.
+    Args:
+        account_id (str): The account to report. Defaults to the default account.
+        start (int | None): Earliest timestamp included (nanoseconds since the epoch).
+        end (int | None): Latest timestamp included (nanoseconds since the epoch).
+    Returns:
+        list[history.Entry]: The changes, with amounts in cents.
+    Raises:
+        ValueError: If no history is attached.
+    """
+    return current_history().statement(account_id, start, end)
+
+
+def balance_as_of(when: int, account_id: str = DEFAULT_ACCOUNT) -> Decimal:
+    """
+    Return the balance an account had at a given time.
+    Args:
+        when (int): The time, in nanoseconds since the epoch.
+        account_id (str): The account to read. Defaults to the default account.
+    Returns:
+        Decimal: The balance at that time. Accounts without recorded
+                 changes report their current balance.
+    Raises:
+        ValueError: If no history is attached.
+    """
+    cents = current_history().balance_as_of(account_id, when)
+    return read_balance(account_id) if cents is None else from_cents(cents)
+
+
+def open_events(clock=None, path: str | None = None, workers: int | None = None):
+    """
+    Switch to event sourcing: record every later balance change and
+    overdraft rejection in an event log, and store the balances it yields.
+    With a path, the log is kept in that file: events already there are
+    loaded, the views rebuilt from them, and the balance of every account
+    they hold restored from the balances view. The balances of other
+    accounts are recorded as opening events, so the log accounts for them.
+    Args:
+        clock (Callable[[], int] | None): Returns the current time in nanoseconds.
+                                          Defaults to `time.time_ns`.
+        path (str | None): The event log file, created if missing. None keeps
+                           the log in memory only.
+        workers (int | None): Worker processes rebuilding the views of a
+                              loaded log; defaults to the number of CPUs.
+    Returns:
+        events.EventLog: The attached log.
+    Raises:
+        ValueError: If a backend holds the balances, or the file is not an event log.
+    """
+    import events
+
+    _require_slots()
+    close_events()
+    if clock is None:
+        log = events.EventLog(path=path, workers=workers)
+    else:
+        log = events.EventLog(clock, path, workers)
+    _restore_from(log, attach=True)
+    log.sync()
+    return log
+
+
+def _restore_from(log, attach: bool = False) -> None:
+    """
+    Set the balance of every account of an event log from its balances view.
+    When `attach`, record the other accounts as opening events and attach
+    the log, with writers still paused.
+    """
+    global _EVENTS
+    # Open missing accounts first: a new slot may grow the balance file,
+    # which pauses writers itself.
+    for account_id in log.accounts():
+        _slot(account_id)
+    with _exclusive():
+        known = set(log.accounts())
+        for slot, account_id in enumerate(_account_ids()):
+            if account_id in known:
+                _STORAGE_BALANCE[slot] = log.balance(account_id)
+            elif attach:
+                log.change(account_id, _STORAGE_BALANCE[slot])
+        if attach:
+            _EVENTS = log
+        if _CACHE is not None:
+            _CACHE.clear()
+        _reload_columns()
+
+
+def close_events() -> None:
+    """
+    Stop recording events and drop the log, closing its file. Balances are kept.
+    """
+    global _EVENTS
+    if _EVENTS is not None:
+        _EVENTS.close()
+    _EVENTS = None
+
+
+def current_events():
+    """
+    Return the attached event log.
+    Returns:
+        events.EventLog: The log recording balance events.
+    Raises:
+        ValueError: If no event log is attached.
+    """
+    if _EVENTS is None:
+        raise ValueError("No event log attached; call open_events() first.")
+    return _EVENTS
+
+
+def rebuild_from_events(workers: int | None = None) -> None:
+    """
+    Rebuild every view from the event log (in parallel, see `events.EventLog.rebuild`)
+    and restore the balance of every account it holds from the balances view.
+    Writers keep running while the events are folded, and are paused only
+    while the balances are restored.
+    Args:
+        workers (int | None): Worker processes; defaults to the number of CPUs.
+    Raises:
+        ValueError: If no event log is attached.
+    """
+    log = current_events()
+    log.rebuild(workers)
+    _restore_from(log)
+
+
+def daily_totals(day, account_id: str = DEFAULT_ACCOUNT) -> tuple[Decimal, Decimal]:
+    """
+    Return what was credited to and debited from an account on one day.
+    Args:
+        day (datetime.date): The day, in UTC.
+        account_id (str): The account to report. Defaults to the default account.
+    Returns:
+        tuple[Decimal, Decimal]: The credited and debited totals.
+    Raises:
+        ValueError: If no event log is attached.
+    """
+    credited, debited = current_events().daily_totals(account_id, day)
+    return from_cents(credited), from_cents(debited)
+
+
+def overdraft_rejections(account_id: str = DEFAULT_ACCOUNT) -> int:
+    """
+    Return how many debits of an account were refused for insufficient funds.
+    Raises:
+        ValueError: If no event log is attached.
+    """
+    return current_events().rejections(account_id)
+
+
+def open_balance_file(path: str, id_width: int | None = None):
+    """
+    Keep a memory-mapped columnar copy of the balances (see the `columnar`
+    module) in a file, for readers in other processes. The file is
+    rewritten from the store, then every later write updates it in place.
+    Args:
+        path (str): The file path. An existing file is replaced.
+        id_width (int | None): Width of the account id column, in bytes.
+                               Defaults to `columnar.ID_WIDTH`.
+    Returns:
+        columnar.Writer: The attached writer.
+    Raises:
+        ValueError: If a backend holds the balances, or an account id does
+                    not fit the id column. New accounts whose id does not
+                    fit are refused with ValueError as well.
+    """
+    global _COLUMNS
+    import columnar
+
+    _require_slots()
+    close_balance_file()
+    with _exclusive():
+        _COLUMNS = columnar.Writer(path, _account_ids(), _STORAGE_BALANCE,
+                                   columnar.ID_WIDTH if id_width is None else id_width)
+    return _COLUMNS
+
+
+def close_balance_file() -> None:
+    """
+    Stop updating the balance file, if any. The file is left on disk.
+    """
+    global _COLUMNS
+    writer = _COLUMNS
+    if writer is not None:
+        with _exclusive():
+            _COLUMNS = None
+            writer.close()
+
+
+def _reload_columns() -> None:
+    """
+    Rewrite the balance file, if any, after the whole store was replaced.
+    The caller pauses writers, or owns the store (as while loading it).
+    """
+    if _COLUMNS is not None:
+        _COLUMNS.load(_account_ids(), _STORAGE_BALANCE)
+
+
+def enable_cache(capacity: int = 100000):
+    """
+    Serve balance reads from an LRU cache in front of the store.
+    Replaces any previous cache.
+    Args:
+        capacity (int): Most balances held in the cache.
+    Returns:
+        cache.BalanceCache: The cache, with its hit/miss counters.
+    """
+    global _CACHE
+    import cache
+
+    _CACHE = cache.BalanceCache(capacity)
+    return _CACHE
+
+
+def disable_cache() -> None:
+    """
+    Read balances straight from the store again and drop the cache.
+    """
+    global _CACHE
+    _CACHE = None
+
+
+def cache_stats() -> dict | None:
+    """
+    Return the counters of the balance cache.
+    Returns:
+        dict | None: See `cache.BalanceCache.stats`, or None if no cache is enabled.
+    """
+    return None if _CACHE is None else _CACHE.stats()
+
+
+def account_count() -> int:
+    """
+    Return the number of accounts held in the store (or the backend).
+    """
+    return len(_STORAGE_BALANCE) if _BACKEND is None else _BACKEND.count()
+
+
+def reset() -> None:
+    """
+    Drop every account and restore the initial default balance (1000.00).
+    This only affects memory; an attached journal is left untouched, an
+    attached balance file is rewritten, and an attached backend is closed
+    and detached first (see `close_backend`).
+    """
+    global _SNAPSHOT_IDS
+    if _BACKEND is not None:
+        close_backend()
+        return
+    with _INDEX_LOCK:
+        del _STORAGE_BALANCE[:]
+        _ACCOUNT_INDEX.clear()
+        _SNAPSHOT_IDS = None
+    _STORAGE_BALANCE.append(_INITIAL_CENTS)
+    _ACCOUNT_INDEX[DEFAULT_ACCOUNT] = 0
+    if _CACHE is not None:
+        _CACHE.clear()
+    _reload_columns()
+
+
+reset()
@@ -0,0 +1,224 @@
+"""
+Deduplication module for the Account Management System.
+
+Clients that retry a CREDIT or DEBIT after a timeout cannot know whether
+the first attempt went through. This module provides the index that
+lets `operations` apply each idempotency key at most once: the result of
+every keyed operation is remembered, and a retry with the same key gets
+that result back instead of touching the balance again.
+
+The index is bounded twice: entries expire `ttl` seconds after they are
+recorded, and once `capacity` entries are held the oldest is dropped.
+A Bloom filter sits in front of it. Most keys are new, and the filter
+answers "never seen" for them without taking the index lock; it keeps
+two generations, rotated as the index turns over, so it never forgets a
+key the index still holds and stays sized for `capacity` keys however
+many pass through.
+"""
+
+import math
+import random
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+_MIX = 0x9E3779B97F4A7C15
+_MASK = (1 << 64) - 1
+
+LOCK_STRIPES = 64
+"""
+Number of key locks. Keys are spread over them by hash.
+"""
+
+_PATTERNS: dict[int, array] = {}
+"""
+For each number of hash functions, 4096 precomputed 64-bit words with
+that many bits set, indexed by the top 12 bits of a key hash.
+"""
+
+
+def _patterns(hashes: int) -> array:
+    """
+    Return (building it once) the bit pattern table for a number of hash functions.
+    """
+    table = _PATTERNS.get(hashes)
+    if table is None:
+        rng = random.Random(hashes)
+        table = array("Q", (sum(1 << b for b in rng.sample(range(64), hashes))
+                            for _ in range(1 << 12)))
+        _PATTERNS[hashes] = table
+    return table
+
+
+class BloomFilter:
+    """
+    Fixed-size set membership filter with no false negatives.
+    It is blocked: all the bits of a key fall in one 64-bit word, so a
+    lookup reads a single word and tests it against a precomputed bit
+    pattern instead of probing k scattered bits.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        """
+        Create an empty filter.
+        Args:
+            capacity (int): Number of keys the filter is sized for.
+            error_rate (float): Target false-positive rate once `capacity` keys are added.
+        """
+        bits = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        # Blocking costs some accuracy; a quarter more bits wins it back.
+        words = (bits + bits // 4 + 63) // 64
+        self.hashes = min(16, max(1, round(bits / max(1, capacity) * math.log(2))))
+        self.count = 0
+        self._words = array("Q", bytes(8 * words))
+        self._patterns = _patterns(self.hashes)
+
+    def add(self, key: Hashable) -> None:
+        """
+        Add a key to the filter.
+        """
+        h = (hash(key) * _MIX) & _MASK
+        self._words[h % len(self._words)] |= self._patterns[h >> 52]
+        self.count += 1
+
+    def __contains__(self, key: Hashable) -> bool:
+        """
+        Return False if the key was never added, True if it probably was.
+        """
+        h = (hash(key) * _MIX) & _MASK
+        pattern = self._patterns[h >> 52]
+        return self._words[h % len(self._words)] & pattern == pattern
+
+
+class DedupIndex:
+    """
+    Bounded, expiring map from idempotency key to the recorded outcome
+    of its operation, behind a Bloom filter.
+    """
+
+    def __init__(self, capacity: int = 1000000, ttl: float = 86400.0,
+                 clock: Callable[[], float] = time.monotonic, error_rate: float = 0.01):
+        """
+        Create an empty index.
+        Args:
+            capacity (int): Most keys remembered at once.
+            ttl (float): Seconds a key is remembered after it is recorded.
+            clock (Callable[[], float]): Returns the current time in seconds.
+            error_rate (float): False-positive rate of the Bloom filter.
+        Raises:
+            ValueError: If the capacity or the ttl is not positive.
+        """
+        if capacity <= 0 or ttl <= 0:
+            raise ValueError("Capacity and ttl must be positive.")
+        self.capacity = capacity
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.filtered = 0
+        self._clock = clock
+        self._error_rate = error_rate
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._filter = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(1, error_rate)
+        self._rotated = clock()
+
+    def __len__(self) -> int:
+        """
+        Return the number of remembered keys, including expired ones not yet swept.
+        """
+        return len(self._entries)
+
+    def lock_for(self, key: Hashable) -> threading.Lock:
+        """
+        Return the lock that serializes operations carrying a key, so two
+        concurrent attempts with one key cannot both be applied.
+        """
+        return self._key_locks[hash(key) % LOCK_STRIPES]
+
+    def lookup(self, key: Hashable) -> Any | None:
+        """
+        Return the outcome recorded for a key.
+        Args:
+            key (Hashable): The idempotency key.
+        Returns:
+            Any | None: The recorded outcome, or None if the key is unknown or expired.
+        """
+        if key not in self._filter and key not in self._previous:
+            self.filtered += 1
+            self.misses += 1
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def remember(self, key: Hashable, outcome: Any, age: float = 0.0) -> None:
+        """
+        Record the outcome of a key, dropping expired and, if full, the oldest keys.
+        Args:
+            key (Hashable): The idempotency key.
+            outcome (Any): What a retry with this key gets back.
+            age (float): Seconds since the outcome was first recorded, for keys
+                         restored after a restart; they expire that much sooner.
+        """
+        if age >= self.ttl:
+            return
+        with self._lock:
+            now = self._clock()
+            entries = self._entries
+            # Entries share one ttl, so they expire in insertion order.
+            while entries and next(iter(entries.values()))[0] <= now:
+                entries.popitem(last=False)
+            entries[key] = (now + self.ttl - age, outcome)
+            entries.move_to_end(key)
+            if len(entries) > self.capacity:
+                entries.popitem(last=False)
+            # Every held key was added within the last `capacity` keys and
+            # `ttl` seconds, so it is in one of the last two generations.
+            if self._filter.count >= self.capacity or now - self._rotated >= self.ttl:
+                self._previous = self._filter
+                self._filter = BloomFilter(self.capacity, self._error_rate)
+                self._rotated = now
+            self._filter.add(key)
+
+    def items(self) -> list[tuple[Hashable, Any]]:
+        """
+        Return every unexpired key with its outcome, oldest first.
+        """
+        with self._lock:
+            now = self._clock()
+            return [(key, outcome) for key, (expiry, outcome) in self._entries.items() if expiry > now]
+
+    def clear(self) -> None:
+        """
+        Forget every key. The counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._filter = BloomFilter(self.capacity, self._error_rate)
+            self._previous = BloomFilter(1, self._error_rate)
+            self._rotated = self._clock()
+
+    def stats(self) -> dict:
+        """
+        Return the index counters.
+        Returns:
+            dict: {"hits", "misses", "filtered", "size", "capacity", "ttl"};
+                  "filtered" counts the misses answered by the Bloom filter alone.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "filtered": self.filtered,
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "ttl": self.ttl,
+            }
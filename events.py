@@ -0,0 +1,398 @@
+"""
+Event store module for the Account Management System.
+
+In event-sourced mode (see `data.open_events`), every balance change is
+recorded as an event, a CREDIT or a DEBIT of some cents, and so is every
+debit refused for insufficient funds (OVERDRAFT). The event log is the
+source of truth: balances are a view of it, maintained as events are
+appended, and the store can be rebuilt from it at any time.
+
+Besides balances, the log maintains the views reporting needs, so no
+query ever scans raw events:
+- the credited and debited totals of every account per day (UTC);
+- the number of overdraft rejections of every account.
+Appending an event updates every view in O(1).
+
+Every view is a sum over events, so views are rebuilt in parallel: the
+log is cut into contiguous ranges, worker processes fold each range into
+partial views, and the partials are added up.
+
+The log is stored as parallel `array.array` columns (timestamp, account
+number, kind, cents), 25 bytes per event. Timestamps are integer
+nanoseconds since the epoch (`time.time_ns`).
+
+Given a path, the log is also written to a file, each event appended
+before the balance it changes is stored, and `sync` makes it durable.
+Opening the file again loads its events and rebuilds the views, so the
+balances survive a restart. Record layout (little-endian):
+    crc32 (uint32) | kind (int8) | id length (uint16) | timestamp (int64) |
+    cents (int64) | account id (utf-8)
+The CRC covers everything after itself. A torn or corrupt tail left by
+a crash is cut off on open.
+"""
+
+import datetime
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from typing import Callable, NamedTuple
+
+CREDIT = "CREDIT"
+DEBIT = "DEBIT"
+OVERDRAFT = "OVERDRAFT"
+
+KINDS = (CREDIT, DEBIT, OVERDRAFT)
+"""
+Event kinds, indexed by the code stored in the log.
+"""
+
+MAGIC = b"ACCTEVT1"
+"""
+File signature written at the start of every event log file.
+"""
+
+_CREDIT, _DEBIT, _OVERDRAFT = range(3)
+_HEADER = struct.Struct("<IbHqq")
+_NS_PER_DAY = 86400 * 10 ** 9
+_EPOCH = datetime.date(1970, 1, 1)
+
+
+class Event(NamedTuple):
+    """
+    One recorded event.
+    Attributes:
+        timestamp (int): When it happened, in nanoseconds since the epoch.
+        account (str): The account identifier.
+        kind (str): CREDIT, DEBIT or OVERDRAFT.
+        cents (int): The amount credited, debited or refused, in cents (positive).
+    """
+    timestamp: int
+    account: str
+    kind: str
+    cents: int
+
+
+class Views:
+    """
+    Materialized views of an event log, keyed by account number.
+    Attributes:
+        balances (dict[int, int]): Balance of every account, in cents.
+        credited (dict[tuple[int, int], int]): Cents credited per (account, day).
+        debited (dict[tuple[int, int], int]): Cents debited per (account, day).
+        rejections (dict[int, int]): Overdraft rejections per account.
+    Days are counted from the epoch (1970-01-01 is day 0).
+    """
+
+    def __init__(self):
+        self.balances: dict[int, int] = {}
+        self.credited: dict[tuple[int, int], int] = {}
+        self.debited: dict[tuple[int, int], int] = {}
+        self.rejections: dict[int, int] = {}
+
+    def apply(self, timestamp: int, number: int, kind: int, cents: int) -> None:
+        """
+        Update every view with one event, in O(1).
+        Args:
+            timestamp (int): When it happened, in nanoseconds since the epoch.
+            number (int): The account number.
+            kind (int): The event kind code (see `KINDS`).
+            cents (int): The amount, in cents.
+        """
+        if kind == _OVERDRAFT:
+            self.rejections[number] = self.rejections.get(number, 0) + 1
+            return
+        key = (number, timestamp // _NS_PER_DAY)
+        if kind == _CREDIT:
+            self.balances[number] = self.balances.get(number, 0) + cents
+            self.credited[key] = self.credited.get(key, 0) + cents
+        else:
+            self.balances[number] = self.balances.get(number, 0) - cents
+            self.debited[key] = self.debited.get(key, 0) + cents
+
+    def merge(self, other: "Views") -> None:
+        """
+        Add the views of another part of the log to these.
+        """
+        for mine, theirs in ((self.balances, other.balances), (self.credited, other.credited),
+                             (self.debited, other.debited), (self.rejections, other.rejections)):
+            for key, value in theirs.items():
+                mine[key] = mine.get(key, 0) + value
+
+    def __eq__(self, other) -> bool:
+        """
+        Views are equal when they hold the same sums (zero sums count as absent).
+        """
+        if not isinstance(other, Views):
+            return NotImplemented
+        return all({k: v for k, v in a.items() if v} == {k: v for k, v in b.items() if v}
+                   for a, b in ((self.balances, other.balances), (self.credited, other.credited),
+                                (self.debited, other.debited), (self.rejections, other.rejections)))
+
+
+def _encode(timestamp: int, account_id: str, kind: int, cents: int) -> bytes:
+    """
+    Encode one event record, including its CRC.
+    """
+    key = account_id.encode("utf-8")
+    body = _HEADER.pack(0, kind, len(key), timestamp, cents)[4:] + key
+    return struct.pack("<I", zlib.crc32(body)) + body
+
+
+def _scan(buf: bytes):
+    """
+    Decode the records of an event log image, stopping at the first bad record.
+    Args:
+        buf (bytes): The file contents, including the magic header.
+    Yields:
+        tuple[int, str, int, int, int]: The timestamp, account id, kind code,
+        cents, and the offset just past the record.
+    """
+    pos = len(MAGIC)
+    size = len(buf)
+    while pos + _HEADER.size <= size:
+        crc, kind, key_len, timestamp, cents = _HEADER.unpack_from(buf, pos)
+        end = pos + _HEADER.size + key_len
+        if end > size or zlib.crc32(buf[pos + 4:end]) != crc or not 0 <= kind < len(KINDS):
+            return
+        yield timestamp, buf[pos + _HEADER.size:end].decode("utf-8"), kind, cents, end
+        pos = end
+
+
+def _fold(columns: tuple[array, array, array, array]) -> Views:
+    """
+    Fold a range of the log into views (run in the rebuild worker processes).
+    Args:
+        columns (tuple[array, array, array, array]): The timestamp, account
+            number, kind and cents columns of the range.
+    Returns:
+        Views: The partial views of the range.
+    """
+    views = Views()
+    apply = views.apply
+    for event in zip(*columns):
+        apply(*event)
+    return views
+
+
+class EventLog:
+    """
+    Append-only log of balance events with incrementally maintained views.
+    """
+
+    def __init__(self, clock: Callable[[], int] = time.time_ns, path: str | None = None,
+                 workers: int | None = None):
+        """
+        Create a log, empty or loaded from a file.
+        Args:
+            clock (Callable[[], int]): Returns the current time in nanoseconds.
+            path (str | None): The file the log is kept in, created if missing;
+                               None keeps it in memory only.
+            workers (int | None): Worker processes rebuilding the views of the
+                                  events loaded from `path` (see `rebuild`).
+        Raises:
+            ValueError: If the file is not an event log.
+        """
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._time = array("q")
+        self._account = array("q")
+        self._kind = array("b")
+        self._cents = array("q")
+        self._ids: list[str] = []
+        self._numbers: dict[str, int] = {}
+        self.views = Views()
+        self.path = path
+        self._file = None
+        self._dirty = False
+        if path is not None:
+            self._load(path)
+            if len(self._time):
+                self.rebuild(workers)
+
+    def _load(self, path: str) -> None:
+        """
+        Read the valid events of a file into the columns, cut off any torn
+        tail, and open the file for appending.
+        """
+        valid = 0
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, "rb") as f:
+                buf = f.read()
+            if buf[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not an event log.")
+            valid = len(MAGIC)
+            for timestamp, account_id, kind, cents, valid in _scan(buf):
+                self._add(timestamp, self._number(account_id), kind, cents)
+        self._file = open(path, "a+b")
+        self._file.truncate(valid)
+        self._file.seek(0, os.SEEK_END)
+        if valid == 0:
+            self._file.write(MAGIC)
+            self._dirty = True
+            self.sync()
+
+    def sync(self) -> None:
+        """
+        Make every event appended so far durable. Does nothing for a log kept in memory.
+        """
+        with self._lock:
+            if not self._dirty or self._file is None:
+                return
+            self._file.flush()
+            self._dirty = False
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        """
+        Sync and close the file of the log, if any. The log stays readable.
+        """
+        self.sync()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __len__(self) -> int:
+        """
+        Return the number of recorded events.
+        """
+        return len(self._time)
+
+    def _number(self, account_id: str) -> int:
+        """
+        Return the account number of an account, numbering it if it is new.
+        """
+        number = self._numbers.get(account_id)
+        if number is None:
+            number = self._numbers[account_id] = len(self._ids)
+            self._ids.append(account_id)
+        return number
+
+    def _add(self, timestamp: int, number: int, kind: int, cents: int) -> None:
+        self._time.append(timestamp)
+        self._account.append(number)
+        self._kind.append(kind)
+        self._cents.append(cents)
+
+    def _append(self, account_id: str, kind: int, cents: int) -> int:
+        with self._lock:
+            number = self._number(account_id)
+            now = self._clock()
+            if self._file is not None:
+                self._file.write(_encode(now, account_id, kind, cents))
+                self._dirty = True
+            self._add(now, number, kind, cents)
+            self.views.apply(now, number, kind, cents)
+            return self.views.balances.get(number, 0)
+
+    def change(self, account_id: str, delta: int) -> int:
+        """
+        Record a balance change as a CREDIT or DEBIT event. Zero changes are not recorded.
+        Args:
+            account_id (str): The account identifier.
+            delta (int): The change of balance, in cents.
+        Returns:
+            int: The balance of the account in the balances view, the event included.
+        """
+        if delta > 0:
+            return self._append(account_id, _CREDIT, delta)
+        if delta < 0:
+            return self._append(account_id, _DEBIT, -delta)
+        return self.balance(account_id)
+
+    def reject(self, account_id: str, cents: int) -> None:
+        """
+        Record a debit refused for insufficient funds.
+        Args:
+            account_id (str): The account identifier.
+            cents (int): The amount refused, in cents.
+        """
+        self._append(account_id, _OVERDRAFT, cents)
+
+    def events(self, start: int = 0, stop: int | None = None) -> list[Event]:
+        """
+        Return raw events by position, for audits and exports.
+        Args:
+            start (int): Position of the first event.
+            stop (int | None): Position after the last event, or None for the end.
+        Returns:
+            list[Event]: The events, oldest first.
+        """
+        stop = len(self._time) if stop is None else stop
+        return [Event(self._time[i], self._ids[self._account[i]], KINDS[self._kind[i]], self._cents[i])
+                for i in range(start, min(stop, len(self._time)))]
+
+    def balance(self, account_id: str) -> int:
+        """
+        Return the balance of an account from the balances view, in cents (0 if unknown).
+        """
+        number = self._numbers.get(account_id)
+        return 0 if number is None else self.views.balances.get(number, 0)
+
+    def daily_totals(self, account_id: str, day: datetime.date) -> tuple[int, int]:
+        """
+        Return what was credited to and debited from an account on one day.
+        Args:
+            account_id (str): The account identifier.
+            day (datetime.date): The day, in UTC.
+        Returns:
+            tuple[int, int]: The credited and debited totals, in cents.
+        """
+        number = self._numbers.get(account_id)
+        if number is None:
+            return 0, 0
+        key = (number, (day - _EPOCH).days)
+        return self.views.credited.get(key, 0), self.views.debited.get(key, 0)
+
+    def rejections(self, account_id: str) -> int:
+        """
+        Return how many debits of an account were refused for insufficient funds.
+        """
+        number = self._numbers.get(account_id)
+        return 0 if number is None else self.views.rejections.get(number, 0)
+
+    def accounts(self) -> list[str]:
+        """
+        Return every account with recorded events, by account number.
+        """
+        return list(self._ids)
+
+    def rebuild(self, workers: int | None = None) -> Views:
+        """
+        Recompute every view from the raw events and install the result.
+        The events are folded without holding the log: events appended
+        meanwhile are folded in before the views are installed. Worker
+        processes are spawned, not forked, so they inherit no lock or
+        thread of this process.
+        Args:
+            workers (int | None): Worker processes folding ranges of the log in
+                                  parallel; 1 folds in this process. Defaults
+                                  to the number of CPUs.
+        Returns:
+            Views: The rebuilt views.
+        """
+        columns = (self._time, self._account, self._kind, self._cents)
+        with self._lock:
+            n = len(self._time)
+            workers = min(workers or os.cpu_count() or 1, max(1, n))
+            step = -(-n // workers) or 1
+            ranges = [tuple(c[i:i + step] for c in columns) for i in range(0, n, step)]
+        views = Views()
+        if workers == 1:
+            for part in ranges:
+                views.merge(_fold(part))
+        else:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                for part in pool.map(_fold, ranges):
+                    views.merge(part)
+        with self._lock:
+            for i in range(n, len(self._time)):
+                views.apply(self._time[i], self._account[i], self._kind[i], self._cents[i])
+            self.views = views
+        return views
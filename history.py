@@ -0,0 +1,151 @@
+"""
+History module for the Account Management System.
+
+This module keeps an append-only, in-memory log of every balance change
+so past states can be queried: the statement of an account between two
+times, or its balance as of a given time.
+
+The log is stored as parallel `array.array` columns (timestamp, account
+number, delta, balance after), about 32 bytes per posting. Timestamps
+never decrease, so the timestamp column is itself a sorted index, and
+every account keeps the sorted positions of its own postings. Range and
+as-of queries are binary searches over those indexes, never log scans.
+Timestamps are integer nanoseconds since the epoch (`time.time_ns`).
+"""
+
+import bisect
+import threading
+import time
+from array import array
+from typing import Callable, NamedTuple
+
+
+class Entry(NamedTuple):
+    """
+    One recorded balance change.
+    Attributes:
+        timestamp (int): When the change happened, in nanoseconds since the epoch.
+        account (str): The account identifier.
+        delta (int): The change of balance, in cents.
+        balance (int): The balance after the change, in cents.
+    """
+    timestamp: int
+    account: str
+    delta: int
+    balance: int
+
+
+class History:
+    """
+    Append-only log of balance changes, indexed by account and timestamp.
+    """
+
+    def __init__(self, clock: Callable[[], int] = time.time_ns):
+        """
+        Create an empty history.
+        Args:
+            clock (Callable[[], int]): Returns the current time in nanoseconds.
+        """
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._time = array("q")
+        self._account = array("q")
+        self._delta = array("q")
+        self._balance = array("q")
+        self._ids: list[str] = []
+        self._numbers: dict[str, int] = {}
+        self._positions: list[array] = []
+
+    def __len__(self) -> int:
+        """
+        Return the number of recorded changes.
+        """
+        return len(self._time)
+
+    def record(self, account_id: str, delta: int, balance: int) -> None:
+        """
+        Append a balance change, timestamped now.
+        If the clock went backwards, the last timestamp is reused so the log stays sorted.
+        Args:
+            account_id (str): The account identifier.
+            delta (int): The change of balance, in cents.
+            balance (int): The balance after the change, in cents.
+        """
+        with self._lock:
+            number = self._numbers.get(account_id)
+            if number is None:
+                number = self._numbers[account_id] = len(self._ids)
+                self._ids.append(account_id)
+                self._positions.append(array("q"))
+            now = self._clock()
+            if self._time and now < self._time[-1]:
+                now = self._time[-1]
+            self._positions[number].append(len(self._time))
+            self._time.append(now)
+            self._account.append(number)
+            self._delta.append(delta)
+            self._balance.append(balance)
+
+    def _entry(self, position: int) -> Entry:
+        return Entry(self._time[position], self._ids[self._account[position]],
+                     self._delta[position], self._balance[position])
+
+    def _span(self, positions, start: int | None, end: int | None) -> range:
+        """
+        Return the indexes of `positions` whose timestamps lie in [start, end].
+        """
+        key = self._time.__getitem__
+        lo = 0 if start is None else bisect.bisect_left(positions, start, key=key)
+        hi = len(positions) if end is None else bisect.bisect_right(positions, end, key=key)
+        return range(lo, hi)
+
+    def statement(self, account_id: str, start: int | None = None,
+                  end: int | None = None) -> list[Entry]:
+        """
+        Return the changes of one account between two times, oldest first.
+        Args:
+            account_id (str): The account identifier.
+            start (int | None): Earliest timestamp included, or None for no limit.
+            end (int | None): Latest timestamp included, or None for no limit.
+        Returns:
+            list[Entry]: The matching changes.
+        """
+        number = self._numbers.get(account_id)
+        if number is None:
+            return []
+        positions = self._positions[number]
+        return [self._entry(positions[i]) for i in self._span(positions, start, end)]
+
+    def between(self, start: int | None = None, end: int | None = None) -> list[Entry]:
+        """
+        Return the changes of every account between two times, oldest first.
+        Args:
+            start (int | None): Earliest timestamp included, or None for no limit.
+            end (int | None): Latest timestamp included, or None for no limit.
+        Returns:
+            list[Entry]: The matching changes.
+        """
+        lo = 0 if start is None else bisect.bisect_left(self._time, start)
+        hi = len(self._time) if end is None else bisect.bisect_right(self._time, end)
+        return [self._entry(position) for position in range(lo, hi)]
+
+    def balance_as_of(self, account_id: str, when: int) -> int | None:
+        """
+        Return the balance of an account at a given time.
+        Args:
+            account_id (str): The account identifier.
+            when (int): The time, in nanoseconds since the epoch.
+        Returns:
+            int | None: The balance in cents after the last change at or before
+            `when` (or before the first recorded change), or None if the
+            account has no recorded change.
+        """
+        number = self._numbers.get(account_id)
+        if number is None:
+            return None
+        positions = self._positions[number]
+        i = bisect.bisect_right(positions, when, key=self._time.__getitem__)
+        if i == 0:
+            first = positions[0]
+            return self._balance[first] - self._delta[first]
+        return self._balance[positions[i - 1]]
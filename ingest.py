@@ -0,0 +1,279 @@
+"""
+Streaming ingestion module for the Account Management System.
+
+This module applies a transactions file (CSV or JSONL) through the
+`operations` batch API and writes every outcome to a results file or a
+rejects file. The input is read line by line through a generator
+pipeline and processed in fixed-size chunks, so memory use stays
+constant whatever the size of the file.
+
+Input formats:
+- CSV: one `operation,account,amount` row per line, with a fourth
+  `target` column for TRANSFER and an optional fifth `key` column (the
+  target left empty if there is none). An optional header row starting
+  with `operation` is skipped. The amount may be omitted for TOTAL.
+- JSONL: one `{"operation": ..., "account": ..., "amount": ...}` object
+  per line, plus `"target"` for TRANSFER and an optional `"key"`.
+
+Amounts are parsed strictly by `amounts.parse_column`, a chunk at a
+time: a feed carries exact amounts, so "1e3", "+5" or "1.005" are
+rejected (INVALID_AMOUNT, or NOT_POSITIVE) with the reason, instead of
+being rounded as at the interactive prompts.
+
+A record with an idempotency key is applied at most once: ingesting a
+file again reports the first outcome of its keyed records without
+applying them twice (see `operations`).
+
+Output files are CSV:
+- results: `line,operation,account,balance` for every applied record.
+- rejects: `line,status,record` for every rejected or malformed record,
+  plus a fourth `reason` column for FAILED records (the error raised)
+  and for rejected amounts (see `amounts.MESSAGES`).
+
+A record whose operation raises is rejected as FAILED; the records
+around it are applied and reported as usual.
+"""
+
+import csv
+import json
+import time
+from decimal import Decimal
+from itertools import islice
+from typing import IO, Iterable, Iterator, NamedTuple
+
+import amounts
+import data
+import operations
+
+MALFORMED = "MALFORMED"
+"""
+Reject status for lines that cannot be decoded into a record.
+"""
+
+CHUNK_SIZE = 4096
+"""
+Number of records applied and written per chunk.
+"""
+
+
+class IngestStats(NamedTuple):
+    """
+    Summary of an ingestion run.
+    Attributes:
+        records (int): Number of input lines processed.
+        applied (int): Number of records applied successfully.
+        rejected (int): Number of rejected or malformed records.
+        seconds (float): Wall-clock duration of the run.
+    """
+    records: int
+    applied: int
+    rejected: int
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        """
+        Throughput of the run in records per second.
+        """
+        return self.records / self.seconds if self.seconds > 0 else 0.0
+
+
+def detect_format(path: str) -> str:
+    """
+    Guess the input format from a file name.
+    Args:
+        path (str): The input file path.
+    Returns:
+        str: "jsonl" for .jsonl/.ndjson/.json files, "csv" otherwise.
+    """
+    lowered = path.lower()
+    if lowered.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    return "csv"
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[tuple[int, tuple | None, str]]:
+    """
+    Decode CSV lines into operation records.
+    Args:
+        lines (Iterable[str]): The raw input lines.
+    Yields:
+        tuple[int, tuple | None, str]: The line number, the
+        (operation, account, amount[, target[, key]]) record or None if
+        the line is malformed, and the raw line.
+    """
+    for lineno, line in enumerate(lines, 1):
+        raw = line.rstrip("\r\n")
+        if not raw.strip():
+            continue
+        row = raw.split(",") if '"' not in raw else next(csv.reader((raw,)))
+        if lineno == 1 and row[0].strip().lower() == "operation":
+            continue
+        if len(row) == 2:
+            row.append(None)
+        if len(row) == 5:
+            record = (row[0], row[1].strip() or data.DEFAULT_ACCOUNT, row[2], row[3])
+            key = row[4].strip()
+            yield lineno, record + (key,) if key else record, raw
+            continue
+        if len(row) == 4:
+            yield lineno, (row[0], row[1].strip() or data.DEFAULT_ACCOUNT, row[2], row[3]), raw
+            continue
+        if len(row) != 3:
+            yield lineno, None, raw
+            continue
+        yield lineno, (row[0], row[1].strip() or data.DEFAULT_ACCOUNT, row[2]), raw
+
+
+def read_jsonl(lines: Iterable[str]) -> Iterator[tuple[int, tuple | None, str]]:
+    """
+    Decode JSONL lines into operation records.
+    Numbers are parsed as `Decimal` so amounts are never rounded through floats.
+    Args:
+        lines (Iterable[str]): The raw input lines.
+    Yields:
+        tuple[int, tuple | None, str]: The line number, the
+        (operation, account, amount[, target[, key]]) record or None if
+        the line is malformed, and the raw line.
+    """
+    for lineno, line in enumerate(lines, 1):
+        raw = line.rstrip("\r\n")
+        if not raw.strip():
+            continue
+        try:
+            obj = json.loads(raw, parse_float=Decimal)
+            record = (
+                obj["operation"],
+                str(obj.get("account") or data.DEFAULT_ACCOUNT),
+                obj.get("amount"),
+            )
+            key = obj.get("key")
+            if "target" in obj or key is not None:
+                record += (obj.get("target"),)
+            if key is not None:
+                record += (str(key),)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            yield lineno, None, raw
+            continue
+        if not isinstance(record[0], str):
+            yield lineno, None, raw
+            continue
+        yield lineno, record, raw
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+
+def _chunks(items: Iterator, size: int) -> Iterator[list]:
+    """
+    Split an iterator into lists of at most `size` items.
+    """
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _strict_cents(batch: list[tuple]) -> tuple[list[tuple], dict[int, str]]:
+    """
+    Replace the amount of every record that takes one by its strictly parsed
+    cents (see `amounts.parse_column`). Records whose amount is rejected are
+    answered here: their index maps to the reason.
+    """
+    indexes = []
+    column = []
+    for i, record in enumerate(batch):
+        entry = operations.lookup(record[0])
+        if entry is None or entry.name == "TOTAL":
+            continue
+        amount = record[2]
+        if type(amount) is not str:
+            amount = "" if amount is None else str(amount)
+        indexes.append(i)
+        column.append(amount.encode("utf-8"))
+    records = list(batch)
+    reasons = {}
+    for i, cents, status in zip(indexes, *amounts.parse_column(column)):
+        if cents is None:
+            reasons[i] = status
+        else:
+            record = records[i]
+            records[i] = record[:2] + (cents,) + record[3:]
+    return records, reasons
+
+
+def ingest(source: IO[str], results: IO[str], rejects: IO[str],
+           fmt: str = "csv", chunk_size: int = CHUNK_SIZE) -> IngestStats:
+    """
+    Stream transactions from `source` through the operations layer.
+    Args:
+        source (IO[str]): The input file, read line by line.
+        results (IO[str]): Where applied records are written.
+        rejects (IO[str]): Where rejected and malformed records are written.
+        fmt (str): "csv" or "jsonl".
+        chunk_size (int): Number of records applied per batch.
+    Returns:
+        IngestStats: Counts and duration of the run.
+    """
+    reader = READERS[fmt]
+    results_out = csv.writer(results, lineterminator="\n")
+    rejects_out = csv.writer(rejects, lineterminator="\n")
+    results_out.writerow(("line", "operation", "account", "balance"))
+    rejects_out.writerow(("line", "status", "record"))
+    records = applied = 0
+    start = time.perf_counter()
+    for chunk in _chunks(reader(source), chunk_size):
+        batch, reasons = _strict_cents([record for _, record, _ in chunk if record is not None])
+        errors = {}
+        outcomes = iter(operations.apply_batch_cents(
+            [record for i, record in enumerate(batch) if i not in reasons], errors.__setitem__))
+        index = applied_index = 0
+        ok_rows = []
+        reject_rows = []
+        for lineno, record, raw in chunk:
+            if record is None:
+                reject_rows.append((lineno, MALFORMED, raw))
+                continue
+            if index in reasons:
+                reason = reasons[index]
+                status = operations.NOT_POSITIVE if reason == amounts.NOT_POSITIVE else operations.INVALID_AMOUNT
+                reject_rows.append((lineno, status, raw, amounts.MESSAGES[reason]))
+                index += 1
+                continue
+            result = next(outcomes)
+            if result.status == operations.OK:
+                ok_rows.append((lineno, record[0].strip().upper(), record[1],
+                                f"{data.from_cents(result.balance):.2f}"))
+            elif applied_index in errors:
+                exc = errors[applied_index]
+                reject_rows.append((lineno, result.status, raw, f"{type(exc).__name__}: {exc}"))
+            else:
+                reject_rows.append((lineno, result.status, raw))
+            index += 1
+            applied_index += 1
+        results_out.writerows(ok_rows)
+        rejects_out.writerows(reject_rows)
+        records += len(chunk)
+        applied += len(ok_rows)
+    return IngestStats(records, applied, records - applied,
+                       time.perf_counter() - start)
+
+
+def ingest_file(path: str, results_path: str, rejects_path: str,
+                fmt: str | None = None) -> IngestStats:
+    """
+    Stream a transactions file and write the results and rejects files.
+    Args:
+        path (str): The input file path.
+        results_path (str): The results file path.
+        rejects_path (str): The rejects file path.
+        fmt (str | None): "csv" or "jsonl"; guessed from `path` if None.
+    Returns:
+        IngestStats: Counts and duration of the run.
+    """
+    fmt = fmt or detect_format(path)
+    with open(path, encoding="utf-8", newline="") as source, \
+            open(results_path, "w", encoding="utf-8", newline="") as results, \
+            open(rejects_path, "w", encoding="utf-8", newline="") as rejects:
+        return ingest(source, results, rejects, fmt)
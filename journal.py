@@ -0,0 +1,355 @@
+"""
+Journal module for the Account Management System.
+
+This module provides a durable, append-only write-ahead journal of
+balance mutations. Every record holds the absolute balance of one
+account (in cents) after a write, so replaying a journal in order
+rebuilds the store, and replaying a record twice is harmless.
+
+Writes are made durable with group commit: records are appended to a
+buffered file, and a single `fsync` covers every record appended since
+the previous one. While several callers are waiting on durability, a
+commit is issued as soon as `max_batch` records are pending or the
+oldest pending record is `max_delay` seconds old, so they share fsyncs
+instead of paying one each.
+
+Record layout (little-endian):
+    crc32 (uint32) | id length (uint16) | cents (int64) | account id (utf-8)
+The CRC covers everything after itself. A torn or corrupt tail left by
+a crash is detected on open and cut off.
+
+`append_group` frames several records as one, under the reserved id
+"\x00group" with the byte length of the framed records that follow it
+as its cents; the CRC covers them too, so they replay together or not
+at all.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Iterator
+
+MAGIC = b"ACCTJRN1"
+"""
+File signature written at the start of every journal.
+"""
+
+_HEADER = struct.Struct("<IHq")
+_GROUP = b"\x00group"
+
+
+def _frame(key: bytes, cents: int, payload: bytes = b"") -> bytes:
+    """
+    Frame one record, followed by the payload of a group, with its CRC.
+    Raises:
+        ValueError: If the key is longer than 65535 bytes.
+    """
+    if len(key) > 0xFFFF:
+        raise ValueError("Account ids longer than 65535 bytes cannot be journaled.")
+    body = _HEADER.pack(0, len(key), cents)[4:] + key + payload
+    return struct.pack("<I", zlib.crc32(body)) + body
+
+
+def _encode(account_id: str, cents: int) -> bytes:
+    """
+    Encode one journal record.
+    Args:
+        account_id (str): The account whose balance changed.
+        cents (int): The new balance in cents.
+    Returns:
+        bytes: The framed record, including its CRC.
+    Raises:
+        ValueError: If the account id is longer than 65535 bytes, or starts
+                    like a group.
+    """
+    key = account_id.encode("utf-8")
+    if key.startswith(_GROUP):
+        raise ValueError("Account ids starting with \\x00group are reserved.")
+    return _frame(key, cents)
+
+
+def _scan(buf, pos: int = len(MAGIC), size: int | None = None) -> Iterator[tuple[str, int, int]]:
+    """
+    Decode the records of a journal image, stopping at the first bad record.
+    The records of a group are yielded one by one, each with the end of the group.
+    Args:
+        buf (bytes | mmap.mmap): The journal contents, including the magic header.
+        pos (int): Offset of the first record.
+        size (int | None): Offset past the last record; defaults to the end of `buf`.
+    Yields:
+        tuple[str, int, int]: The account id, the balance in cents, and the
+        offset just past the record.
+    """
+    size = len(buf) if size is None else size
+    while pos + _HEADER.size <= size:
+        crc, key_len, cents = _HEADER.unpack_from(buf, pos)
+        start = pos + _HEADER.size
+        end = start + key_len
+        group = end <= size and buf[start:end] == _GROUP
+        if group:
+            end = end + cents if cents >= 0 else size + 1
+        if end > size or zlib.crc32(buf[pos + 4:end]) != crc:
+            return
+        if group:
+            for account_id, member_cents, _ in _scan(buf, start + len(_GROUP), end):
+                yield account_id, member_cents, end
+        else:
+            yield buf[start:end].decode("utf-8"), cents, end
+        pos = end
+
+
+def _records(path: str) -> Iterator[tuple[str, int, int]]:
+    """
+    Map a journal file and decode its valid records.
+    Args:
+        path (str): The journal file path.
+    Yields:
+        tuple[str, int, int]: The account id, the balance in cents, and the
+        offset just past the record.
+    Raises:
+        ValueError: If the file is not a journal.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        if buf[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an account journal.")
+        yield from _scan(buf)
+
+
+def replay(path: str) -> Iterator[tuple[str, int]]:
+    """
+    Read the valid records of a journal file in order.
+    Args:
+        path (str): The journal file path.
+    Yields:
+        tuple[str, int]: The account id and its balance in cents.
+    Raises:
+        ValueError: If the file is not a journal.
+    """
+    for account_id, cents, _ in _records(path):
+        yield account_id, cents
+
+
+def _valid_length(path: str) -> int:
+    """
+    Return the length of the valid prefix of a journal file (0 if missing or empty).
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return 0
+    end = len(MAGIC)
+    for _, _, end in _records(path):
+        pass
+    return end
+
+
+def _sync_directory(path: str) -> None:
+    """
+    Fsync the directory holding `path`, so a rename into it survives a crash.
+    """
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+class Journal:
+    """
+    Append-only balance journal with group commit.
+
+    `append` is cheap and never waits for the disk. `commit` blocks until
+    every record appended so far is on stable storage; a lone caller syncs
+    immediately, while concurrent callers are batched into one fsync. A
+    background thread also commits pending records after `max_delay`, so
+    unacknowledged writes never stay volatile for long.
+    """
+
+    def __init__(self, path: str, max_batch: int = 256, max_delay: float = 0.002):
+        """
+        Open (or create) a journal for appending.
+        Args:
+            path (str): The journal file path.
+            max_batch (int): Pending records that force an immediate commit.
+            max_delay (float): Maximum age in seconds of a pending record
+                               before it is committed.
+        """
+        self.path = path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        valid = _valid_length(path)
+        self._file = open(path, "a+b")
+        self._file.truncate(valid)
+        self._file.seek(0, os.SEEK_END)
+        if valid == 0:
+            self._file.write(MAGIC)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            _sync_directory(path)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._seq = 0
+        self._durable = 0
+        self._pending_since = 0.0
+        self._waiters = 0
+        self._closed = False
+        self._flusher = threading.Thread(target=self._run_flusher, name="journal-flusher", daemon=True)
+        self._flusher.start()
+
+    @property
+    def durable_seq(self) -> int:
+        """
+        Sequence number of the last record known to be on stable storage.
+        """
+        return self._durable
+
+    def append(self, account_id: str, cents: int) -> int:
+        """
+        Append a balance record without waiting for the disk.
+        Args:
+            account_id (str): The account whose balance changed.
+            cents (int): The new balance in cents.
+        Returns:
+            int: The sequence number of the record, to pass to `commit`.
+        """
+        return self._write(_encode(account_id, cents))
+
+    def _write(self, record: bytes) -> int:
+        """
+        Append a framed record (see `append`).
+        """
+        with self._lock:
+            if self._closed:
+                raise ValueError("Journal is closed.")
+            self._file.write(record)
+            self._seq += 1
+            seq = self._seq
+            if seq - 1 == self._durable:
+                self._pending_since = time.monotonic()
+                self._cond.notify_all()
+            full = seq - self._durable >= self.max_batch
+        if full:
+            self._sync()
+        return seq
+
+    def append_group(self, records: list[tuple[str, int]]) -> int:
+        """
+        Append several balance records as one: after a crash, the journal
+        replays all of them or none.
+        Args:
+            records (list[tuple[str, int]]): (account id, new balance in cents) pairs.
+        Returns:
+            int: The sequence number of the group, to pass to `commit`.
+        Raises:
+            ValueError: If an account id cannot be journaled (see `_encode`).
+        """
+        payload = b"".join(_encode(account_id, cents) for account_id, cents in records)
+        return self._write(_frame(_GROUP, len(payload), payload))
+
+    def commit(self, seq: int | None = None) -> None:
+        """
+        Block until a record (by default, every record appended so far) is durable.
+        Args:
+            seq (int | None): The sequence number returned by `append`.
+        """
+        with self._lock:
+            target = self._seq if seq is None else seq
+            if self._durable >= target:
+                return
+            self._waiters += 1
+            try:
+                # A lone committer syncs at once; with siblings, wait for the
+                # group to fill up or age out so one fsync covers them all.
+                while self._waiters > 1 and self._durable < target:
+                    remaining = self._pending_since + self.max_delay - time.monotonic()
+                    if self._seq - self._durable >= self.max_batch or remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            finally:
+                self._waiters -= 1
+            if self._durable >= target:
+                return
+        self._sync()
+
+    def _sync(self) -> None:
+        """
+        Flush and fsync every pending record as one group.
+        """
+        with self._sync_lock:
+            with self._lock:
+                target = self._seq
+                if target == self._durable or self._closed:
+                    return
+                self._file.flush()
+            os.fsync(self._file.fileno())
+            with self._lock:
+                self._durable = max(self._durable, target)
+                if self._seq > self._durable:
+                    self._pending_since = time.monotonic()
+                self._cond.notify_all()
+
+    def _run_flusher(self) -> None:
+        """
+        Commit pending records once they reach `max_delay`.
+        """
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                if self._seq == self._durable:
+                    self._cond.wait()
+                    continue
+                remaining = self._pending_since + self.max_delay - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+            self._sync()
+
+    def mark(self) -> int:
+        """
+        Return the current end of the journal, to pass to `discard_before`.
+        Every record appended so far lies before the returned offset.
+        """
+        with self._lock:
+            self._file.flush()
+            return self._file.tell()
+
+    def discard_before(self, offset: int) -> None:
+        """
+        Drop the records that precede `offset`, keeping any later ones.
+        Used after a snapshot has captured their effect. The remaining
+        records are copied to a new file that atomically replaces the journal.
+        Args:
+            offset (int): An offset previously returned by `mark`.
+        """
+        self._sync()
+        with self._sync_lock, self._lock:
+            self._file.flush()
+            self._file.seek(offset)
+            tail = self._file.read()
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(MAGIC)
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            _sync_directory(self.path)
+            self._file.close()
+            self._file = open(self.path, "a+b")
+            self._file.seek(0, os.SEEK_END)
+
+    def close(self) -> None:
+        """
+        Commit pending records and close the file.
+        """
+        self._sync()
+        with self._lock:
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join()
+        self._file.close()
@@ -7,13 +7,295 @@ This script runs the interactive menu that allows the user to:
 - Debit the account
 - Exit the program
 
-It delegates the actual operations to the `operations` module.
+It delegates the actual operations to the `operations` module. When
+stdin is not a terminal (`python3 main.py < script`), the menu and the
+prompts are not drawn and the results are written in batches.
+
+It can also run non-interactively to stream a transactions file:
+
+    python3 main.py ingest transactions.csv --results results.csv --rejects rejects.csv
+
+post the interest and fees of a rate schedule to every account (see
+the `accrual` module):
+
+    python3 main.py --journal bank.journal accrue --tier 0:0:1.50 --tier 1000:0.001
+
+print the balance of one account, the one-shot query of cron jobs and
+scripts:
+
+    python3 main.py --journal bank.journal total ACCOUNT
+
+or serve the operations to network clients (see the `server` module):
+
+    python3 main.py serve --port 7070
+
+Balance changes can be made durable with `--journal PATH`, which also
+replays the journal at startup. With `--snapshot PATH`, the store is
+periodically saved to a snapshot and startup only replays the journal
+written since. `--sqlite PATH` keeps the balances in a SQLite database
+instead (see the `storage` module). `--balance-file PATH` keeps a
+memory-mapped columnar copy of the balances for reporting jobs (see the
+`columnar` module). `--metrics PATH` collects operation
+counters and latencies and writes them there, in the Prometheus text
+format, on exit.
+
+Startup is kept lean: optional subsystems (storage backends, parsers,
+metrics, even `operations` and `argparse`) are imported only by the
+commands that use them, and the `bench.py --startup` budget is enforced
+by the test suite.
+"""
+
+import os
+import sys
+
+MENU = {
+    "1": ("View Balance", "TOTAL"),
+    "2": ("Credit Account", "CREDIT"),
+    "3": ("Debit Account", "DEBIT"),
+}
+"""
+Menu choices: the label shown and the operation run (see `operations.register`).
 """
 
-import operations
+PIPED_BATCH = 256
+"""
+Menu choices whose output is written at once when the menu reads from a pipe.
+"""
+
+_STORE_OPTIONS = ("--journal", "--snapshot", "--sqlite")
+"""
+Options understood by the argparse-free `total` fast path.
+"""
 
 
-def main() -> None:
+def __getattr__(name: str):
+    """
+    Import `operations` on first use, so commands that do not run operations
+    (such as `total`) skip it and the `typing` machinery it loads.
+    """
+    if name == "operations":
+        import operations
+        return operations
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _piped() -> bool:
+    """
+    Return True if stdin is a pipe or a file rather than a terminal.
+    """
+    try:
+        return not os.isatty(sys.stdin.fileno())
+    except (AttributeError, OSError, ValueError):
+        # Replaced stdin without a descriptor (e.g. under test): keep the menu.
+        return False
+
+
+def _run_piped(source, sink, batch: int = PIPED_BATCH) -> None:
+    """
+    Run menu choices read from a script instead of a person: the menu and
+    the prompts are not shown, and the results (the same lines the menu
+    prints) are collected in one buffer written to `sink` every `batch`
+    choices. The end of the input exits like choice 4.
+    Args:
+        source (IO[str]): The choices and answers, one per line.
+        sink (IO[str]): Where the results are written.
+        batch (int): Number of choices per write.
+    """
+    import contextlib
+    import io
+    import operations
+
+    def read_answer() -> str:
+        line = source.readline()
+        if not line:
+            raise EOFError
+        return line.rstrip("\r\n")
+
+    buffer = io.StringIO()
+    pending = 0
+    operations._READ_ANSWER = read_answer
+    try:
+        with contextlib.redirect_stdout(buffer):
+            while True:
+                try:
+                    user_choice = read_answer().strip()
+                    if user_choice in MENU:
+                        operations.execute(MENU[user_choice][1])
+                    elif user_choice == "4":
+                        break
+                    else:
+                        print("Invalid choice, please select 1-4.")
+                except EOFError:
+                    break
+                pending += 1
+                if pending >= batch:
+                    sink.write(buffer.getvalue())
+                    sink.flush()
+                    buffer.seek(0)
+                    buffer.truncate()
+                    pending = 0
+            print("Exiting the program. Goodbye!")
+    finally:
+        operations._READ_ANSWER = None
+        sink.write(buffer.getvalue())
+        sink.flush()
+
+
+def _print_total(account_id: str | None) -> None:
+    """
+    Print the balance of an account (the default account if None).
+    """
+    import data
+
+    balance = data.read_balance(account_id or data.DEFAULT_ACCOUNT)
+    print(f"Current balance: {balance:.2f}")
+
+
+def _run_total(argv: list[str]) -> bool:
+    """
+    Run `[--journal PATH] [--snapshot PATH] [--sqlite PATH] total [ACCOUNT]`
+    without loading argparse, for one-shot balance queries.
+    Args:
+        argv (list[str]): The command-line arguments.
+    Returns:
+        bool: False, having done nothing, for any other command line.
+    """
+    options = {}
+    i = 0
+    while i + 1 < len(argv) and argv[i] in _STORE_OPTIONS:
+        options[argv[i]] = argv[i + 1]
+        i += 2
+    rest = argv[i:]
+    if (not rest or rest[0] != "total" or len(rest) > 2
+            or any(arg.startswith("-") for arg in rest[1:])
+            or ("--journal" in options and "--sqlite" in options)):
+        return False
+    import data
+
+    try:
+        if "--sqlite" in options:
+            import storage
+            data.open_backend(storage.SQLiteBackend(options["--sqlite"]))
+        if "--journal" in options:
+            data.open_journal(options["--journal"], snapshot_path=options.get("--snapshot"))
+        _print_total(rest[1] if len(rest) == 2 else None)
+    finally:
+        data.close_journal()
+        data.close_backend()
+    return True
+
+
+def _run_cli(argv: list[str]) -> None:
+    """
+    Run the mode selected by command-line arguments.
+    Args:
+        argv (list[str]): The command-line arguments, e.g. ["ingest", "file.csv"].
+    """
+    import argparse
+    import data
+
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Account Management System. Runs the interactive menu unless a command is given.",
+    )
+    parser.add_argument("--journal", metavar="PATH",
+                        help="replay this journal at startup and journal every balance change to it")
+    parser.add_argument("--commit-batch", type=int, default=256, metavar="N",
+                        help="pending journal writes that force a group commit (default: 256)")
+    parser.add_argument("--commit-delay", type=float, default=2.0, metavar="MS",
+                        help="maximum milliseconds a journal write waits for a group commit (default: 2)")
+    parser.add_argument("--snapshot", metavar="PATH",
+                        help="load this snapshot at startup (before the journal) and checkpoint to it")
+    parser.add_argument("--checkpoint-every", type=int, default=100000, metavar="N",
+                        help="snapshot the store and compact the journal every N writes (default: 100000)")
+    parser.add_argument("--cache", type=int, default=0, metavar="N",
+                        help="serve balance reads from an LRU cache of N accounts (default: 0, disabled)")
+    parser.add_argument("--sqlite", metavar="PATH",
+                        help="keep the balances in this SQLite database instead of memory")
+    parser.add_argument("--balance-file", metavar="PATH",
+                        help="keep a memory-mapped columnar copy of the balances here for reporting jobs")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="collect operation metrics and write them to this file (Prometheus text) on exit")
+    sub = parser.add_subparsers(dest="command")
+    cmd = sub.add_parser("ingest", help="stream a CSV or JSONL transactions file through the operations")
+    cmd.add_argument("input", help="transactions file (CSV or JSONL)")
+    cmd.add_argument("--format", choices=("csv", "jsonl"),
+                     help="input format (default: guessed from the file name)")
+    cmd.add_argument("--results", default="results.csv", help="applied records output file")
+    cmd.add_argument("--rejects", default="rejects.csv", help="rejected records output file")
+    cmd = sub.add_parser("total", help="print the balance of an account")
+    cmd.add_argument("account", nargs="?", help="account id (default: the default account)")
+    cmd = sub.add_parser("accrue", help="post interest and fees to every account from a rate schedule")
+    cmd.add_argument("--tier", action="append", required=True, metavar="MIN:RATE[:FEE]",
+                     help="balances from MIN earn RATE for the period and pay FEE (repeatable)")
+    cmd.add_argument("--checkpoint", metavar="PATH",
+                     help="save progress here, and resume from it if the run was interrupted")
+    cmd = sub.add_parser("serve", help="serve TOTAL/CREDIT/DEBIT requests over TCP")
+    cmd.add_argument("--host", default="127.0.0.1", help="interface to bind (default: 127.0.0.1)")
+    cmd.add_argument("--port", type=int, default=7070, help="TCP port (default: 7070)")
+    args = parser.parse_args(argv)
+    if args.command == "accrue":
+        import accrual
+        try:
+            schedule = accrual.Schedule(accrual.parse_tier(t) for t in args.tier)
+        except ValueError as exc:
+            parser.error(str(exc))
+    if args.sqlite and args.journal:
+        parser.error("--sqlite and --journal cannot be combined")
+    if args.sqlite and args.balance_file:
+        parser.error("--sqlite and --balance-file cannot be combined")
+
+    if args.sqlite:
+        import storage
+        data.open_backend(storage.SQLiteBackend(args.sqlite))
+    if args.journal:
+        data.open_journal(args.journal, args.commit_batch, args.commit_delay / 1000,
+                          args.snapshot, args.checkpoint_every)
+    if args.balance_file:
+        data.open_balance_file(args.balance_file)
+    if args.cache > 0:
+        data.enable_cache(args.cache)
+    if args.metrics:
+        import metrics
+        metrics.enable()
+    try:
+        if args.command == "ingest":
+            import ingest
+            stats = ingest.ingest_file(args.input, args.results, args.rejects, args.format)
+            print(
+                f"Processed {stats.records} records ({stats.applied} applied, "
+                f"{stats.rejected} rejected) in {stats.seconds:.2f}s "
+                f"({stats.rate:.0f} records/s)."
+            )
+        elif args.command == "total":
+            _print_total(args.account)
+        elif args.command == "accrue":
+            stats = accrual.run(schedule, args.checkpoint)
+            print(
+                f"Processed {stats.accounts} accounts ({stats.posted} posted, "
+                f"{stats.rejected} rejected): {data.from_cents(stats.credited)} credited, "
+                f"{data.from_cents(stats.debited)} debited in {stats.seconds:.2f}s."
+            )
+        elif args.command == "serve":
+            import asyncio
+            import server
+            try:
+                asyncio.run(server.serve(args.host, args.port))
+            except KeyboardInterrupt:
+                pass
+        else:
+            main()
+    finally:
+        data.close_balance_file()
+        data.close_journal()
+        data.close_backend()
+        data.disable_cache()
+        if args.metrics:
+            metrics.write_prometheus(args.metrics)
+            metrics.disable()
+
+
+def main(argv: list[str] | None = None) -> None:
     """
     Run the Account Management System.
     This function provides a simple text-based menu that allows the user to:
@@ -22,24 +304,35 @@ def main() -> None:
     3. Debit the account
     4. Exit the program
     The menu loops until the user selects option 4 (Exit).
+    When stdin is not a terminal, the choices are read from it without
+    showing the menu or prompts, and the results are written in batches
+    (see `_run_piped`).
+    Args:
+        argv (list[str] | None): Command-line arguments. When given and not empty,
+                                 they select startup options or a non-interactive
+                                 mode (e.g. ["ingest", "file.csv"]).
     """
+    if argv:
+        if not _run_total(argv):
+            _run_cli(argv)
+        return
+    if _piped():
+        _run_piped(sys.stdin, sys.stdout)
+        return
+    import operations
+
     continue_flag = "YES"
     while continue_flag == "YES":
         print("--------------------------------")
         print("Account Management System")
-        print("1. View Balance")
-        print("2. Credit Account")
-        print("3. Debit Account")
+        for choice, (label, _) in MENU.items():
+            print(f"{choice}. {label}")
         print("4. Exit")
         print("--------------------------------")
         user_choice = input("Enter your choice (1-4): ").strip()
 
-        if user_choice == "1":
-            operations.execute("TOTAL")
-        elif user_choice == "2":
-            operations.execute("CREDIT")
-        elif user_choice == "3":
-            operations.execute("DEBIT")
+        if user_choice in MENU:
+            operations.execute(MENU[user_choice][1])
         elif user_choice == "4":
             continue_flag = "NO"
         else:
@@ -48,4 +341,4 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
@@ -0,0 +1,295 @@
+"""
+Metrics module for the Account Management System.
+
+This module provides built-in instrumentation of the hot paths: how many
+operations of each kind ran and with which outcome, how many were
+rejected and why, and how long they took. `enable` attaches a `Metrics`
+registry to `operations` and `data`; while none is attached, the only
+cost left on the hot paths is one `is None` check.
+
+    metrics.enable()
+    ...
+    metrics.snapshot()                     # counters and latency summaries
+    metrics.write_prometheus("bank.prom")  # Prometheus text format
+
+Latencies are recorded in HDR-style histograms: buckets are exact below
+128 ns and then cover every power of two with 64 linear sub-buckets, so
+any recorded value is known within 1.6%, from nanoseconds to hours, in
+a fixed table of a few thousand counts.
+
+Metrics updates take no lock, so under heavy thread contention the
+counts may undercount slightly.
+"""
+
+import os
+
+_SUB_BITS = 7
+_HALF = 1 << (_SUB_BITS - 1)
+_BUCKETS = (64 - _SUB_BITS + 2) * _HALF
+
+COUNTERS = {
+    "operations_total": ("operation", "status"),
+    "rejections_total": ("operation", "reason"),
+}
+"""
+Counters kept by the registry, with their label names.
+"""
+
+HISTOGRAMS = {
+    "operation_latency_seconds": ("operation",),
+    "parse_amount_seconds": (),
+    "write_balance_seconds": (),
+}
+"""
+Latency histograms kept by the registry, with their label names.
+"""
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+"""
+Quantiles reported for every histogram.
+"""
+
+
+class Histogram:
+    """
+    Log-linear histogram of non-negative integers (latencies in nanoseconds).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self._counts = [0] * _BUCKETS
+
+    def record(self, value: int) -> None:
+        """
+        Add one value. Negative values count as 0.
+        Args:
+            value (int): The value, in nanoseconds.
+        """
+        if value < 128:
+            value = max(value, 0)
+            index = value
+        else:
+            shift = value.bit_length() - _SUB_BITS
+            index = (shift << (_SUB_BITS - 1)) + (value >> shift)
+        self._counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if self.min is None or value < self.min:
+            self.min = value
+
+    def quantile(self, q: float) -> int:
+        """
+        Return the value below which a fraction of the recorded values fall.
+        Args:
+            q (float): The fraction, between 0 and 1.
+        Returns:
+            int: The midpoint of the matching bucket (clamped to the recorded
+                 range), or 0 if nothing was recorded.
+        """
+        if not self.count:
+            return 0
+        rank = max(1, round(q * self.count))
+        if rank >= self.count:
+            return self.max
+        seen = 0
+        for index, n in enumerate(self._counts):
+            seen += n
+            if seen >= rank:
+                break
+        if index < 2 * _HALF:
+            value = index
+        else:
+            shift = (index >> (_SUB_BITS - 1)) - 1
+            value = ((index - (shift << (_SUB_BITS - 1))) << shift) + (1 << shift) // 2
+        return min(max(value, self.min), self.max)
+
+    def summary(self) -> dict:
+        """
+        Return the count, sum, extremes, mean and quantiles of the recorded values.
+        """
+        summary = {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min or 0,
+            "max": self.max,
+            "mean": self.total / self.count if self.count else 0.0,
+        }
+        for q in QUANTILES:
+            summary[f"p{q * 100:g}"] = self.quantile(q)
+        return summary
+
+
+class Metrics:
+    """
+    Registry of the counters and latency histograms listed in `COUNTERS`
+    and `HISTOGRAMS`, keyed by their label values.
+    """
+
+    def __init__(self):
+        self._counters: dict[str, dict[tuple, int]] = {name: {} for name in COUNTERS}
+        self._histograms: dict[str, dict[tuple, Histogram]] = {name: {} for name in HISTOGRAMS}
+
+    def count(self, name: str, labels: tuple = (), n: int = 1) -> None:
+        """
+        Add to a counter.
+        Args:
+            name (str): A counter of `COUNTERS`.
+            labels (tuple): The label values, in the order of `COUNTERS[name]`.
+            n (int): The increment.
+        """
+        counter = self._counters[name]
+        counter[labels] = counter.get(labels, 0) + n
+
+    def observe(self, name: str, nanoseconds: int, labels: tuple = ()) -> None:
+        """
+        Record a latency.
+        Args:
+            name (str): A histogram of `HISTOGRAMS`.
+            nanoseconds (int): The latency.
+            labels (tuple): The label values, in the order of `HISTOGRAMS[name]`.
+        """
+        histograms = self._histograms[name]
+        histogram = histograms.get(labels)
+        if histogram is None:
+            histogram = histograms.setdefault(labels, Histogram())
+        histogram.record(nanoseconds)
+
+    def operation(self, operation: str, status: str, nanoseconds: int) -> None:
+        """
+        Record the outcome and latency of one operation.
+        Args:
+            operation (str): The operation name, e.g. "CREDIT".
+            status (str): Its status (see `operations`); anything but "OK" is a rejection.
+            nanoseconds (int): How long it took.
+        """
+        self.count("operations_total", (operation, status))
+        if status != "OK":
+            self.count("rejections_total", (operation, status))
+        self.observe("operation_latency_seconds", nanoseconds, (operation,))
+
+    def snapshot(self) -> dict:
+        """
+        Return the current value of every metric.
+        Returns:
+            dict: {"counters": {name: {labels: value}},
+                   "histograms": {name: {labels: summary}}}, with label values
+                  as tuples and histogram summaries (see `Histogram.summary`)
+                  in nanoseconds.
+        """
+        return {
+            "counters": {name: dict(values) for name, values in self._counters.items()},
+            "histograms": {name: {labels: h.summary() for labels, h in list(values.items())}
+                           for name, values in self._histograms.items()},
+        }
+
+    def prometheus(self, prefix: str = "account_") -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+        Histograms are exposed as summaries, in seconds.
+        Args:
+            prefix (str): Prepended to every metric name.
+        Returns:
+            str: The exposition text.
+        """
+        lines = []
+        for name, values in self._counters.items():
+            lines.append(f"# TYPE {prefix}{name} counter")
+            for labels, value in sorted(values.items()):
+                lines.append(f"{prefix}{name}{_labels(COUNTERS[name], labels)} {value}")
+        for name, values in self._histograms.items():
+            lines.append(f"# TYPE {prefix}{name} summary")
+            for labels, h in sorted(values.items()):
+                names = HISTOGRAMS[name]
+                for q in QUANTILES:
+                    text = _labels(names + ("quantile",), labels + (f"{q:g}",))
+                    lines.append(f"{prefix}{name}{text} {h.quantile(q) / 1e9:.9g}")
+                lines.append(f"{prefix}{name}_sum{_labels(names, labels)} {h.total / 1e9:.9g}")
+                lines.append(f"{prefix}{name}_count{_labels(names, labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    """
+    Format label pairs as '{name="value",...}', or "" without labels.
+    """
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _escape(value) -> str:
+    """
+    Escape a label value for the Prometheus text format.
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_ACTIVE: Metrics | None = None
+
+
+def enable() -> Metrics:
+    """
+    Start collecting metrics in a new, empty registry.
+    Returns:
+        Metrics: The attached registry.
+    """
+    global _ACTIVE
+    import data
+    import operations
+
+    _ACTIVE = Metrics()
+    operations._METRICS = data._METRICS = _ACTIVE
+    return _ACTIVE
+
+
+def disable() -> None:
+    """
+    Stop collecting metrics and drop the registry.
+    """
+    global _ACTIVE
+    import data
+    import operations
+
+    operations._METRICS = data._METRICS = _ACTIVE = None
+
+
+def current() -> Metrics:
+    """
+    Return the attached registry.
+    Raises:
+        ValueError: If metrics are not enabled.
+    """
+    if _ACTIVE is None:
+        raise ValueError("Metrics are not enabled; call metrics.enable() first.")
+    return _ACTIVE
+
+
+def snapshot() -> dict:
+    """
+    Return the current value of every metric (see `Metrics.snapshot`).
+    Raises:
+        ValueError: If metrics are not enabled.
+    """
+    return current().snapshot()
+
+
+def write_prometheus(path: str) -> None:
+    """
+    Write every metric to a file in the Prometheus text format.
+    The file is replaced atomically, so a collector never reads it half-written.
+    Args:
+        path (str): The output file, e.g. for the node_exporter textfile collector.
+    Raises:
+        ValueError: If metrics are not enabled.
+    """
+    text = current().prometheus()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
@@ -5,14 +5,193 @@ This module provides the core account operations:
 - View the current balance
 - Credit the account
 - Debit the account
+- Transfer an amount to another account
 - Execute operations based on user input
+- Apply batches of operations without any console I/O
 
 It interacts with the `data` module to read and update the balance.
+
+Operations are table-driven: each one is registered once (`register`)
+with an integer opcode, a handler shared by the batch and network front
+ends, and an optional interactive front end for `execute`. New operation
+types, such as fees or interest, are added the same way as the built-in
+ones and dispatch in one dict lookup however many exist.
+
+The batch API works in integer cents internally: plain decimal amounts
+are parsed straight to cents by `parse_cents`, with the same validation
+and half-even rounding as `validate_amount`, and `Decimal` is only built
+for results. `apply_cents` and `apply_batch_cents` skip that last step
+and return balances in cents.
+
+Operations can carry an idempotency key. The first operation with a key
+is applied and its result remembered (see the `dedup` module); a retry
+with the same key returns that result without touching any balance.
+With a journal attached, string and integer keys are journaled with the
+writes they guard, so they are still known after a restart.
+
+An operation on a new account whose id the store cannot hold (see
+`data.account_fits`: a newline, or too long for an attached balance
+file) is refused with INVALID_ACCOUNT before any account is opened, as
+is any account id starting with NUL, which internal accounts use.
+
+When metrics are enabled (see the `metrics` module), every operation
+is counted by outcome and timed.
 """
 
+import json
+import time
 from decimal import Decimal, InvalidOperation
+from typing import Callable, Iterable, NamedTuple
 import data
 
+OK = "OK"
+INVALID_AMOUNT = "INVALID_AMOUNT"
+NOT_POSITIVE = "NOT_POSITIVE"
+INSUFFICIENT_FUNDS = "INSUFFICIENT_FUNDS"
+INVALID_OPERATION = "INVALID_OPERATION"
+INVALID_TARGET = "INVALID_TARGET"
+KEY_REUSED = "KEY_REUSED"
+FAILED = "FAILED"
+INVALID_ACCOUNT = "INVALID_ACCOUNT"
+
+MESSAGES = {
+    INVALID_AMOUNT: "Invalid amount.",
+    NOT_POSITIVE: "Amount must be positive.",
+    INSUFFICIENT_FUNDS: "Insufficient funds for this debit.",
+    INVALID_OPERATION: "Invalid operation.",
+    INVALID_TARGET: "Invalid target account.",
+    KEY_REUSED: "Idempotency key already used for a different operation.",
+    FAILED: "The operation failed.",
+    INVALID_ACCOUNT: "Account id cannot be stored.",
+}
+"""
+User-facing message printed by the interactive front end for each error status.
+"""
+
+_CENT = Decimal("0.01")
+_ZERO = Decimal("0.00")
+
+_MAX_CENTS = data.MAX_CENTS
+"""
+Largest amount accepted, in cents: the largest balance the store holds.
+"""
+_MAX_AMOUNT = Decimal(_MAX_CENTS).scaleb(-2)
+_MAX_DIGITS = 4000
+"""
+Longer digit strings go through `Decimal`, which has no int-conversion limit.
+"""
+
+_DEDUP = None
+"""
+The `dedup.DedupIndex` remembering keyed operations, created on first use.
+"""
+_METRICS = None
+"""
+The `metrics.Metrics` registry set by `metrics.enable`, or None when disabled.
+"""
+_READ_ANSWER = None
+"""
+Reads one answer for the interactive front end without showing the prompt,
+set by `main` when the menu is driven from a pipe; None means `input()`.
+"""
+
+
+class Result(NamedTuple):
+    """
+    Outcome of a single operation applied through the batch API.
+    Attributes:
+        status (str): OK, or one of the error statuses defined in this module.
+        balance (Decimal | int | None): The account balance after the operation
+                                        (in cents for the `*_cents` functions),
+                                        or None if the operation was rejected.
+    """
+    status: str
+    balance: Decimal | int | None = None
+
+
+def validate_amount(raw: str | Decimal) -> tuple[Decimal | None, str]:
+    """
+    Validate a monetary amount without any console I/O.
+    Args:
+        raw (str | Decimal): The amount to validate. Strings are stripped first.
+    Returns:
+        tuple[Decimal | None, str]: The amount rounded to 2 decimal places and OK,
+                                    or None and INVALID_AMOUNT / NOT_POSITIVE.
+                                    Amounts above the largest storable balance
+                                    are INVALID_AMOUNT.
+    """
+    try:
+        amt = Decimal(raw.strip() if isinstance(raw, str) else raw)
+        if not amt.is_finite():
+            return None, INVALID_AMOUNT
+        if amt <= 0:
+            return None, NOT_POSITIVE
+        amt = amt.quantize(_CENT)
+        if amt > _MAX_AMOUNT:
+            return None, INVALID_AMOUNT
+        return amt, OK
+    except (InvalidOperation, TypeError, ValueError):
+        return None, INVALID_AMOUNT
+
+
+def parse_cents(raw: str) -> tuple[int | None, str]:
+    """
+    Validate a monetary amount and convert it to cents using only int arithmetic.
+    Accepts and rejects exactly what `validate_amount` does and rounds the
+    same way (half-even); inputs other than plain decimals, such as
+    exponents or NaN, are delegated to `validate_amount`.
+    Args:
+        raw (str): The amount to validate. It is stripped first.
+    Returns:
+        tuple[int | None, str]: The amount in cents and OK,
+                                or None and INVALID_AMOUNT / NOT_POSITIVE.
+    """
+    text = raw.strip()
+    whole, _, frac = text.partition(".")
+    sign = whole[:1]
+    if sign == "-" or sign == "+":
+        whole = whole[1:]
+    digits = whole + frac
+    if not (digits.isdigit() and digits.isascii()) or len(digits) > _MAX_DIGITS:
+        return _decimal_cents(text)
+    value = int(digits)
+    if value == 0 or sign == "-":
+        return None, NOT_POSITIVE
+    scale = len(frac)
+    if scale <= 2:
+        cents = value * 10 ** (2 - scale)
+    else:
+        unit = 10 ** (scale - 2)
+        cents, rest = divmod(value, unit)
+        if rest * 2 > unit or (rest * 2 == unit and cents & 1):
+            cents += 1
+    if cents > _MAX_CENTS:
+        return None, INVALID_AMOUNT
+    return cents, OK
+
+
+def _decimal_cents(raw: str | Decimal) -> tuple[int | None, str]:
+    """
+    Validate an amount through `validate_amount` and convert it to cents.
+    """
+    amt, status = validate_amount(raw)
+    if amt is None:
+        return None, status
+    return data.to_cents(amt), OK
+
+
+def _ask(prompt: str) -> str:
+    """
+    Ask the user for one line of input.
+    Args:
+        prompt (str): The message shown to the user, unless answers come from a pipe.
+    Returns:
+        str: The answer, without its line ending.
+    """
+    if _READ_ANSWER is None:
+        return input(prompt)
+    return _READ_ANSWER()
+
 
 def _parse_amount(prompt: str) -> Decimal | None:
     """
@@ -23,16 +202,405 @@ def _parse_amount(prompt: str) -> Decimal | None:
         Decimal | None: The parsed and rounded amount if valid, 
                         or None if the input is invalid or not positive.
     """
-    raw = input(prompt).strip()
+    raw = _ask(prompt)
+    metrics = _METRICS
+    if metrics is None:
+        amt, status = validate_amount(raw)
+    else:
+        start = time.perf_counter_ns()
+        amt, status = validate_amount(raw)
+        metrics.observe("parse_amount_seconds", time.perf_counter_ns() - start)
+        if amt is None:
+            metrics.count("rejections_total", ("PARSE", status))
+    if amt is None:
+        print(MESSAGES[status])
+    return amt
+
+
+def _credit(account_id: str, amount: Decimal) -> Result:
+    """
+    Add a validated amount to an account.
+    Args:
+        account_id (str): The account to credit.
+        amount (Decimal): A positive amount with 2 decimal places.
+    Returns:
+        Result: OK with the new balance, or INVALID_AMOUNT if the balance
+                would exceed the largest storable one.
+    """
     try:
-        amt = Decimal(raw)
-    except InvalidOperation:
-        print("Invalid amount.")
-        return None
-    if amt <= 0:
-        print("Amount must be positive.")
-        return None
-    return amt.quantize(Decimal("0.01"))
+        return Result(OK, data.apply_delta(amount, account_id))
+    except OverflowError:
+        return Result(INVALID_AMOUNT)
+
+
+def _debit(account_id: str, amount: Decimal) -> Result:
+    """
+    Subtract a validated amount from an account if funds are sufficient.
+    Safe under concurrent debits: the funds check and the update are atomic.
+    Args:
+        account_id (str): The account to debit.
+        amount (Decimal): A positive amount with 2 decimal places.
+    Returns:
+        Result: OK with the new balance, or INSUFFICIENT_FUNDS.
+    """
+    # balance >= amount is the same rule as new balance >= 0, checked atomically.
+    new_balance = data.apply_delta(-amount, account_id, floor=_ZERO)
+    if new_balance is None:
+        return Result(INSUFFICIENT_FUNDS)
+    return Result(OK, new_balance)
+
+
+def _total_cents(account_id: str, cents: int | None, status: str,
+                 target: str | None) -> Result:
+    """
+    Read an account balance in cents (the TOTAL handler). The amount is ignored.
+    """
+    return Result(OK, data.read_cents(account_id))
+
+
+def _credit_cents(account_id: str, cents: int | None, status: str,
+                  target: str | None) -> Result:
+    """
+    Add a parsed amount to an account (the CREDIT handler).
+    """
+    if cents is None:
+        return Result(status)
+    return Result(OK, data.apply_delta_cents(cents, account_id))
+
+
+def _debit_cents(account_id: str, cents: int | None, status: str,
+                 target: str | None) -> Result:
+    """
+    Subtract a parsed amount from an account if funds are sufficient (the DEBIT handler).
+    """
+    if cents is None:
+        return Result(status)
+    # balance >= amount is the same rule as new balance >= 0, checked atomically.
+    balance = data.apply_delta_cents(-cents, account_id, 0)
+    if balance is None:
+        return Result(INSUFFICIENT_FUNDS)
+    return Result(OK, balance)
+
+
+def _transfer_cents(account_id: str, cents: int | None, status: str,
+                    target: str | None) -> Result:
+    """
+    Move a parsed amount to the target account (the TRANSFER handler).
+    Returns the new balance of the source account.
+    """
+    if cents is None:
+        return Result(status)
+    if not isinstance(target, str) or not target.strip():
+        return Result(INVALID_TARGET)
+    balances = data.transfer_cents(cents, account_id, target.strip(), 0)
+    if balances is None:
+        return Result(INSUFFICIENT_FUNDS)
+    return Result(OK, balances[0])
+
+
+def _post(op: str, account_id: str, cents: int | None, status: str,
+          target: str | None = None) -> Result:
+    """
+    Apply a normalized operation with an already parsed amount.
+    Args:
+        op (str): The name of a registered operation (stripped, upper case).
+        account_id (str): The account to operate on (the source of a TRANSFER).
+        cents (int | None): The parsed amount in cents, or None if invalid.
+        status (str): The parse status of the amount.
+        target (str | None): The account credited by a TRANSFER.
+    Returns:
+        Result: The status of the operation and the balance in cents
+                (of the source account for a TRANSFER).
+    """
+    entry = _REGISTRY.get(op)
+    if entry is None:
+        return Result(INVALID_OPERATION)
+    # Refused before a slot is allocated for the account; ids starting
+    # with NUL are reserved for internal accounts (see the `shard` module).
+    if (account_id[:1] == "\x00" or not data.account_fits(account_id)
+            or (isinstance(target, str) and (target.strip()[:1] == "\x00" or not data.account_fits(target)))):
+        return Result(INVALID_ACCOUNT)
+    try:
+        return entry.handler(account_id, cents, status, target)
+    except OverflowError:
+        # The new balance would not fit the store, which refused it unchanged.
+        return Result(INVALID_AMOUNT)
+
+
+def _name(operation: str | int) -> str:
+    """
+    Return the normalized name of an operation given by name or opcode.
+    Unknown opcodes give "", which no operation is registered under.
+    """
+    if type(operation) is int:
+        return _OPCODES[operation].name if 0 <= operation < len(_OPCODES) else ""
+    return operation.strip().upper()
+
+
+def _observed(metrics, op: str, handler, *args) -> Result:
+    """
+    Run an operation handler, recording its outcome and latency in the metrics.
+    Operations that are not registered share the "unknown" label, so request
+    input cannot grow the number of series.
+    """
+    start = time.perf_counter_ns()
+    result = handler(*args)
+    metrics.operation(op if op in _REGISTRY else "unknown", result.status,
+                      time.perf_counter_ns() - start)
+    return result
+
+
+def _post_once(key, op: str, account_id: str, cents: int | None, status: str,
+               target: str | None = None) -> Result:
+    """
+    Apply a normalized operation at most once per idempotency key (see `_post`).
+    A retry returns the first result, or KEY_REUSED if the key was first
+    used with a different operation, account, amount or target.
+    """
+    index = idempotency_index()
+    request = (op, account_id, cents, target)
+    with index.lock_for(key):
+        seen = index.lookup(key)
+        if seen is not None:
+            return seen[1] if seen[0] == request else Result(KEY_REUSED)
+        if _METRICS is None:
+            result = _post(op, account_id, cents, status, target)
+        else:
+            result = _observed(_METRICS, op, _post, op, account_id, cents, status, target)
+        stamp = time.time_ns() // 1000000
+        index.remember(key, (request, result, stamp))
+        if type(key) is str or type(key) is int:
+            data.journal_key(json.dumps((key,) + request + result), stamp)
+    return result
+
+
+def _key_records() -> list[tuple[str, int]]:
+    """
+    List the live keys that can be journaled, as `data.journal_key` records.
+    """
+    if _DEDUP is None:
+        return []
+    return [(json.dumps((key,) + outcome[0] + outcome[1]), outcome[2])
+            for key, outcome in _DEDUP.items() if type(key) is str or type(key) is int]
+
+
+def _restore_keys(index, records: list[tuple[str, int]]) -> None:
+    """
+    Remember again the keys journaled before a restart (see `data.replayed_keys`).
+    """
+    now = time.time_ns() // 1000000
+    for record, stamp in sorted(records, key=lambda r: r[1]):
+        key, op, account_id, cents, target, status, balance = json.loads(record)
+        index.remember(key, ((op, account_id, cents, target), Result(status, balance), stamp),
+                       max(0, now - stamp) / 1000)
+
+
+def _apply_cents(operation: str | int, account_id: str = data.DEFAULT_ACCOUNT,
+                 amount: int | str | None = None, target: str | None = None,
+                 key=None) -> Result:
+    """
+    Apply one operation with amounts and balances in cents, without committing.
+    Takes the same arguments and returns the same result as `apply_cents`.
+    """
+    op = operation.strip().upper() if type(operation) is str else _name(operation)
+    if op == "TOTAL":
+        if _METRICS is None:
+            return Result(OK, data.read_cents(account_id))
+        return _observed(_METRICS, op, _post, op, account_id, None, OK)
+    if type(amount) is int:
+        if amount <= 0:
+            cents, status = None, NOT_POSITIVE
+        else:
+            cents, status = (amount, OK) if amount <= _MAX_CENTS else (None, INVALID_AMOUNT)
+    elif isinstance(amount, str):
+        cents, status = parse_cents(amount)
+    else:
+        cents, status = None, INVALID_AMOUNT
+    if key is not None:
+        return _post_once(key, op, account_id, cents, status, target)
+    if _METRICS is not None:
+        return _observed(_METRICS, op, _post, op, account_id, cents, status, target)
+    return _post(op, account_id, cents, status, target)
+
+
+def _apply(operation: str | int, account_id: str = data.DEFAULT_ACCOUNT,
+           amount: str | Decimal | None = None, target: str | None = None,
+           key=None) -> Result:
+    """
+    Apply one operation without waiting for journaled writes to become durable.
+    Takes the same arguments and returns the same result as `apply`.
+    """
+    op = operation.strip().upper() if type(operation) is str else _name(operation)
+    if op == "TOTAL":
+        if _METRICS is None:
+            return Result(OK, data.from_cents(data.read_cents(account_id)))
+        result = _observed(_METRICS, op, _post, op, account_id, None, OK)
+        return Result(OK, data.from_cents(result.balance))
+    if isinstance(amount, str):
+        cents, status = parse_cents(amount)
+    else:
+        cents, status = _decimal_cents(amount)
+    if key is not None:
+        result = _post_once(key, op, account_id, cents, status, target)
+    elif _METRICS is not None:
+        result = _observed(_METRICS, op, _post, op, account_id, cents, status, target)
+    else:
+        result = _post(op, account_id, cents, status, target)
+    if result.balance is None:
+        return result
+    return Result(OK, data.from_cents(result.balance))
+
+
+def apply(operation: str | int, account_id: str = data.DEFAULT_ACCOUNT,
+          amount: str | Decimal | None = None, target: str | None = None,
+          key=None) -> Result:
+    """
+    Apply one operation to an account without prompting or printing.
+    The result is returned once the change is durable (see `data.commit`).
+    Args:
+        operation (str | int): "TOTAL", "CREDIT", "DEBIT", "TRANSFER" or another
+                               registered operation (case-insensitive), or its opcode.
+        account_id (str): The account to operate on (the source of a TRANSFER).
+        amount (str | Decimal | None): The amount for CREDIT/DEBIT/TRANSFER; ignored for TOTAL.
+        target (str | None): The account credited by a TRANSFER; ignored otherwise.
+        key (Hashable | None): An idempotency key. A retry with the same key returns
+                               the first result without applying the operation again.
+    Returns:
+        Result: The status of the operation and the resulting balance
+                (of the source account for a TRANSFER).
+    """
+    result = _apply(operation, account_id, amount, target, key)
+    data.commit()
+    return result
+
+
+def _isolated(apply, records: Iterable[tuple], on_error) -> list[Result]:
+    """
+    Apply records one by one; a record that raises gets a FAILED result,
+    its error is passed to `on_error` with its index, and the batch goes on.
+    """
+    results = []
+    for i, record in enumerate(records):
+        try:
+            results.append(apply(*record))
+        except Exception as exc:
+            on_error(i, exc)
+            results.append(Result(FAILED))
+    return results
+
+
+def apply_batch(records: Iterable[tuple], on_error=None) -> list[Result]:
+    """
+    Apply a batch of operations in order, without any console I/O.
+    The whole batch is made durable with a single commit before returning.
+    Args:
+        records (Iterable[tuple]): (operation, account_id, amount) records, and
+                                   (operation, account_id, amount, target)
+                                   for TRANSFER. The amount may be omitted for TOTAL.
+                                   A fifth field, if any, is an idempotency key.
+        on_error (Callable[[int, Exception], None] | None): If given, a record
+            whose operation raises gets a FAILED result and the error is passed
+            to it with the record index; otherwise the error propagates (the
+            records before it stay applied).
+    Returns:
+        list[Result]: One result per record, in input order.
+    """
+    if on_error is None:
+        results = [_apply(*record) for record in records]
+    else:
+        results = _isolated(_apply, records, on_error)
+    data.commit()
+    return results
+
+
+def apply_cents(operation: str | int, account_id: str = data.DEFAULT_ACCOUNT,
+                amount: int | str | None = None, target: str | None = None,
+                key=None) -> Result:
+    """
+    Apply one operation with amounts and balances in integer cents.
+    The result is returned once the change is durable (see `data.commit`).
+    Args:
+        operation (str | int): "TOTAL", "CREDIT", "DEBIT", "TRANSFER" or another
+                               registered operation (case-insensitive), or its opcode.
+        account_id (str): The account to operate on (the source of a TRANSFER).
+        amount (int | str | None): The amount for CREDIT/DEBIT/TRANSFER, as an int
+                                   number of cents or a decimal string (e.g. "12.34").
+        target (str | None): The account credited by a TRANSFER; ignored otherwise.
+        key (Hashable | None): An idempotency key, as in `apply`.
+    Returns:
+        Result: The status of the operation and the resulting balance in cents.
+    """
+    result = _apply_cents(operation, account_id, amount, target, key)
+    data.commit()
+    return result
+
+
+def apply_batch_cents(records: Iterable[tuple], on_error=None) -> list[Result]:
+    """
+    Apply a batch of operations in order, with amounts and balances in cents.
+    The whole batch is made durable with a single commit before returning.
+    Args:
+        records (Iterable[tuple]): (operation, account_id, amount[, target[, key]])
+                                   records, amounts as in `apply_cents`.
+        on_error (Callable[[int, Exception], None] | None): As in `apply_batch`.
+    Returns:
+        list[Result]: One result per record, in input order, balances in cents.
+    """
+    if on_error is None:
+        results = [_apply_cents(*record) for record in records]
+    else:
+        results = _isolated(_apply_cents, records, on_error)
+    data.commit()
+    return results
+
+
+def settle_cents(slots, deltas):
+    """
+    Post columns of credits and debits at once, for end-of-day settlement.
+    Postings apply in order: positive amounts are credits, negative amounts
+    are debits, and a debit that exceeds the balance of its account at that
+    point is rejected (insufficient funds) exactly as `debit` would reject it.
+    The whole settlement is made durable with a single commit before returning.
+    Args:
+        slots (Sequence[int]): The account slot of every posting (see `data.account_slots`).
+        deltas (Sequence[int]): The signed amount of every posting, in cents.
+    Returns:
+        Sequence[bool]: The rejection mask, True for every rejected posting.
+    """
+    rejected = data.apply_deltas_cents(slots, deltas, floor=0)
+    data.commit()
+    return rejected
+
+
+def idempotency_index(capacity: int | None = None, ttl: float | None = None):
+    """
+    Return the index of idempotency keys, creating it on first use.
+    Passing a capacity or a ttl replaces it with an empty index; the
+    other setting is kept. Keys found in the journal by `data.open_journal`
+    are remembered again, expiring as they would have without a restart.
+    Args:
+        capacity (int | None): Most keys remembered at once (default: 1000000).
+        ttl (float | None): Seconds a key is remembered (default: one day).
+    Returns:
+        dedup.DedupIndex: The index, with its hit/miss counters.
+    """
+    global _DEDUP
+    import dedup
+
+    if _DEDUP is None or capacity is not None or ttl is not None:
+        settings = {}
+        if _DEDUP is not None:
+            settings = {"capacity": _DEDUP.capacity, "ttl": _DEDUP.ttl}
+        if capacity is not None:
+            settings["capacity"] = capacity
+        if ttl is not None:
+            settings["ttl"] = ttl
+        _DEDUP = dedup.DedupIndex(**settings)
+        data.track_keys(_key_records)
+    records = data.replayed_keys()
+    if records:
+        _restore_keys(_DEDUP, records)
+    return _DEDUP
 
 
 def total() -> None:
@@ -53,10 +621,15 @@ def credit() -> None:
     amount = _parse_amount("Enter credit amount: ")
     if amount is None:
         return
-    balance = data.read_balance()
-    new_balance = (balance + amount).quantize(Decimal("0.01"))
-    data.write_balance(new_balance)
-    print(f"Amount credited. New balance: {new_balance:.2f}")
+    if _METRICS is None:
+        result = _credit(data.DEFAULT_ACCOUNT, amount)
+    else:
+        result = _observed(_METRICS, "CREDIT", _credit, data.DEFAULT_ACCOUNT, amount)
+    data.commit()
+    if result.status == OK:
+        print(f"Amount credited. New balance: {result.balance:.2f}")
+    else:
+        print(MESSAGES[result.status])
 
 
 def debit() -> None:
@@ -69,33 +642,139 @@ def debit() -> None:
     amount = _parse_amount("Enter debit amount: ")
     if amount is None:
         return
-    balance = data.read_balance()
-    if balance >= amount:
-        new_balance = (balance - amount).quantize(Decimal("0.01"))
-        data.write_balance(new_balance)
-        print(f"Amount debited. New balance: {new_balance:.2f}")
+    if _METRICS is None:
+        result = _debit(data.DEFAULT_ACCOUNT, amount)
     else:
-        print("Insufficient funds for this debit.")
+        result = _observed(_METRICS, "DEBIT", _debit, data.DEFAULT_ACCOUNT, amount)
+    data.commit()
+    if result.status == OK:
+        print(f"Amount debited. New balance: {result.balance:.2f}")
+    else:
+        print(MESSAGES[result.status])
 
 
-def execute(operation: str) -> None:
+def transfer() -> None:
+    """
+    Transfer a positive amount entered by the user to another account.
+    - Prompts the user for the target account, then for an amount.
+    - If valid and funds are sufficient, moves the amount atomically.
+    - Prints the new balance or an error message.
     """
-    Execute an operation by name.
+    target = _ask("Enter target account: ").strip()
+    if not target:
+        print(MESSAGES[INVALID_TARGET])
+        return
+    amount = _parse_amount("Enter transfer amount: ")
+    if amount is None:
+        return
+    result = _apply("TRANSFER", data.DEFAULT_ACCOUNT, amount, target)
+    data.commit()
+    if result.status == OK:
+        print(f"Amount transferred. New balance: {result.balance:.2f}")
+    else:
+        print(MESSAGES[result.status])
+
+
+def execute(operation: str | int) -> None:
+    """
+    Execute an operation by name, prompting the user for its arguments.
     Args:
-        operation (str): The operation to execute. 
-                         Accepted values are "TOTAL", "CREDIT", "DEBIT".
+        operation (str | int): The operation to execute, by name or opcode.
+                               Built-in values are "TOTAL", "CREDIT", "DEBIT", "TRANSFER".
     Behavior:
         - TOTAL → Show current balance
         - CREDIT → Credit the account
         - DEBIT → Debit the account
+        - TRANSFER → Transfer from the account to another one
+        - Registered operations → Their interactive front end
         - Any other input → Print an error message
     """
-    op = operation.strip().upper()
-    if op == "TOTAL":
-        total()
-    elif op == "CREDIT":
-        credit()
-    elif op == "DEBIT":
-        debit()
+    entry = _REGISTRY.get(_name(operation))
+    if entry is None or entry.interactive is None:
+        print(MESSAGES[INVALID_OPERATION])
     else:
-        print("Invalid operation.")
+        entry.interactive()
+
+
+class Operation(NamedTuple):
+    """
+    A registered operation type.
+    Attributes:
+        opcode (int): Small integer identifying the operation, in registration order.
+        name (str): The upper-case name, e.g. "CREDIT".
+        handler (Callable): Applies the operation: handler(account_id, cents, status, target)
+                            returns a `Result` with the balance in cents. `cents` is None
+                            (and `status` says why) when the amount did not parse.
+        interactive (Callable[[], None] | None): Prompts for the arguments and prints the
+                                                 outcome, for `execute` and the menu.
+        takes_target (bool): Whether the operation names a second account, which the
+                             network protocol then expects before the amount.
+    """
+    opcode: int
+    name: str
+    handler: Callable[[str, int | None, str, str | None], Result]
+    interactive: Callable[[], None] | None = None
+    takes_target: bool = False
+
+
+_REGISTRY: dict[str, Operation] = {}
+"""
+Registered operations by name; dispatch is one dict lookup however many there are.
+"""
+_OPCODES: list[Operation] = []
+"""
+Registered operations by opcode.
+"""
+
+
+def register(name: str, handler: Callable[[str, int | None, str, str | None], Result],
+             interactive: Callable[[], None] | None = None, takes_target: bool = False) -> int:
+    """
+    Register a new operation type for every front end (batch, network, interactive).
+    Args:
+        name (str): The operation name, matched case-insensitively.
+        handler (Callable): Applies the operation (see `Operation.handler`).
+        interactive (Callable[[], None] | None): The prompting front end, if any.
+        takes_target (bool): Whether the operation names a second account.
+    Returns:
+        int: The opcode of the new operation.
+    Raises:
+        ValueError: If the name is empty, contains spaces, or is already registered.
+    """
+    name = name.strip().upper()
+    if not name or len(name.split()) != 1:
+        raise ValueError("Operation names must be a single word.")
+    if name in _REGISTRY:
+        raise ValueError(f"Operation {name} is already registered.")
+    entry = Operation(len(_OPCODES), name, handler, interactive, takes_target)
+    _REGISTRY[name] = entry
+    _OPCODES.append(entry)
+    return entry.opcode
+
+
+def lookup(operation: str | int) -> Operation | None:
+    """
+    Return a registered operation by name (case-insensitive) or opcode.
+    Args:
+        operation (str | int): The operation name or opcode.
+    Returns:
+        Operation | None: The operation, or None if it is not registered.
+    """
+    return _REGISTRY.get(_name(operation))
+
+
+def opcode(name: str) -> int:
+    """
+    Return the opcode of a registered operation.
+    Raises:
+        KeyError: If no operation is registered under that name.
+    """
+    return _REGISTRY[name.strip().upper()].opcode
+
+
+# The interactive functions are looked up when called, so replacing them
+# on the module (as the tests do) also changes what `execute` runs.
+register("TOTAL", _total_cents, lambda: total())
+register("CREDIT", _credit_cents, lambda: credit())
+register("DEBIT", _debit_cents, lambda: debit())
+register("TRANSFER", _transfer_cents, lambda: transfer(), takes_target=True)
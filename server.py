@@ -0,0 +1,194 @@
+"""
+Network server module for the Account Management System.
+
+This module exposes the `operations` batch API over TCP with asyncio,
+so many concurrent clients can share one in-memory store.
+
+Protocol (UTF-8, one request per line, one response per request, in order):
+    TOTAL [account]
+    CREDIT <account> <amount>
+    DEBIT <account> <amount>
+    TRANSFER <source> <target> <amount>
+Operations added with `operations.register` are served the same way,
+with a target account before the amount if they take one. Any request
+may end with `key=<idempotency key>`: a retry with the same key gets the
+first response back without being applied again (see `operations`).
+Responses:
+    OK <balance>
+    ERR <status>        e.g. ERR INSUFFICIENT_FUNDS, ERR INVALID_AMOUNT
+A request whose operation raises is answered ERR FAILED; if the batch
+cannot be committed, every request in it is. The connection stays open.
+
+Requests may be pipelined: a client can send many lines before reading
+any response. Everything a client has sent so far is applied as one
+batch (one journal commit), and the server stops reading from a client
+whose responses are not being consumed, so slow readers push back
+instead of growing server memory.
+"""
+
+import asyncio
+import itertools
+
+import data
+import operations
+
+MALFORMED = "MALFORMED"
+"""
+Error status for request lines that do not follow the protocol.
+"""
+
+LINE_TOO_LONG = "LINE_TOO_LONG"
+"""
+Error status sent before closing a connection whose line exceeds `MAX_LINE`.
+"""
+
+READ_SIZE = 64 * 1024
+"""
+Bytes read from a client per batch.
+"""
+
+MAX_LINE = 4096
+"""
+Longest accepted request line, in bytes.
+"""
+
+
+def parse_request(line: bytes) -> tuple | None:
+    """
+    Decode one request line into an operations record.
+    Args:
+        line (bytes): The request line, without its newline.
+    Returns:
+        tuple | None: (operation, account, amount), (operation, source, amount, target)
+                      for operations taking a target (TRANSFER), followed by the
+                      target (or None) and the key if the request has one, or
+                      None if malformed.
+    """
+    try:
+        parts = line.decode("utf-8").split()
+    except UnicodeDecodeError:
+        return None
+    key = None
+    if len(parts) > 1 and parts[-1].startswith("key="):
+        key = parts.pop()[4:]
+        if not key:
+            return None
+    if not parts:
+        return ("", data.DEFAULT_ACCOUNT, None)
+    record = None
+    if len(parts) == 4:
+        entry = operations.lookup(parts[0])
+        if entry is not None and entry.takes_target:
+            record = (parts[0], parts[1], parts[3], parts[2])
+    if record is None:
+        if len(parts) > 3:
+            return None
+        account = parts[1] if len(parts) > 1 else data.DEFAULT_ACCOUNT
+        amount = parts[2] if len(parts) > 2 else None
+        record = (parts[0], account, amount)
+    if key is not None:
+        record = record + (None,) * (4 - len(record)) + (key,)
+    return record
+
+
+def format_result(result: operations.Result) -> bytes:
+    """
+    Encode an operation result as a response line.
+    Args:
+        result (operations.Result): The result to encode.
+    Returns:
+        bytes: "OK <balance>\\n" or "ERR <status>\\n".
+    """
+    if result.status == operations.OK:
+        return f"OK {result.balance:.2f}\n".encode()
+    return f"ERR {result.status}\n".encode()
+
+
+def handle_lines(lines: list[bytes]) -> bytes:
+    """
+    Apply a group of pipelined request lines and encode their responses.
+    Args:
+        lines (list[bytes]): Complete request lines, in order.
+    Returns:
+        bytes: The response lines, in the same order; a request whose
+               operation raised, or the whole batch if its commit did,
+               gets "ERR FAILED".
+    """
+    records = [parse_request(line) for line in lines]
+    try:
+        results = iter(operations.apply_batch([r for r in records if r is not None],
+                                              lambda i, exc: None))
+    except Exception:
+        # The commit failed, so none of the batch is known to be durable.
+        results = itertools.repeat(operations.Result(operations.FAILED))
+    out = []
+    for record in records:
+        if record is None:
+            out.append(f"ERR {MALFORMED}\n".encode())
+        else:
+            out.append(format_result(next(results)))
+    return b"".join(out)
+
+
+async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    Serve one client connection until it closes.
+    Args:
+        reader (asyncio.StreamReader): The client input stream.
+        writer (asyncio.StreamWriter): The client output stream.
+    """
+    pending = b""
+    try:
+        while True:
+            chunk = await reader.read(READ_SIZE)
+            if not chunk:
+                break
+            pending += chunk
+            end = pending.rfind(b"\n")
+            if end < 0:
+                if len(pending) > MAX_LINE:
+                    writer.write(f"ERR {LINE_TOO_LONG}\n".encode())
+                    break
+                continue
+            lines = pending[:end].split(b"\n")
+            pending = pending[end + 1:]
+            if any(len(line) > MAX_LINE for line in lines):
+                writer.write(f"ERR {LINE_TOO_LONG}\n".encode())
+                break
+            # The batch may wait on a journal commit; keep the event loop free meanwhile.
+            writer.write(await asyncio.to_thread(handle_lines, lines))
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def start_server(host: str = "127.0.0.1", port: int = 7070) -> asyncio.AbstractServer:
+    """
+    Start listening for clients.
+    Args:
+        host (str): The interface to bind.
+        port (int): The TCP port to bind (0 picks a free port).
+    Returns:
+        asyncio.AbstractServer: The running server.
+    """
+    return await asyncio.start_server(handle_client, host, port, limit=READ_SIZE)
+
+
+async def serve(host: str = "127.0.0.1", port: int = 7070) -> None:
+    """
+    Run the server until cancelled.
+    Args:
+        host (str): The interface to bind.
+        port (int): The TCP port to bind.
+    """
+    server = await start_server(host, port)
+    address = server.sockets[0].getsockname()
+    print(f"Serving on {address[0]}:{address[1]}")
+    async with server:
+        await server.serve_forever()
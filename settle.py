@@ -0,0 +1,154 @@
+"""
+Settlement module for the Account Management System.
+
+This module applies columns of postings (account slots and signed cent
+amounts) to the balance column in one pass, for end-of-day settlement
+where millions of credits and debits arrive at once.
+
+With NumPy installed, postings are grouped by account with a stable
+sort and checked with grouped running sums: every account whose running
+balance never drops below the floor is settled with one vectorized sum.
+Only the accounts where some debit would bounce are replayed posting by
+posting, so rejections are exactly those sequential `apply_delta_cents`
+calls would produce, in the same order. Without NumPy, every posting is
+applied sequentially in pure Python with the same result.
+"""
+
+from array import array
+from typing import Sequence
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional; fall back to the sequential path.
+    numpy = None
+
+_INT64_LIMIT = 1 << 63
+
+
+def apply(balances: array, slots: Sequence[int], deltas: Sequence[int],
+          floor: int | None = None) -> tuple[Sequence[bool], list[int]]:
+    """
+    Apply postings to a balance column, in order, in place.
+    A posting with a negative amount is rejected when it would bring the
+    balance of its account below `floor`; credits are never rejected.
+    Args:
+        balances (array): The balances in cents ("q" array), indexed by slot.
+        slots (Sequence[int]): The slot of every posting.
+        deltas (Sequence[int]): The signed amount of every posting, in cents.
+        floor (int | None): Lowest balance a debit may leave, or None for no limit.
+    Returns:
+        tuple[Sequence[bool], list[int]]: The rejection mask, in posting order
+        (a NumPy bool array when NumPy is installed, else a list), and the
+        slots whose balance changed.
+    Raises:
+        ValueError: If the columns differ in length.
+        IndexError: If a slot is outside the balance column.
+        OverflowError: If a balance would leave the int64 range; no balance
+                       is changed.
+    """
+    if len(slots) != len(deltas):
+        raise ValueError("Every posting needs exactly one slot and one amount.")
+    if numpy is None:
+        # Checked up front: a negative slot would index from the end, and a
+        # bad slot found midway would leave the earlier postings applied.
+        if len(slots) and (min(slots) < 0 or max(slots) >= len(balances)):
+            raise IndexError("Posting slot outside the balance column.")
+        return _apply_sequential(balances, slots, deltas, floor)
+    slots = numpy.asarray(slots, dtype=numpy.int64)
+    deltas = numpy.asarray(deltas, dtype=numpy.int64)
+    if not len(slots):
+        return numpy.zeros(0, dtype=bool), []
+    if slots.min() < 0 or slots.max() >= len(balances):
+        raise IndexError("Posting slot outside the balance column.")
+    bal = numpy.frombuffer(balances, dtype=numpy.int64)
+    try:
+        bound = int(numpy.abs(deltas).max()) * len(deltas) + int(numpy.abs(bal[slots]).max())
+        if bound >= _INT64_LIMIT:
+            # Running sums could wrap around in int64; Python ints cannot.
+            rejected, touched = _apply_sequential(balances, slots.tolist(), deltas.tolist(), floor)
+            return numpy.array(rejected, dtype=bool), touched
+        return _apply_grouped(bal, slots, deltas, floor)
+    finally:
+        # The array cannot grow while NumPy holds a view of its buffer.
+        del bal
+
+
+def _apply_sequential(balances: array, slots: Sequence[int], deltas: Sequence[int],
+                      floor: int | None) -> tuple[list[bool], list[int]]:
+    """
+    Apply postings one by one (the reference behavior of `apply`). The new
+    balances are computed aside and written only once all of them are known
+    to fit, so a posting that overflows leaves every balance unchanged.
+    """
+    rejected = [False] * len(slots)
+    pending = {}
+    for i, (slot, delta) in enumerate(zip(slots, deltas)):
+        cents = pending.get(slot, balances[slot]) + delta
+        if delta < 0 and floor is not None and cents < floor:
+            rejected[i] = True
+            continue
+        if not -_INT64_LIMIT <= cents < _INT64_LIMIT:
+            raise OverflowError("Balance out of the storable range.")
+        pending[slot] = cents
+    changed = sorted(slot for slot, cents in pending.items() if cents != balances[slot])
+    for slot in changed:
+        balances[slot] = pending[slot]
+    return rejected, changed
+
+
+def _apply_grouped(bal, slots, deltas, floor: int | None):
+    """
+    Apply postings with grouped running sums (see the module docstring).
+    Args:
+        bal (numpy.ndarray): Writable int64 view of the balance column.
+        slots (numpy.ndarray): The slot of every posting (int64).
+        deltas (numpy.ndarray): The amount of every posting (int64).
+        floor (int | None): Lowest balance a debit may leave.
+    Returns:
+        tuple[numpy.ndarray, list[int]]: The rejection mask and the touched slots.
+    """
+    n = len(slots)
+    if len(bal) * n < _INT64_LIMIT:
+        # Sorting (slot, position) keys is stable by construction and much
+        # faster than a stable argsort of the slots.
+        keys = slots * n + numpy.arange(n)
+        keys.sort()
+        s, order = numpy.divmod(keys, n)
+    else:
+        order = numpy.argsort(slots, kind="stable")
+        s = slots[order]
+    d = deltas[order]
+    first = numpy.empty(len(s), dtype=bool)
+    first[0] = True
+    numpy.not_equal(s[1:], s[:-1], out=first[1:])
+    starts = numpy.flatnonzero(first)
+    accounts = s[starts]
+    rejected = numpy.zeros(len(s), dtype=bool)
+    before = bal[accounts]
+
+    if floor is None:
+        bal[accounts] += numpy.add.reduceat(d, starts)
+        return rejected, accounts[bal[accounts] != before].tolist()
+
+    # Balance after every posting if no posting of its account were rejected.
+    group = numpy.cumsum(first) - 1
+    running = numpy.cumsum(d)
+    running += (bal[accounts] - (running[starts] - d[starts]))[group]
+    bounced = numpy.zeros(len(accounts), dtype=bool)
+    bounced[group[(d < 0) & (running < floor)]] = True
+
+    clean = ~bounced
+    bal[accounts[clean]] += numpy.add.reduceat(d, starts)[clean]
+
+    ends = numpy.append(starts[1:], len(s))
+    for g in numpy.flatnonzero(bounced).tolist():
+        slot = int(accounts[g])
+        cents = int(bal[slot])
+        lo, hi = int(starts[g]), int(ends[g])
+        for i, delta in enumerate(d[lo:hi].tolist(), lo):
+            if delta < 0 and cents + delta < floor:
+                rejected[order[i]] = True
+            else:
+                cents += delta
+        bal[slot] = cents
+    return rejected, accounts[bal[accounts] != before].tolist()
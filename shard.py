@@ -0,0 +1,553 @@
+"""
+Sharded engine module for the Account Management System.
+
+One Python process is limited to one core by the GIL. This module runs
+the `operations` batch API in a pool of worker processes, each owning
+the accounts of one shard in its own `data` store (and, optionally, its
+own journal). A router in the calling process splits every batch by
+shard, sends the sub-batches to all workers at once, and gathers the
+results back in input order:
+
+    with ShardedEngine(shards=8) as engine:
+        results = engine.apply_batch_cents(records)
+
+Accounts are assigned to shards with a stable hash (CRC-32 of the id),
+so an account always lands on the same worker and journal, across runs.
+
+A TRANSFER between two accounts of one shard runs atomically inside that
+worker. A TRANSFER across shards is a two-phase commit run by the router:
+
+1. Prepare, in batch order on both shards: the source shard moves the
+   amount to a hold account (refused on insufficient funds or a bad
+   amount), and the target shard checks that the credit would fit.
+2. Decide: the transfer commits if both agreed. With a journal
+   directory, commit decisions are appended to "transfers.log" and
+   fsynced before anything else happens; a transfer never logged as
+   committed is aborted.
+3. Settle: the target is credited and the hold released, or the hold
+   is refunded to the source on abort.
+
+Idempotency keys are remembered (and journaled) by the worker that owns
+the account of the record. A cross-shard TRANSFER has no single owner
+to remember its key, so a keyed one is refused with INVALID_OPERATION.
+
+A batch is cut into segments so that no record of a segment touches an
+account of a cross-shard transfer earlier in the same segment; every
+transfer is settled before the next segment runs, so the results are
+exactly those of applying the batch in order in one process. Each shard
+settles transfers in id order and remembers the last one it settled, so
+settling again is harmless: on restart, committed transfers are settled
+again and the holds of undecided ones are refunded.
+
+Routing and reordering still cost the router about a microsecond per
+record, which caps how far `apply_batch_cents` scales. Producers that
+can split their records by `shard_of` at the source (one reader per
+input partition, for instance) should call `apply_partitioned` instead:
+it sends each batch to its shard untouched and returns the results as
+columns, so the router does no per-record Python work and throughput
+grows with the number of workers.
+"""
+
+import json
+import multiprocessing
+import os
+import zlib
+from typing import Iterable
+
+import operations
+
+_OWNER_CACHE = 1 << 20
+"""
+Most account-to-shard assignments the router remembers before starting over.
+"""
+
+_HOLD = "\x00hold:"
+"""
+Prefix of the accounts where a shard holds the amount of a cross-shard
+transfer leaving one of its accounts (the source id follows the prefix).
+"""
+
+_SETTLED = "\x00settled"
+"""
+Account holding the id of the last cross-shard transfer a shard settled.
+"""
+
+_LOG_LIMIT = 1 << 20
+"""
+Size in bytes past which the transfer decision log is compacted.
+"""
+
+
+def shard_of(account_id: str, shards: int) -> int:
+    """
+    Return the shard that owns an account.
+    Args:
+        account_id (str): The account identifier.
+        shards (int): The number of shards.
+    Returns:
+        int: The shard index, between 0 and `shards` - 1.
+    """
+    return zlib.crc32(account_id.encode("utf-8")) % shards
+
+
+def _refused(record: tuple) -> operations.Result | None:
+    """
+    Return the result of a record the router refuses without sending it:
+    operations the engine does not offer (such as its internal _HOLD and
+    _ACCEPT) and the reserved accounts whose ids start with NUL.
+    """
+    if operations.lookup(record[0]) is None:
+        return operations.Result(operations.INVALID_OPERATION)
+    if record[1][:1] == "\x00" or (len(record) > 3 and isinstance(record[3], str)
+                                    and record[3].strip()[:1] == "\x00"):
+        return operations.Result(operations.INVALID_ACCOUNT)
+    return None
+
+
+def _hold(account_id: str, cents: int | None, status: str, target: str | None) -> operations.Result:
+    """
+    Move the amount of a cross-shard transfer from its source to the hold
+    account of the source (the prepare phase on the source shard).
+    """
+    return operations.lookup("TRANSFER").handler(account_id, cents, status, _HOLD + account_id)
+
+
+def _accept(account_id: str, cents: int | None, status: str, target: str | None) -> operations.Result:
+    """
+    Check that the target of a cross-shard transfer can be credited
+    (the prepare phase on the target shard); nothing is changed.
+    """
+    import data
+
+    if cents is None:
+        return operations.Result(status)
+    balance = data.read_cents(account_id)
+    if balance + cents > data.MAX_CENTS:
+        return operations.Result(operations.INVALID_AMOUNT)
+    return operations.Result(operations.OK, balance)
+
+
+def _settle(actions: list[tuple]) -> None:
+    """
+    Settle decided cross-shard transfers on this shard, in transfer id order.
+    Transfers already settled here are skipped, so actions can be repeated.
+    The balances an action changes and the id of its transfer are written
+    as one journal record, so a crash cannot keep one without the other.
+    Args:
+        actions (list[tuple]): (transfer id, action, account id, cents) tuples;
+                               the action is "credit" (the target), "release"
+                               (the hold of a committed source) or "refund"
+                               (the hold of an aborted source).
+    """
+    import data
+
+    settled = data.read_cents(_SETTLED)
+    for txid, action, account_id, cents in sorted(actions):
+        if txid <= settled:
+            continue
+        hold = _HOLD + account_id
+        if action == "credit":
+            changes = [(account_id, data.read_cents(account_id) + cents)]
+        elif action == "release":
+            changes = [(hold, data.read_cents(hold) - cents)]
+        else:
+            changes = [(hold, data.read_cents(hold) - cents),
+                       (account_id, data.read_cents(account_id) + cents)]
+        data.write_all_cents(changes + [(_SETTLED, txid)])
+        settled = txid
+    data.commit()
+
+
+def _worker(conn, index: int, shards: int, journal_path: str | None) -> None:
+    """
+    Serve requests for one shard until the router sends None.
+    Args:
+        conn (multiprocessing.connection.Connection): The pipe to the router.
+        index (int): The shard owned by this worker.
+        shards (int): The number of shards.
+        journal_path (str | None): The journal of this shard, if any.
+    """
+    import data
+
+    operations.register("_HOLD", _hold)
+    operations.register("_ACCEPT", _accept)
+    internal = {operations.lookup("_HOLD"), operations.lookup("_ACCEPT")}
+    if journal_path is not None:
+        data.open_journal(journal_path)
+    try:
+        while True:
+            request = conn.recv()
+            if request is None:
+                break
+            kind, payload = request
+            try:
+                if kind == "batch" or kind == "segment":
+                    accounts = set(payload[1])
+                    if len(payload) > 3:
+                        accounts.update(t.strip() for t in payload[3] if isinstance(t, str) and t.strip())
+                    for account_id in accounts:
+                        if shard_of(account_id, shards) != index:
+                            raise ValueError(f"Account {account_id!r} does not belong to shard {index}.")
+                    if kind == "batch" and any(isinstance(op, (str, int)) and operations.lookup(op) in internal
+                                               for op in set(payload[0])):
+                        raise ValueError("_HOLD and _ACCEPT are internal to the sharded engine.")
+                    results = operations.apply_batch_cents(zip(*payload))
+                    reply = ([r.status for r in results], [r.balance for r in results])
+                elif kind == "settle":
+                    reply = _settle(payload)
+                elif kind == "holds":
+                    reply = (data.read_cents(_SETTLED),
+                             {a[len(_HOLD):]: data.read_cents(a) for a in data._account_ids()
+                              if a.startswith(_HOLD) and data.read_cents(a)})
+                else:
+                    reply = data.read_cents(payload)
+            except Exception as e:
+                conn.send((False, e))
+            else:
+                conn.send((True, reply))
+    finally:
+        data.close_journal()
+        conn.close()
+
+
+class ShardedEngine:
+    """
+    Pool of worker processes, each owning one shard of the accounts.
+    """
+
+    def __init__(self, shards: int | None = None, journal_dir: str | None = None,
+                 start_method: str = "spawn"):
+        """
+        Start the workers.
+        Args:
+            shards (int | None): Number of worker processes. Defaults to the CPU count.
+            journal_dir (str | None): If given, shard i journals its writes to
+                                      "shard-<i>.journal" in this directory and
+                                      replays it at startup, the router logs
+                                      cross-shard transfer decisions to
+                                      "transfers.log", and transfers left in
+                                      doubt by a crash are settled.
+            start_method (str): The multiprocessing start method.
+        """
+        shards = shards or os.cpu_count() or 1
+        context = multiprocessing.get_context(start_method)
+        self._conns = []
+        self._procs = []
+        self._owners: dict[str, int] = {}
+        self._log = None
+        self._log_path = None
+        self._next_txid = 1
+        for i in range(shards):
+            path = None if journal_dir is None else os.path.join(journal_dir, f"shard-{i}.journal")
+            parent, child = context.Pipe()
+            proc = context.Process(target=_worker, args=(child, i, shards, path), daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+        if journal_dir is not None:
+            self._recover(os.path.join(journal_dir, "transfers.log"))
+
+    @property
+    def shards(self) -> int:
+        """
+        Number of shards (worker processes).
+        """
+        return len(self._conns)
+
+    def _gather(self, shards: Iterable[int]) -> list:
+        """
+        Receive one reply from each given shard, raising the first worker error.
+        """
+        replies = [self._conns[s].recv() for s in shards]
+        for ok, value in replies:
+            if not ok:
+                raise value
+        return [value for _, value in replies]
+
+    def _recover(self, path: str) -> None:
+        """
+        Settle the cross-shard transfers a previous run left in doubt: logged
+        commits are settled (again), and every other hold is refunded.
+        Then start a new decision log.
+        Args:
+            path (str): The decision log path.
+        """
+        n = len(self._conns)
+        actions = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # A torn last line: that decision was never acted on.
+                    if len(entry) == 1:
+                        self._next_txid = max(self._next_txid, entry[0])
+                        continue
+                    txid, source, target, cents = entry
+                    self._next_txid = max(self._next_txid, txid + 1)
+                    actions.setdefault(shard_of(target, n), []).append((txid, "credit", target, cents))
+                    actions.setdefault(shard_of(source, n), []).append((txid, "release", source, cents))
+        self._exchange([[]] * n, actions)
+        for s in range(n):
+            self._conns[s].send(("holds", None))
+        states = self._gather(range(n))
+        self._next_txid = max([self._next_txid] + [settled + 1 for settled, _ in states])
+        actions = {}
+        for s, (_, holds) in enumerate(states):
+            for source, cents in holds.items():
+                actions.setdefault(s, []).append((self._next_txid, "refund", source, cents))
+                self._next_txid += 1
+        self._exchange([[]] * n, actions)
+        self._log_path = path
+        self._compact_log()
+
+    def _compact_log(self) -> None:
+        """
+        Replace the decision log with one that only holds the next transfer id.
+        Only called when every logged transfer is settled.
+        """
+        if self._log is not None:
+            self._log.close()
+        tmp = self._log_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps([self._next_txid]) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._log_path)
+        directory = os.open(os.path.dirname(os.path.abspath(self._log_path)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+        self._log = open(self._log_path, "a", encoding="utf-8")
+
+    def _decide(self, committed: list[tuple]) -> None:
+        """
+        Durably log commit decisions before any of them is settled.
+        Args:
+            committed (list[tuple]): (transfer id, source, target, cents) tuples.
+        """
+        if self._log is None or not committed:
+            return
+        self._log.write("".join(json.dumps(c) + "\n" for c in committed))
+        self._log.flush()
+        os.fsync(self._log.fileno())
+
+    def _run_segment(self, batches: list[list[tuple]], positions: list[list], wide: dict,
+                     transfers: list[tuple], settles: dict, out: list) -> dict:
+        """
+        Apply one segment of a batch, after settling the transfers of the
+        previous segment, and decide the cross-shard transfers it prepared.
+        Args:
+            batches (list[list[tuple]]): The records of the segment, by shard.
+            positions (list[list]): The batch position of every record, by shard
+                                    (None for the target side of a transfer).
+            wide (dict): The number of fields the records of a shard are padded
+                         to, for shards whose batch holds a same-shard TRANSFER
+                         (4) or a record with an idempotency key (5).
+            transfers (list[tuple]): (position, transfer id, source, target, amount,
+                                     source shard, target shard, index of the
+                                     target check in its shard batch) tuples.
+            settles (dict): The settle actions still due, by shard.
+            out (list): The results of the batch, filled in place.
+        Returns:
+            dict: The settle actions of the transfers of this segment, by shard.
+        """
+        for s, width in wide.items():
+            batches[s] = [r if len(r) == width else (*r, *(None,) * (width - len(r))) for r in batches[s]]
+        replies = self._exchange(batches, settles, internal=True)
+        new = tuple.__new__
+        result = operations.Result
+        for s, (statuses, balances) in enumerate(replies):
+            for i, status, balance in zip(positions[s], statuses, balances):
+                if i is not None:
+                    out[i] = new(result, (status, balance))
+        actions = {}
+        committed = []
+        for i, txid, source, target, amount, s, t, j in transfers:
+            if out[i].status != operations.OK:
+                continue  # Refused by the source: nothing was held.
+            cents = amount if type(amount) is int else operations.parse_cents(amount)[0]
+            vote = replies[t][0][j]
+            if vote == operations.OK:
+                committed.append((txid, source, target, cents))
+                actions.setdefault(t, []).append((txid, "credit", target, cents))
+                actions.setdefault(s, []).append((txid, "release", source, cents))
+            else:
+                out[i] = result(vote)
+                actions.setdefault(s, []).append((txid, "refund", source, cents))
+        self._decide(committed)
+        return actions
+
+    def apply_batch_cents(self, records: Iterable[tuple]) -> list[operations.Result]:
+        """
+        Apply a batch of operations on the shards that own their accounts.
+        Each shard applies its records in input order and commits once, and
+        all shards work in parallel; records of different accounts are
+        independent, and the batch is cut wherever a record depends on a
+        cross-shard transfer before it (see the module docstring), so the
+        results are those `operations.apply_batch_cents` would return.
+        An idempotency key (the fifth field) is remembered by the shard of
+        the account, so retries dedupe as they would in one process; a keyed
+        TRANSFER across shards is refused with INVALID_OPERATION.
+        Args:
+            records (Iterable[tuple]): (operation, account_id, amount[, target[, key]])
+                                       records, amounts as in `operations.apply_cents`.
+        Returns:
+            list[Result]: One result per record, in input order, balances in cents.
+        """
+        n = len(self._conns)
+        owners = self._owners
+        if len(owners) > _OWNER_CACHE:
+            owners.clear()
+        out = []
+        settles = {}
+        batches = [[] for _ in range(n)]
+        positions = [[] for _ in range(n)]
+        wide = {}
+        transfers = []
+        pending = set()
+        for i, record in enumerate(records):
+            out.append(None)
+            refused = _refused(record)
+            if refused is not None:
+                out[i] = refused
+                continue
+            s = owners.get(record[1])
+            if s is None:
+                s = owners[record[1]] = shard_of(record[1], n)
+            target = None
+            t = s
+            keyed = len(record) > 4 and record[4] is not None
+            if len(record) > 3:
+                if record[0].strip().upper() == "TRANSFER":
+                    target = record[3].strip() if isinstance(record[3], str) else ""
+                    record = record[:5] if keyed else record[:4]
+                    if target:
+                        t = owners.get(target)
+                        if t is None:
+                            t = owners[target] = shard_of(target, n)
+                elif keyed:
+                    record = (record[0], record[1], record[2], None, record[4])
+                else:
+                    record = record[:3]
+            if keyed and t != s:
+                out[i] = operations.Result(operations.INVALID_OPERATION)
+                continue
+            if pending and (record[1] in pending or target in pending):
+                settles = self._run_segment(batches, positions, wide, transfers, settles, out)
+                batches = [[] for _ in range(n)]
+                positions = [[] for _ in range(n)]
+                wide = {}
+                transfers = []
+                pending = set()
+            if t != s:
+                transfers.append((i, self._next_txid, record[1], target, record[2], s, t,
+                                  len(batches[t])))
+                self._next_txid += 1
+                pending.update((record[1], target))
+                batches[t].append(("_ACCEPT", target, record[2]))
+                positions[t].append(None)
+                record = ("_HOLD", record[1], record[2])
+            elif len(record) > wide.get(s, 3):
+                wide[s] = len(record)
+            batches[s].append(record)
+            positions[s].append(i)
+        settles = self._run_segment(batches, positions, wide, transfers, settles, out)
+        if settles:
+            self._exchange([[]] * n, settles)
+            if self._log is not None and self._log.tell() > _LOG_LIMIT:
+                self._compact_log()
+        return out
+
+    def apply_partitioned(self, batches: list[list[tuple]]) -> list[tuple[list, list]]:
+        """
+        Apply batches that are already split by shard, all shards in parallel.
+        Batch i must only hold records whose account (and TRANSFER target)
+        belongs to shard i (`shard_of(account_id, engine.shards) == i`); a
+        worker refuses a batch holding any other account before applying it.
+        Cross-shard transfers must go through `apply_batch_cents`.
+        Args:
+            batches (list[list[tuple]]): One list of records per shard, as in
+                                         `apply_batch_cents`; all records of a
+                                         batch have the same number of fields.
+        Returns:
+            list[tuple[list, list]]: For every shard, the status and the balance
+            in cents (None unless OK) of each of its records, in batch order.
+        Raises:
+            ValueError: If the number of batches differs from the number of
+                        shards, records do not all have 3, all 4 or all 5
+                        fields, or a record was sent to the wrong shard.
+        """
+        return self._exchange(batches)
+
+    def _exchange(self, batches: list[list[tuple]], settles: dict | None = None,
+                  internal: bool = False) -> list[tuple[list, list]]:
+        """
+        Send settle actions, then batches, to the shards, and gather the replies.
+        Takes the batches and returns the replies as in `apply_partitioned`.
+        Args:
+            batches (list[list[tuple]]): One list of records per shard.
+            settles (dict | None): Settle actions (see `_settle`) by shard,
+                                   applied on each shard before its batch.
+            internal (bool): Whether the batches may hold the _HOLD and _ACCEPT
+                             records of the two-phase commit.
+        """
+        if len(batches) != len(self._conns):
+            raise ValueError("Expected one batch per shard.")
+        busy = [s for s, batch in enumerate(batches) if batch]
+        error = None
+        if any(len(set(map(len, batches[s]))) != 1 for s in busy):
+            error = ValueError("All records of a batch must have the same number of fields.")
+        # Columns pickle about twice as fast as a list of small tuples.
+        columns = [tuple(zip(*batches[s])) for s in busy]
+        if error is None and any(len(c) not in (3, 4, 5) for c in columns):
+            error = ValueError("Records must be (operation, account_id, amount[, target[, key]]) tuples.")
+        settles = settles or {}
+        for s, actions in settles.items():
+            self._conns[s].send(("settle", actions))
+        if error is not None:
+            # Decided transfers are settled even when the batch is refused.
+            self._gather(list(settles))
+            raise error
+        kind = "segment" if internal else "batch"
+        for s, c in zip(busy, columns):
+            self._conns[s].send((kind, c))
+        replies = self._gather(list(settles) + busy)[len(settles):]
+        replies = dict(zip(busy, replies))
+        return [replies.get(s, ([], [])) for s in range(len(batches))]
+
+    def read_cents(self, account_id: str) -> int:
+        """
+        Return the balance of an account in cents, from the shard that owns it.
+        """
+        s = shard_of(account_id, len(self._conns))
+        self._conns[s].send(("read", account_id))
+        return self._gather([s])[0]
+
+    def close(self) -> None:
+        """
+        Stop the workers, letting each commit and close its journal.
+        """
+        if self._log is not None:
+            self._compact_log()
+            self._log.close()
+            self._log = None
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for proc, conn in zip(self._procs, self._conns):
+            proc.join()
+            conn.close()
+        self._conns = []
+        self._procs = []
+
+    def __enter__(self) -> "ShardedEngine":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,108 @@
+"""
+Snapshot module for the Account Management System.
+
+This module saves and loads a point-in-time image of the balance store
+in a compact binary file, so startup does not have to replay the whole
+journal history.
+
+File layout (little-endian):
+    magic (8 bytes) | account count (uint64) | ids size (uint64) | crc32 (uint32)
+    cents column: account count x int64, in slot order
+    ids column: account ids in slot order, utf-8, each followed by "\\n"
+The CRC covers both columns. Snapshots are written to a temporary file,
+fsynced and renamed into place, so a crash never leaves a partial
+snapshot behind.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+MAGIC = b"ACCTSNP1"
+"""
+File signature written at the start of every snapshot.
+"""
+
+_HEADER = struct.Struct("<8sQQI")
+
+
+def write(path: str, cents: array, account_ids: list[str]) -> None:
+    """
+    Atomically write a snapshot of the store.
+    Args:
+        path (str): The snapshot file path.
+        cents (array): The balances in cents ("q" array), one per slot.
+        account_ids (list[str]): The account id of every slot, in slot order.
+    Raises:
+        ValueError: If the columns differ in length or an id contains a newline.
+    """
+    if len(cents) != len(account_ids):
+        raise ValueError("Every slot needs exactly one account id.")
+    ids = ("\n".join(account_ids) + "\n" if account_ids else "").encode("utf-8")
+    if ids.count(b"\n") != len(account_ids):
+        raise ValueError("Account ids must not contain newlines.")
+    column = cents
+    if sys.byteorder != "little":
+        column = array("q", cents)
+        column.byteswap()
+    column = column.tobytes()
+    crc = zlib.crc32(ids, zlib.crc32(column))
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(account_ids), len(ids), crc))
+        f.write(column)
+        f.write(ids)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+def load(path: str) -> tuple[array, bytes]:
+    """
+    Load a snapshot through a read-only memory map.
+    The ids column is returned undecoded, so callers can search it
+    directly instead of paying to decode millions of ids up front.
+    Args:
+        path (str): The snapshot file path.
+    Returns:
+        tuple[array, bytes]: The balances in cents, in slot order, and the
+        ids column (account ids in slot order, each followed by "\\n").
+    Raises:
+        ValueError: If the file is not a snapshot or fails its checksum.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        if len(buf) < _HEADER.size:
+            raise ValueError(f"{path} is not an account snapshot.")
+        magic, count, ids_size, crc = _HEADER.unpack_from(buf, 0)
+        start = _HEADER.size
+        ids_start = start + count * 8
+        if magic != MAGIC or len(buf) != ids_start + ids_size:
+            raise ValueError(f"{path} is not an account snapshot.")
+        with memoryview(buf) as view, view[start:ids_start] as column, view[ids_start:] as ids:
+            if zlib.crc32(ids, zlib.crc32(column)) != crc:
+                raise ValueError(f"{path} is corrupt (checksum mismatch).")
+            cents = array("q")
+            cents.frombytes(column)
+            ids_column = bytes(ids)
+    if sys.byteorder != "little":
+        cents.byteswap()
+    return cents, ids_column
+
+
+def split_ids(ids_column: bytes) -> list[str]:
+    """
+    Decode an ids column returned by `load`.
+    Args:
+        ids_column (bytes): Account ids, each followed by "\\n".
+    Returns:
+        list[str]: The account ids, in slot order.
+    """
+    return str(ids_column, "utf-8").split("\n")[:-1]
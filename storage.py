@@ -0,0 +1,201 @@
+"""
+Storage backend module for the Account Management System.
+
+By default `data` keeps balances in its own in-memory column. This
+module defines the `Backend` protocol that lets `data` keep them
+somewhere else instead (see `data.open_backend`), and ships two
+implementations:
+
+- `MemoryBackend`: a plain dict, the reference implementation.
+- `SQLiteBackend`: a SQLite database in WAL mode. Writes are buffered
+  in memory and upserted in one transaction per `commit`, so thousands
+  of writes share one fsync; reads see buffered writes first and go to
+  the database through a pool of connections otherwise, so threaded
+  workers do not serialize on one connection.
+
+Backends store balances as integer cents keyed by account id, and must
+be safe to call from several threads; `data` serializes the updates of
+any single account with its own locks.
+"""
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Protocol
+
+
+class Backend(Protocol):
+    """
+    Where `data` keeps the balances, in integer cents keyed by account id.
+    """
+
+    def read(self, account_id: str) -> int | None:
+        """
+        Return the balance of an account in cents, or None if it was never written.
+        Must reflect every earlier `write`, committed or not.
+        """
+
+    def write(self, account_id: str, cents: int) -> None:
+        """
+        Set the balance of an account in cents. May stay pending until `commit`.
+        """
+
+    def commit(self) -> None:
+        """
+        Block until every earlier write is durable.
+        """
+
+    def count(self) -> int:
+        """
+        Return the number of accounts stored.
+        """
+
+    def close(self) -> None:
+        """
+        Commit pending writes and release every resource.
+        """
+
+
+class MemoryBackend:
+    """
+    Backend keeping balances in a dict. Nothing survives the process.
+    """
+
+    def __init__(self):
+        self._balances: dict[str, int] = {}
+
+    def read(self, account_id: str) -> int | None:
+        return self._balances.get(account_id)
+
+    def write(self, account_id: str, cents: int) -> None:
+        self._balances[account_id] = cents
+
+    def commit(self) -> None:
+        pass
+
+    def count(self) -> int:
+        return len(self._balances)
+
+    def close(self) -> None:
+        pass
+
+
+_SCHEMA = "CREATE TABLE IF NOT EXISTS balances (account TEXT PRIMARY KEY, cents INTEGER NOT NULL) WITHOUT ROWID"
+_SELECT = "SELECT cents FROM balances WHERE account = ?"
+_UPSERT = ("INSERT INTO balances (account, cents) VALUES (?, ?) "
+           "ON CONFLICT (account) DO UPDATE SET cents = excluded.cents")
+_COUNT = "SELECT COUNT(*) FROM balances"
+
+
+class SQLiteBackend:
+    """
+    Backend keeping balances in a SQLite database, with batched writes
+    and a connection pool.
+    """
+
+    def __init__(self, path: str, pool_size: int = 4, max_pending: int = 65536,
+                 synchronous: str = "FULL"):
+        """
+        Open (or create) a balance database.
+        Args:
+            path (str): The database file path.
+            pool_size (int): Number of pooled connections shared by reading threads.
+            max_pending (int): Buffered writes that trigger a flush without waiting
+                               for `commit`.
+            synchronous (str): SQLite `synchronous` setting. FULL makes every
+                               `commit` durable across power loss; NORMAL only
+                               across process crashes, but syncs less often.
+        """
+        self.path = path
+        self.max_pending = max_pending
+        self._pending: dict[str, int] = {}
+        self._flushing: dict[str, int] = {}
+        self._flush_lock = threading.Lock()
+        self._pool: queue.Queue = queue.Queue()
+        self._connections = []
+        for _ in range(max(1, pool_size)):
+            conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                   cached_statements=16)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={synchronous}")
+            self._connections.append(conn)
+            self._pool.put(conn)
+        with self._connection() as conn:
+            conn.execute(_SCHEMA)
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a pooled connection for the duration of a `with` block.
+        """
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def read(self, account_id: str) -> int | None:
+        """
+        Return the balance of an account in cents, or None if it was never written.
+        Buffered writes are seen before the database.
+        """
+        cents = self._pending.get(account_id)
+        if cents is None:
+            cents = self._flushing.get(account_id)
+        if cents is not None:
+            return cents
+        with self._connection() as conn:
+            row = conn.execute(_SELECT, (account_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def write(self, account_id: str, cents: int) -> None:
+        """
+        Buffer a balance; it is upserted at the next flush.
+        """
+        self._pending[account_id] = cents
+        if len(self._pending) >= self.max_pending:
+            self.commit()
+
+    def commit(self) -> None:
+        """
+        Upsert every buffered write in a single transaction.
+        If the transaction fails, it is rolled back and the writes stay
+        buffered for the next commit.
+        """
+        with self._flush_lock:
+            if not self._pending:
+                return
+            # Swap first so writers keep buffering; readers check both dicts.
+            self._flushing, self._pending = self._pending, {}
+            with self._connection() as conn:
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    conn.executemany(_UPSERT, self._flushing.items())
+                    conn.execute("COMMIT")
+                except BaseException:
+                    # Put the batch back without overwriting newer writes,
+                    # then leave the connection outside any transaction.
+                    self._flushing.update(self._pending)
+                    self._pending, self._flushing = self._flushing, {}
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    raise
+            self._flushing = {}
+
+    def count(self) -> int:
+        """
+        Return the number of accounts stored, including buffered new ones.
+        """
+        self.commit()
+        with self._connection() as conn:
+            return conn.execute(_COUNT).fetchone()[0]
+
+    def close(self) -> None:
+        """
+        Commit buffered writes and close every pooled connection.
+        """
+        self.commit()
+        for conn in self._connections:
+            conn.close()
+        self._connections = []
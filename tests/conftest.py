@@ -4,12 +4,26 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 from decimal import Decimal
 import pytest
 import data
+import main
+import operations
 
 @pytest.fixture(autouse=True)
 def reset_balance():
     """
     Reset the balance before and after each test to avoid test coupling.
     """
+    data.reset()
     data.write_balance(Decimal("1000.00"))
     yield
+    data.reset()
     data.write_balance(Decimal("1000.00"))
+    operations._DEDUP = None
+    data.track_keys(None)
+
+
+@pytest.fixture(autouse=True)
+def interactive_stdin(monkeypatch):
+    """
+    Run the menu as if at a terminal, whatever stdin the test runner was given.
+    """
+    monkeypatch.setattr(main, "_piped", lambda: False)
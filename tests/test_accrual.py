@@ -0,0 +1,126 @@
+import random
+from decimal import Decimal
+
+import pytest
+import accrual
+import data
+import main
+
+SCHEDULE = [accrual.Tier(0, "0", 150), accrual.Tier(100000, "0.00125"), accrual.Tier(10 ** 7, "0.0333333", 25)]
+
+
+def _store(n: int = 50) -> dict:
+    """
+    Fill the store with accounts spread over every tier; return their balances.
+    """
+    rng = random.Random(20)
+    balances = {}
+    for i in range(n):
+        cents = rng.choice([0, rng.randrange(-500, 300), rng.randrange(10 ** 9)])
+        data.write_cents(cents, f"A{i}")
+        balances[f"A{i}"] = cents
+    return balances
+
+
+def _expected(balances: dict) -> dict:
+    """
+    The balances after the schedule, computed with Decimal arithmetic.
+    """
+    tiers = accrual.Schedule(SCHEDULE).tiers
+    out = {}
+    for account_id, cents in balances.items():
+        matching = [t for t in tiers if t.minimum <= cents]
+        posting = 0
+        if matching:
+            tier = matching[-1]
+            interest = (data.from_cents(cents) * tier.rate).quantize(Decimal("0.01"))
+            posting = data.to_cents(interest) - tier.fee
+        out[account_id] = cents if posting < 0 and cents + posting < 0 else cents + posting
+    return out
+
+
+def test_rates_round_like_quantize():
+    """
+    Interest rounds half-even to the cent, exactly like Decimal.quantize.
+    """
+    rng = random.Random(7)
+    schedule = accrual.Schedule([accrual.Tier(-10 ** 12, "0.005"), accrual.Tier(0, "0.0125")])
+    balances = [rng.randrange(-10 ** 9, 10 ** 9) for _ in range(5000)] + [100, 300, -100, -300]
+    for cents, posting in zip(balances, schedule.postings(balances)):
+        rate = Decimal("0.0125") if cents >= 0 else Decimal("0.005")
+        assert posting == data.to_cents(data.from_cents(cents) * rate)
+    with pytest.raises(ValueError):
+        accrual.Schedule([accrual.Tier(0, "0.1"), accrual.Tier(0, "0.2")])
+
+
+def test_run_posts_every_account_once(tmp_path):
+    """
+    A run posts interest and fees to every account, rejecting fees that would overdraw.
+    """
+    balances = _store()
+    path = str(tmp_path / "run.ckpt")
+    stats = accrual.run(SCHEDULE, path, chunk_size=7)
+    expected = _expected(balances)
+    assert {a: data.read_cents(a) for a in balances} == expected
+    assert stats.accounts == data.account_count()
+    assert stats.rejected > 0 and stats.credited > 0 and stats.debited > 0
+    again = accrual.run(SCHEDULE, path, chunk_size=7)
+    assert again[:5] == stats[:5]
+    assert {a: data.read_cents(a) for a in balances} == expected
+    with pytest.raises(ValueError):
+        accrual.run([accrual.Tier(0, "0.5")], path)
+
+
+@pytest.mark.parametrize("crash", ["_apply_deltas", "commit"])
+def test_interrupted_run_resumes_exactly_once(crash, tmp_path, monkeypatch):
+    """
+    A run interrupted before or after posting a chunk resumes without skipping or repeating accounts.
+    """
+    balances = _store()
+    reference = accrual.run(SCHEDULE, chunk_size=7)
+    data.reset()
+    _store()
+    path = str(tmp_path / "run.ckpt")
+    original = getattr(data, crash)
+    calls = iter(range(100))
+
+    def fail_third(*args, **kwargs):
+        if next(calls) == 2:
+            raise KeyboardInterrupt
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(data, crash, fail_third)
+    with pytest.raises(KeyboardInterrupt):
+        accrual.run(SCHEDULE, path, chunk_size=7)
+    monkeypatch.setattr(data, crash, original)
+    stats = accrual.run(SCHEDULE, path, chunk_size=7)
+    assert {a: data.read_cents(a) for a in balances} == _expected(balances)
+    assert stats[:5] == reference[:5]
+
+
+def test_resume_refuses_a_changed_chunk(tmp_path, monkeypatch):
+    """
+    If an account of the interrupted chunk changed since, the run cannot tell whether it was posted.
+    """
+    _store()
+    path = str(tmp_path / "run.ckpt")
+    original = data.commit
+    monkeypatch.setattr(data, "commit", lambda: (_ for _ in ()).throw(KeyboardInterrupt))
+    with pytest.raises(KeyboardInterrupt):
+        accrual.run(SCHEDULE, path, chunk_size=100)
+    monkeypatch.setattr(data, "commit", original)
+    data.write_cents(123456789, "A3")
+    with pytest.raises(ValueError):
+        accrual.run(SCHEDULE, path, chunk_size=100)
+
+
+def test_main_accrue_command(tmp_path, capsys):
+    """
+    The accrue command posts the schedule given as tiers in amounts and reports the totals.
+    """
+    data.write_cents(200000, "A")
+    data.write_cents(500, "B")
+    main.main(["accrue", "--tier", "0:0:1.50", "--tier", "1000:0.001", "--checkpoint", str(tmp_path / "c")])
+    assert data.read_cents("A") == 200200
+    assert data.read_cents("B") == 350
+    assert "Processed 3 accounts (3 posted, 0 rejected)" in capsys.readouterr().out
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+import amounts
+
+
+@pytest.mark.parametrize("raw, expected", [
+    (b"12", (1200, amounts.OK)),
+    (b"12.3", (1230, amounts.OK)),
+    ("12.34", (1234, amounts.OK)),
+    (b"0.05", (5, amounts.OK)),
+    (b" 7.50 \n", (750, amounts.OK)),
+    (b"9" * 16, (10 ** 18 - 100, amounts.OK)),
+    (b"", (None, amounts.EMPTY)),
+    ("   ", (None, amounts.EMPTY)),
+    (b"1e3", (None, amounts.EXPONENT)),
+    ("2.5E-1", (None, amounts.EXPONENT)),
+    (b"NaN", (None, amounts.NON_FINITE)),
+    ("-Infinity", (None, amounts.NON_FINITE)),
+    (b"1.234", (None, amounts.TOO_PRECISE)),
+    (b"1" * 17, (None, amounts.TOO_LARGE)),
+    (b"0.00", (None, amounts.NOT_POSITIVE)),
+    (b"-1", (None, amounts.NOT_POSITIVE)),
+    (b".5", (None, amounts.MALFORMED)),
+    (b"12.", (None, amounts.MALFORMED)),
+    (b"+5", (None, amounts.MALFORMED)),
+    (b"1,000", (None, amounts.MALFORMED)),
+    ("１２", (None, amounts.MALFORMED)),
+    (b"\xff", (None, amounts.MALFORMED)),
+])
+def test_parse(raw, expected):
+    """
+    Valid amounts become exact cents; every rejection has its own status.
+    """
+    assert amounts.parse(raw) == expected
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_parse_column_matches_parse(use_numpy, monkeypatch):
+    """
+    Uniform and mixed columns give the same cents and statuses as `parse`, with or without NumPy.
+    """
+    if not use_numpy:
+        monkeypatch.setattr(amounts, "numpy", None)
+    rng = random.Random(19)
+    pieces = ["0", "00", "1", "5", "12", "9" * 16, "9" * 17, ".", "-", "e", " ", "\n", "x"]
+    columns = [
+        [b"1.50", b"0.00", b"12.34"],
+        [b"7", b"0", b"9" * 16],
+        [b"1.5", b"0.25"],
+        [b"1", b""],
+        [b"1.5", b"1e3"],
+    ]
+    for _ in range(2000):
+        columns.append([rng.choice([
+            f"{rng.randrange(10 ** 6)}.{rng.randrange(100):02d}",
+            "".join(rng.choice(pieces) for _ in range(rng.randrange(4))),
+        ]).encode() for _ in range(rng.randrange(1, 5))])
+    for column in columns:
+        parsed = [amounts.parse(v) for v in column]
+        assert amounts.parse_column(column) == ([c for c, _ in parsed], [s for _, s in parsed])
+    assert amounts.parse_column([b"1.50", b"0.00"]) == ([150, None], [amounts.OK, amounts.NOT_POSITIVE])
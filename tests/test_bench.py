@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+
+import bench
+import data
+
+
+def test_run_all_reports_every_selected_benchmark():
+    """
+    A filtered run times only the matching benchmarks and leaves the store clean.
+    """
+    report = bench.run_all("single.parse", repeat=1, min_time=0.001)
+    assert set(report["results"]) == {"single.parse_amount", "single.parse_cents"}
+    for result in report["results"].values():
+        assert result["ns_per_op"] > 0
+        assert result["ops_per_s"] > 0
+    assert data.account_count() == 1
+
+
+def test_strict_parser_speed_is_recorded_against_decimal():
+    """
+    The report records how the strict amount parser compares with Decimal.
+    """
+    report = bench.run_all("amount", repeat=1, min_time=0.001)
+    assert set(report["speedups"]) == {"single.strict_amount", "bulk.strict_amounts"}
+    assert all(ratio > 0 for ratio in report["speedups"].values())
+    assert bench.run_all("single.parse", repeat=1, min_time=0.001)["speedups"] == {}
+
+
+def test_interactive_benchmark_prints_nothing(capsys):
+    """
+    Interactive operations run with scripted input and their output is discarded.
+    """
+    bench.run_all("single.credit", repeat=1, min_time=0.001)
+    assert capsys.readouterr().out == ""
+
+
+def test_compare_flags_only_slowdowns_beyond_threshold():
+    """
+    Benchmarks slower than the threshold are reported; faster and new ones are not.
+    """
+    baseline = {"results": {"a": {"ns_per_op": 100.0}, "b": {"ns_per_op": 100.0}}}
+    report = {"results": {"a": {"ns_per_op": 125.0}, "b": {"ns_per_op": 105.0},
+                          "c": {"ns_per_op": 999.0}}}
+    regressions = bench.compare(report, baseline, threshold=0.10)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("a:")
+
+
+def test_main_saves_and_compares(tmp_path, capsys):
+    """
+    The CLI writes a JSON report and exits 1 when the baseline is much faster.
+    """
+    path = tmp_path / "baseline.json"
+    args = ["--filter", "single.validate", "--repeat", "1", "--min-time", "0.001"]
+    assert bench.main(args + ["--save", str(path)]) == 0
+    saved = json.loads(path.read_text())
+    assert "single.validate_amount" in saved["results"]
+
+    saved["results"]["single.validate_amount"]["ns_per_op"] /= 1000
+    path.write_text(json.dumps(saved))
+    assert bench.main(args + ["--compare", str(path)]) == 1
+    assert "REGRESSION single.validate_amount" in capsys.readouterr().err
+
+
+def test_one_shot_total_stays_lean():
+    """
+    `main.py total` loads no optional subsystem; this import set is the enforced check.
+    The STARTUP_BUDGET_MS budget itself is enforced by `bench.py --startup` only: wall-clock
+    time on a shared machine is too noisy for it here, and the 10x bound below is a guard
+    against flaky runs missing a gross regression, not the budget.
+    """
+    code = "import sys, main; main.main(['total']); print(' '.join(sorted(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         check=True, cwd=os.path.dirname(os.path.abspath(bench.__file__))).stdout
+    modules = set(out.split("\n")[1].split())
+    for heavy in ("argparse", "operations", "typing", "re", "storage", "sqlite3", "journal",
+                  "metrics", "ingest", "amounts", "csv", "json", "numpy"):
+        assert heavy not in modules
+    overhead = bench.startup_overhead_ms(bench.run_startup(repeat=5))
+    assert overhead <= 10 * bench.STARTUP_BUDGET_MS
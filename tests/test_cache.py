@@ -0,0 +1,89 @@
+import threading
+from decimal import Decimal
+
+import pytest
+import cache
+import data
+import operations
+
+
+@pytest.fixture
+def balances():
+    """
+    Enable a small balance cache and disable it after the test.
+    """
+    yield data.enable_cache(2)
+    data.disable_cache()
+
+
+def test_lru_eviction_and_counters():
+    """
+    The least recently used balance is evicted first, and every lookup is counted.
+    """
+    c = cache.BalanceCache(2)
+    c.put("A", 1)
+    c.put("B", 2)
+    assert c.get("A") == 1
+    c.put("C", 3)
+    assert c.get("B") is None
+    assert (c.get("A"), c.get("C")) == (1, 3)
+    stats = c.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (3, 1, 1, 2)
+    assert stats["hit_rate"] == 0.75
+    with pytest.raises(ValueError):
+        cache.BalanceCache(0)
+
+
+def test_total_reads_are_cached(balances, capsys):
+    """
+    Repeated enquiries hit the cache after the first read.
+    """
+    for _ in range(3):
+        operations.execute("TOTAL")
+    assert capsys.readouterr().out.count("Current balance: 1000.00") == 3
+    assert (balances.hits, balances.misses) == (2, 1)
+
+
+def test_writes_invalidate_cached_balance(balances):
+    """
+    Every kind of write makes the next read see the new balance.
+    """
+    assert data.read_balance("A") == Decimal("0.00")
+    data.write_balance(Decimal("5.00"), "A")
+    assert data.read_balance("A") == Decimal("5.00")
+    operations.apply("CREDIT", "A", "1.00")
+    assert data.read_balance("A") == Decimal("6.00")
+    operations.apply("TRANSFER", "A", "2.00", "B")
+    assert (data.read_cents("A"), data.read_cents("B")) == (400, 200)
+    operations.settle_cents(data.account_slots(["A"]), [-100])
+    assert data.read_cents("A") == 300
+    data.reset()
+    assert data.read_cents("A") == 0
+    assert data.cache_stats()["misses"] >= 5
+
+
+def test_cache_never_serves_stale_balance_under_concurrency(balances):
+    """
+    Concurrent readers and writers never leave an outdated balance in the cache.
+    """
+    def writer():
+        for _ in range(2000):
+            data.apply_delta_cents(1, "HOT")
+
+    def reader():
+        for _ in range(2000):
+            data.read_cents("HOT")
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert data.read_cents("HOT") == 2000
+
+
+def test_cache_stats_without_cache():
+    """
+    No counters are reported while reads are uncached.
+    """
+    assert data.cache_stats() is None
@@ -0,0 +1,173 @@
+import os
+import subprocess
+import sys
+from array import array
+
+import pytest
+import columnar
+import data
+import snapshot
+
+
+@pytest.fixture
+def path(tmp_path):
+    """
+    Keep a balance file in sync with the store during the test.
+    """
+    path = str(tmp_path / "balances.col")
+    data.open_balance_file(path)
+    yield path
+    data.close_balance_file()
+
+
+def _rows(reader: columnar.Reader) -> dict:
+    """
+    The balance of every account in a file, by account id.
+    """
+    return {reader.account_id(row): cents for row, cents in enumerate(reader.cents())}
+
+
+def _store() -> dict:
+    """
+    The balance of every account in the store, by account id.
+    """
+    return dict(zip(data._account_ids(), data._STORAGE_BALANCE))
+
+
+def test_file_follows_every_write(path):
+    """
+    Single writes, transfers and settled columns reach the file, each bumping the row version.
+    """
+    reader = columnar.Reader(path)
+    data.write_cents(500, "A")
+    data.apply_delta_cents(-200, "A")
+    data.transfer_cents(100, "A", "B")
+    data.apply_deltas_cents(data.account_slots(["B", "C", "B"]), [5, 7, -1000], floor=0)
+    assert _rows(reader) == _store() == {data.DEFAULT_ACCOUNT: 100000, "A": 200, "B": 105, "C": 7}
+    assert list(reader.versions()) == [0, 3, 2, 1]
+    assert reader.summary() == columnar.Summary(4, 100312, 0, 7, 100000)
+    data.write_cents(-50, "C")
+    assert reader.summary() == columnar.Summary(4, 100255, 1, -50, 100000)
+    with pytest.raises(ValueError):
+        data.write_cents(1, "X" * 33)
+    assert len(reader) == data.account_count() == 4
+    reader.close()
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_summary_with_and_without_numpy(path, use_numpy, monkeypatch):
+    """
+    The aggregates are exact, even past the int64 range, with or without NumPy.
+    """
+    if not use_numpy:
+        monkeypatch.setattr(columnar, "numpy", None)
+    data.write_cents(2 ** 62, "A")
+    data.write_cents(2 ** 62, "B")
+    data.write_cents(-3, "C")
+    summary = columnar.Reader(path).summary()
+    assert summary == columnar.Summary(4, 2 ** 63 + 100000 - 3, 1, -3, 2 ** 62)
+
+
+def test_arrays_are_zero_copy_views(path):
+    """
+    The NumPy columns map the file: later writes show through them.
+    """
+    numpy = pytest.importorskip("numpy")
+    data.write_cents(42, "A")
+    ids, cents, versions = columnar.Reader(path).arrays()
+    assert list(ids) == [data.DEFAULT_ACCOUNT.encode(), b"A"]
+    assert not cents.flags.owndata and not cents.flags.writeable
+    data.write_cents(43, "A")
+    assert cents.tolist() == [100000, 43] and versions.tolist() == [0, 2]
+    assert int(numpy.sum(cents)) == 100043
+
+
+def test_readers_follow_growth_and_reloads(path, tmp_path):
+    """
+    A file replaced by a larger one, or rewritten after a reload, is followed with `refresh`.
+    """
+    reader = columnar.Reader(path)
+    for i in range(3000):
+        data.write_cents(i, f"A{i}")
+    assert reader.refresh() and not reader.refresh()
+    assert reader.generation > 1
+    assert _rows(reader) == _store()
+    assert list(reader.versions())[1:4] == [1, 1, 1]
+    snapshot_path = str(tmp_path / "s.snap")
+    snapshot.write(snapshot_path, array("q", [7, 8]), ["X", "Y"])
+    data.load_snapshot(snapshot_path)
+    assert reader.refresh()
+    assert _rows(reader) == {"X": 7, "Y": 8}
+    data.open_balance_file(path)
+    assert reader.refresh() and _rows(reader) == {"X": 7, "Y": 8}
+    reader.close()
+    with pytest.raises(ValueError):
+        data.open_backend(None)
+
+
+def test_other_processes_read_the_live_file(path):
+    """
+    A reader in another process sees the balances written by this one.
+    """
+    data.write_cents(250, "A")
+    code = ("import sys, columnar; r = columnar.Reader(sys.argv[1]); "
+            "print(r.summary().total, r.account_id(1))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code, path], cwd=root, capture_output=True,
+                         text=True, check=True).stdout
+    assert out.split() == ["100250", "A"]
+
+
+def test_rejects_other_files(tmp_path):
+    """
+    Files that are not columnar balance files are refused.
+    """
+    for content in (b"", b"BALCOL01", b"x" * 100):
+        bad = tmp_path / "bad.col"
+        bad.write_bytes(content)
+        with pytest.raises(ValueError):
+            columnar.Reader(str(bad))
+
+
+def test_operations_refuse_ids_the_file_cannot_hold(path):
+    """
+    Every front end answers INVALID_ACCOUNT for a new id too long for the id column,
+    without opening an account.
+    """
+    import io
+    import ingest
+    import operations
+    import server
+
+    long_id = "X" * 33
+    assert operations.apply("CREDIT", long_id, "1.00") == operations.Result(operations.INVALID_ACCOUNT)
+    assert operations.apply("TRANSFER", data.DEFAULT_ACCOUNT, "1.00", long_id).status == operations.INVALID_ACCOUNT
+    assert server.handle_lines([f"DEBIT {long_id} 1".encode(), b"CREDIT A 1"]) == b"ERR INVALID_ACCOUNT\nOK 1.00\n"
+    rejects = io.StringIO()
+    ingest.ingest(io.StringIO(f"CREDIT,{long_id},1\n"), io.StringIO(), rejects)
+    assert rejects.getvalue().splitlines()[1] == f'1,INVALID_ACCOUNT,"CREDIT,{long_id},1"'
+    assert data.account_count() == 2
+    assert operations.apply("CREDIT", "Y" * 32, "1.00").status == operations.OK
+
+
+def test_columnar_main_prints_exact_totals(path, capsys):
+    """
+    The aggregates are printed from cents without going through floats.
+    """
+    data.write_cents(2 ** 62 + 1, "A")
+    columnar.main([path])
+    out = capsys.readouterr().out
+    assert out.startswith(f"2 accounts, total {data.from_cents(2 ** 62 + 100001)}, 0 overdrawn, min 1000.00, ")
+
+
+def test_main_balance_file_option(tmp_path, capsys):
+    """
+    The --balance-file option writes the file readers map.
+    """
+    import main
+
+    path = str(tmp_path / "b.col")
+    main.main(["--balance-file", path, "total"])
+    assert "Current balance: 1000.00" in capsys.readouterr().out
+    assert columnar.Reader(path).summary() == columnar.Summary(1, 100000, 0, 100000, 100000)
+    assert data._COLUMNS is None
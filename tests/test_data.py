@@ -0,0 +1,178 @@
+from decimal import Decimal
+
+import data
+
+
+def test_default_account_initial_balance():
+    """
+    The default account starts at 1000.00 and is used when no account id is given.
+    """
+    data.reset()
+    assert data.read_balance() == Decimal("1000.00")
+    assert data.read_balance(data.DEFAULT_ACCOUNT) == Decimal("1000.00")
+
+
+def test_accounts_are_independent():
+    """
+    Writing one account does not affect any other account.
+    """
+    data.write_balance(Decimal("10.00"), "A")
+    data.write_balance(Decimal("20.50"), "B")
+    assert data.read_balance("A") == Decimal("10.00")
+    assert data.read_balance("B") == Decimal("20.50")
+    assert data.read_balance() == Decimal("1000.00")
+
+
+def test_unknown_account_reads_zero_without_allocating():
+    """
+    Reading an account that was never written returns 0.00 and does not grow the store.
+    """
+    count = data.account_count()
+    assert data.read_balance("NOPE") == Decimal("0.00")
+    assert data.account_count() == count
+
+
+def test_write_balance_quantizes_per_account():
+    """
+    Per-account writes are rounded to 2 decimals like the default account.
+    """
+    data.write_balance(Decimal("1.005"), "A")
+    assert data.read_balance("A") == Decimal("1.00")
+    data.write_balance(Decimal("-3.456"), "A")
+    assert data.read_balance("A") == Decimal("-3.46")
+
+
+def test_balances_are_stored_as_cents():
+    """
+    The store keeps one int64 cents slot per account.
+    """
+    data.write_balance(Decimal("12.34"), "A")
+    assert data._STORAGE_BALANCE.typecode == "q"
+    assert data._STORAGE_BALANCE[data._ACCOUNT_INDEX["A"]] == 1234
+
+
+def test_reset_drops_accounts():
+    """
+    reset() removes every account and restores the default balance.
+    """
+    data.write_balance(Decimal("5.00"), "A")
+    data.write_balance(Decimal("1.00"))
+    data.reset()
+    assert data.account_count() == 1
+    assert data.read_balance("A") == Decimal("0.00")
+    assert data.read_balance() == Decimal("1000.00")
+
+
+def test_apply_delta_respects_floor():
+    """
+    apply_delta refuses updates that would fall below the floor and leaves the balance unchanged.
+    """
+    data.write_balance(Decimal("10.00"), "A")
+    assert data.apply_delta(Decimal("-10.00"), "A", floor=Decimal("0")) == Decimal("0.00")
+    assert data.apply_delta(Decimal("-0.01"), "A", floor=Decimal("0")) is None
+    assert data.read_balance("A") == Decimal("0.00")
+    assert data.apply_delta(Decimal("2.345"), "A") == Decimal("2.34")
+
+
+def test_compare_and_set():
+    """
+    compare_and_set only replaces the balance when it still holds the expected value.
+    """
+    data.write_balance(Decimal("5.00"), "A")
+    assert data.compare_and_set(Decimal("5.00"), Decimal("7.00"), "A") is True
+    assert data.compare_and_set(Decimal("5.00"), Decimal("9.00"), "A") is False
+    assert data.read_balance("A") == Decimal("7.00")
+
+
+def test_concurrent_debits_never_overdraw():
+    """
+    Concurrent debits on the same accounts never pass the funds check twice.
+    """
+    import sys
+    import threading
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        accounts = [f"C{i}" for i in range(4)]
+        for account in accounts:
+            data.write_balance(Decimal("100.00"), account)
+        applied = []
+
+        def worker():
+            ok = 0
+            for i in range(400):
+                if data.apply_delta(Decimal("-1.00"), accounts[i % 4], floor=Decimal("0")) is not None:
+                    ok += 1
+            applied.append(ok)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert sum(applied) == 400
+    assert all(data.read_balance(a) == Decimal("0.00") for a in accounts)
+
+
+def test_concurrent_new_accounts_get_distinct_slots():
+    """
+    Accounts created concurrently from several threads never share a slot.
+    """
+    import threading
+
+    def worker(n):
+        for i in range(200):
+            data.apply_delta(Decimal("1.00"), f"T{n}-{i}")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert data.account_count() == 1 + 8 * 200
+    assert len(set(data._ACCOUNT_INDEX.values())) == data.account_count()
+    assert all(data.read_balance(f"T{n}-{i}") == Decimal("1.00") for n in range(8) for i in range(200))
+
+
+def test_transfer_moves_cents_atomically():
+    """
+    A transfer debits the source and credits the target, or changes nothing.
+    """
+    data.write_cents(500, "A")
+    assert data.transfer_cents(200, "A", "B", floor=0) == (300, 200)
+    assert data.transfer_cents(400, "A", "B", floor=0) is None
+    assert (data.read_cents("A"), data.read_cents("B")) == (300, 200)
+    assert data.transfer_cents(100, "A", "A", floor=0) == (300, 300)
+    assert data.read_cents("A") == 300
+
+
+def test_concurrent_opposite_transfers_do_not_deadlock():
+    """
+    Transfers in both directions between the same accounts finish and conserve money.
+    """
+    import sys
+    import threading
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        accounts = [f"T{i}" for i in range(6)]
+        for account in accounts:
+            data.write_cents(1000, account)
+
+        def worker(n):
+            for i in range(300):
+                a, b = accounts[(n + i) % 6], accounts[(n + 2 * i + 1) % 6]
+                data.transfer_cents(7, a, b, floor=0)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=30)
+        assert not any(t.is_alive() for t in threads)
+    finally:
+        sys.setswitchinterval(interval)
+    assert sum(data.read_cents(a) for a in accounts) == 6000
+    assert all(data.read_cents(a) >= 0 for a in accounts)
@@ -0,0 +1,150 @@
+import threading
+from decimal import Decimal
+
+import pytest
+import data
+import dedup
+import operations
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def index():
+    """
+    Give operations a fresh idempotency index and drop it after the test.
+    """
+    yield operations.idempotency_index(capacity=1000)
+    operations._DEDUP = None
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """
+    Every added key is reported present, and few absent keys are.
+    """
+    bloom = dedup.BloomFilter(10000, 0.01)
+    for i in range(10000):
+        bloom.add(f"key-{i}")
+    assert all(f"key-{i}" in bloom for i in range(10000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_index_expires_and_evicts_keys():
+    """
+    Keys are forgotten after the ttl, and the oldest go first when full.
+    """
+    clock = FakeClock()
+    idx = dedup.DedupIndex(capacity=2, ttl=10, clock=clock)
+    idx.remember("a", 1)
+    clock.now = 5
+    idx.remember("b", 2)
+    assert (idx.lookup("a"), idx.lookup("b")) == (1, 2)
+    clock.now = 10
+    assert idx.lookup("a") is None
+    idx.remember("c", 3)
+    idx.remember("d", 4)
+    assert (idx.lookup("b"), idx.lookup("c"), idx.lookup("d")) == (None, 3, 4)
+    assert len(idx) == 2
+    assert idx.lookup("never") is None
+    assert idx.stats()["filtered"] >= 1
+    with pytest.raises(ValueError):
+        dedup.DedupIndex(capacity=0)
+
+
+def test_index_remembers_keys_across_filter_rotations():
+    """
+    Rotating the Bloom filter never hides a key the index still holds.
+    """
+    idx = dedup.DedupIndex(capacity=100, ttl=3600)
+    for i in range(1000):
+        idx.remember(i, i)
+        assert all(idx.lookup(j) == j for j in range(max(0, i - 99), i + 1))
+
+
+def test_retried_credit_applies_once(index):
+    """
+    A retry with the same key returns the first result and leaves the balance alone.
+    """
+    first = operations.apply("CREDIT", "A", "10.00", key="req-1")
+    retry = operations.apply("CREDIT", "A", "10.00", key="req-1")
+    assert first == retry == operations.Result(operations.OK, Decimal("10.00"))
+    assert data.read_cents("A") == 1000
+    assert operations.apply_cents("CREDIT", "A", 1000, key="req-2").balance == 2000
+    assert operations.apply_cents("CREDIT", "A", 1000, key="req-2").balance == 2000
+    assert index.stats()["hits"] == 2
+
+
+def test_rejections_are_remembered_and_reused_keys_refused(index):
+    """
+    A rejected debit stays rejected on retry, and a key cannot be reused for another request.
+    """
+    assert operations.apply("DEBIT", "A", "5.00", key="k").status == operations.INSUFFICIENT_FUNDS
+    data.write_cents(10000, "A")
+    assert operations.apply("DEBIT", "A", "5.00", key="k").status == operations.INSUFFICIENT_FUNDS
+    assert operations.apply("DEBIT", "A", "6.00", key="k").status == operations.KEY_REUSED
+    results = operations.apply_batch_cents([("DEBIT", "A", 100, None, "b1"), ("DEBIT", "A", 100, None, "b1")])
+    assert results[0] == results[1] == operations.Result(operations.OK, 9900)
+    assert data.read_cents("A") == 9900
+
+
+def test_concurrent_retries_apply_once(index):
+    """
+    Attempts with one key racing in several threads are applied once.
+    """
+    def worker():
+        for i in range(100):
+            operations.apply_cents("CREDIT", "A", 1, key=f"req-{i}")
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert data.read_cents("A") == 100
+
+
+def test_keys_survive_checkpoints_and_restarts(index, tmp_path):
+    """
+    Journaled keys are still known after a checkpoint and a restart, and keep their age.
+    """
+    journal_path, snapshot_path = str(tmp_path / "j"), str(tmp_path / "s")
+    data.open_journal(journal_path, snapshot_path=snapshot_path)
+    operations.apply_batch([("CREDIT", "A", "10.00", None, "r1"), ("DEBIT", "A", "50.00", None, "r2")])
+    data.checkpoint()
+    operations.apply_batch([("CREDIT", "A", "1.00", None, "r3")])
+    data.close_journal()
+
+    operations._DEDUP = None
+    data.reset()
+    data.open_journal(journal_path, snapshot_path=snapshot_path)
+    try:
+        results = operations.apply_batch([
+            ("CREDIT", "A", "10.00", None, "r1"),
+            ("DEBIT", "A", "50.00", None, "r2"),
+            ("CREDIT", "A", "1.00", None, "r3"),
+            ("CREDIT", "A", "2.00", None, "r3"),
+        ])
+    finally:
+        data.close_journal()
+    assert results == [
+        operations.Result(operations.OK, Decimal("10.00")),
+        operations.Result(operations.INSUFFICIENT_FUNDS),
+        operations.Result(operations.OK, Decimal("11.00")),
+        operations.Result(operations.KEY_REUSED),
+    ]
+    assert data.read_cents("A") == 1100
+
+    clock = FakeClock()
+    idx = dedup.DedupIndex(capacity=10, ttl=10, clock=clock)
+    idx.remember("old", 1, age=10)
+    idx.remember("young", 2, age=9)
+    assert (idx.lookup("old"), idx.lookup("young")) == (None, 2)
+    clock.now = 1
+    assert idx.lookup("young") is None
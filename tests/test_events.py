@@ -0,0 +1,118 @@
+import datetime
+import random
+import threading
+from decimal import Decimal
+
+import pytest
+import data
+import events
+import operations
+
+DAY = 86400 * 10 ** 9
+
+
+class FakeClock:
+    """
+    Clock returning the time set by the test, in nanoseconds.
+    """
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """
+    Switch the store to event sourcing with a fake clock, and back after the test.
+    """
+    fake = FakeClock()
+    data.open_events(fake)
+    yield fake
+    data.close_events()
+
+
+def test_views_follow_every_event(clock):
+    """
+    Balances, daily totals and overdraft rejection counts are maintained as events are recorded.
+    """
+    operations.apply("CREDIT", "A", "10.00")
+    operations.apply("DEBIT", "A", "2.50")
+    operations.apply("DEBIT", "A", "50.00")
+    clock.now = DAY + 5
+    operations.apply("CREDIT", "A", "1.00")
+    operations.apply("TRANSFER", "A", "100.00", "B")
+    data.apply_deltas_cents(data.account_slots(["A", "B"]), [-10000, 300], floor=0)
+    log = data.current_events()
+    assert log.balance("A") == data.read_cents("A") == 850
+    assert log.balance(data.DEFAULT_ACCOUNT) == 100000
+    assert data.daily_totals(datetime.date(1970, 1, 1), "A") == (Decimal("10.00"), Decimal("2.50"))
+    assert data.daily_totals(datetime.date(1970, 1, 2), "A") == (Decimal("1.00"), Decimal("0.00"))
+    assert data.daily_totals(datetime.date(1970, 1, 2), "B") == (Decimal("3.00"), Decimal("0.00"))
+    assert data.overdraft_rejections("A") == 3
+    assert data.overdraft_rejections("B") == 0
+    assert [e.kind for e in log.events(1)] == ["CREDIT", "DEBIT", "OVERDRAFT", "CREDIT", "OVERDRAFT",
+                                                "CREDIT", "OVERDRAFT"]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_restart_rebuilds_views_and_balances_from_the_file(tmp_path, workers):
+    """
+    Reopening a persisted log rebuilds the views from its events, serially or in
+    parallel, and the store balances from them; a torn tail is cut off.
+    """
+    path = str(tmp_path / "events.log")
+    clock = FakeClock()
+    data.open_events(clock, path)
+    rng = random.Random(23)
+    ids = [f"A{i}" for i in range(40)]
+    for i in range(2000):
+        clock.now = i * DAY // 300
+        operations.apply_cents(rng.choice(["CREDIT", "DEBIT", "DEBIT"]), rng.choice(ids), rng.randrange(1, 5000))
+    live = data.current_events()
+    expected = {account_id: data.read_cents(account_id) for account_id in ids + [data.DEFAULT_ACCOUNT]}
+    data.close_events()
+    with open(path, "ab") as f:
+        f.write(b"\x01\x02\x03")
+
+    data.reset()
+    data.write_cents(-1, "A0")
+    log = data.open_events(clock, path, workers)
+    try:
+        assert log.views == live.views and len(log) == len(live)
+        assert log.events() == live.events()
+        assert {account_id: data.read_cents(account_id) for account_id in expected} == expected
+        operations.apply_cents("CREDIT", "A0", 1)
+    finally:
+        data.close_events()
+    assert events.EventLog(path=path, workers=1).balance("A0") == expected["A0"] + 1
+
+
+def test_rebuild_lets_writers_run(clock, monkeypatch):
+    """
+    Writers are not paused while the events are folded; events they append
+    meanwhile are in the installed views.
+    """
+    operations.apply_cents("CREDIT", "A", 100)
+    fold = events._fold
+
+    def fold_while_writing(columns):
+        writer = threading.Thread(target=operations.apply_cents, args=("CREDIT", "A", 5))
+        writer.start()
+        writer.join(5)
+        assert not writer.is_alive()
+        return fold(columns)
+
+    monkeypatch.setattr(events, "_fold", fold_while_writing)
+    data.rebuild_from_events(1)
+    assert data.read_cents("A") == data.current_events().balance("A") == 105
+
+
+def test_queries_need_an_event_log():
+    """
+    Without an event log, the view queries refuse.
+    """
+    with pytest.raises(ValueError):
+        data.overdraft_rejections()
@@ -0,0 +1,130 @@
+import threading
+from decimal import Decimal
+
+import pytest
+import data
+import history
+import operations
+
+
+class FakeClock:
+    """
+    Clock returning preset times, in nanoseconds.
+    """
+
+    def __init__(self, *times):
+        self.times = list(times)
+
+    def __call__(self):
+        return self.times.pop(0)
+
+
+@pytest.fixture
+def clock():
+    """
+    Attach a history driven by a fake clock, and detach it after the test.
+    """
+    fake = FakeClock()
+    data.open_history(fake)
+    yield fake
+    data.close_history()
+
+
+def test_statement_lists_postings_in_range(clock):
+    """
+    Only the account's changes inside [start, end] are listed, oldest first.
+    """
+    clock.times = [10, 20, 30, 40]
+    operations.apply_batch([("CREDIT", "A", "5.00"), ("CREDIT", "B", "1.00"),
+                            ("DEBIT", "A", "2.00"), ("CREDIT", "A", "0.50")])
+    assert data.statement("A", 15, 40) == [
+        history.Entry(30, "A", -200, 300),
+        history.Entry(40, "A", 50, 350),
+    ]
+    assert [e.timestamp for e in data.statement("A")] == [10, 30, 40]
+    assert data.statement("NOBODY") == []
+
+
+def test_rejected_operations_are_not_recorded(clock):
+    """
+    Refused debits and balance reads leave no history.
+    """
+    clock.times = [10]
+    operations.apply_batch([("DEBIT", "A", "1.00"), ("TOTAL", "A", None), ("CREDIT", "A", "1.00")])
+    assert data.statement("A") == [history.Entry(10, "A", 100, 100)]
+
+
+def test_balance_as_of(clock):
+    """
+    The balance at a time is the one after the last change at or before it.
+    """
+    clock.times = [10, 20]
+    operations.apply("DEBIT", data.DEFAULT_ACCOUNT, "100.00")
+    operations.apply("CREDIT", data.DEFAULT_ACCOUNT, "0.25")
+    assert data.balance_as_of(5) == Decimal("1000.00")
+    assert data.balance_as_of(10) == Decimal("900.00")
+    assert data.balance_as_of(19) == Decimal("900.00")
+    assert data.balance_as_of(99) == Decimal("900.25")
+    assert data.balance_as_of(99, "UNTOUCHED") == Decimal("0.00")
+
+
+def test_clock_going_backwards_keeps_log_sorted(clock):
+    """
+    A timestamp earlier than the last one is clamped to it.
+    """
+    clock.times = [50, 40]
+    data.write_cents(1, "A")
+    data.write_cents(2, "B")
+    assert [e.timestamp for e in data.current_history().between()] == [50, 50]
+
+
+def test_between_lists_all_accounts(clock):
+    """
+    The global range query returns every account's changes in time order.
+    """
+    clock.times = [1, 2, 3]
+    for account_id in ("A", "B", "A"):
+        data.apply_delta_cents(100, account_id)
+    assert [(e.timestamp, e.account) for e in data.current_history().between(2, 3)] == [(2, "B"), (3, "A")]
+
+
+def test_settlement_is_recorded_per_account(clock):
+    """
+    A settlement records one net change per account whose balance moved.
+    """
+    clock.times = [7, 8]
+    a, b, c = data.account_slots(["A", "B", "C"])
+    operations.settle_cents([a, b, a, c], [300, 100, -100, -1])
+    assert data.statement("A") == [history.Entry(7, "A", 200, 200)]
+    assert data.statement("B") == [history.Entry(8, "B", 100, 100)]
+    assert data.statement("C") == []
+
+
+def test_concurrent_records_stay_aligned():
+    """
+    Concurrent writers never mix up the columns of the log.
+    """
+    data.open_history()
+    try:
+        def work(account_id):
+            for _ in range(500):
+                data.apply_delta_cents(1, account_id)
+
+        threads = [threading.Thread(target=work, args=(f"T{i}",)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for i in range(4):
+            entries = data.statement(f"T{i}")
+            assert [e.balance for e in entries] == list(range(1, 501))
+    finally:
+        data.close_history()
+
+
+def test_queries_need_a_history():
+    """
+    Querying without an attached history is an error.
+    """
+    with pytest.raises(ValueError):
+        data.statement("A")
@@ -0,0 +1,153 @@
+import csv
+import io
+from decimal import Decimal
+
+import data
+import ingest
+import operations
+
+
+def _rows(buffer):
+    """
+    Helper to parse a CSV output buffer into rows (header excluded).
+    """
+    return list(csv.reader(io.StringIO(buffer.getvalue())))[1:]
+
+
+def test_ingest_csv_results_and_rejects():
+    """
+    CSV records are applied in order; failures and malformed lines go to rejects.
+    """
+    source = io.StringIO(
+        "operation,account,amount\n"
+        "CREDIT,A,100.00\n"
+        "debit,A,40.50\n"
+        "DEBIT,A,500\n"
+        "\n"
+        "TOTAL,A\n"
+        "CREDIT,A,abc\n"
+        "garbage\n"
+    )
+    results, rejects = io.StringIO(), io.StringIO()
+    stats = ingest.ingest(source, results, rejects, "csv", chunk_size=2)
+    assert _rows(results) == [
+        ["2", "CREDIT", "A", "100.00"],
+        ["3", "DEBIT", "A", "59.50"],
+        ["6", "TOTAL", "A", "59.50"],
+    ]
+    assert _rows(rejects) == [
+        ["4", "INSUFFICIENT_FUNDS", "DEBIT,A,500"],
+        ["7", "INVALID_AMOUNT", "CREDIT,A,abc", "Amount is not a plain decimal number."],
+        ["8", "MALFORMED", "garbage"],
+    ]
+    assert (stats.records, stats.applied, stats.rejected) == (6, 3, 3)
+    assert data.read_balance("A") == Decimal("59.50")
+
+
+def test_ingest_jsonl_keeps_exact_amounts():
+    """
+    JSONL numbers are decoded as Decimal, so amounts are not rounded through floats.
+    """
+    source = io.StringIO(
+        '{"operation": "CREDIT", "account": "B", "amount": 0.1}\n'
+        '{"operation": "CREDIT", "account": "B", "amount": "0.2"}\n'
+        '{"operation": "DEBIT", "account": 7, "amount": 1}\n'
+        '{"account": "B"}\n'
+        'not json\n'
+    )
+    results, rejects = io.StringIO(), io.StringIO()
+    stats = ingest.ingest(source, results, rejects, "jsonl")
+    assert data.read_balance("B") == Decimal("0.30")
+    assert [row[1] for row in _rows(rejects)] == ["INSUFFICIENT_FUNDS", "MALFORMED", "MALFORMED"]
+    assert stats.applied == 2
+
+
+def test_ingest_parses_amounts_strictly():
+    """
+    Amounts a feed should not carry are rejected with the reason instead of rounded.
+    """
+    source = io.StringIO("CREDIT,S,1e3\nCREDIT,S,1.005\nCREDIT,S, 2.50 \nDEBIT,S,0.00\n"
+                         "CREDIT,S,+5\nTOTAL,S\nFOO,S,1e3\n")
+    results, rejects = io.StringIO(), io.StringIO()
+    ingest.ingest(source, results, rejects)
+    assert _rows(results) == [["3", "CREDIT", "S", "2.50"], ["6", "TOTAL", "S", "2.50"]]
+    assert [row[:2] + row[3:] for row in _rows(rejects)] == [
+        ["1", "INVALID_AMOUNT", "Amounts cannot use exponent notation."],
+        ["2", "INVALID_AMOUNT", "Amounts have at most two fractional digits."],
+        ["4", "NOT_POSITIVE", "Amount must be positive."],
+        ["5", "INVALID_AMOUNT", "Amount is not a plain decimal number."],
+        ["7", "INVALID_OPERATION"],
+    ]
+
+
+def test_ingest_reads_lazily():
+    """
+    The pipeline pulls input incrementally instead of loading it all at once.
+    """
+    pulled = []
+
+    def lines():
+        for i in range(10):
+            pulled.append(i)
+            yield "CREDIT,L,1.00\n"
+
+    chunks = ingest._chunks(ingest.read_csv(lines()), 3)
+    next(chunks)
+    assert len(pulled) == 3
+
+
+def test_detect_format():
+    """
+    The input format is guessed from the file extension.
+    """
+    assert ingest.detect_format("tx.JSONL") == "jsonl"
+    assert ingest.detect_format("tx.csv") == "csv"
+
+
+def test_ingest_transfers():
+    """
+    A fourth CSV column or a JSONL "target" key names the account credited by TRANSFER.
+    """
+    results, rejects = io.StringIO(), io.StringIO()
+    ingest.ingest(io.StringIO("CREDIT,A,10\nTRANSFER,A,4,B\nTRANSFER,A,1,\n"), results, rejects)
+    assert _rows(results) == [["1", "CREDIT", "A", "10.00"], ["2", "TRANSFER", "A", "6.00"]]
+    assert _rows(rejects) == [["3", "INVALID_TARGET", "TRANSFER,A,1,"]]
+    results, rejects = io.StringIO(), io.StringIO()
+    ingest.ingest(io.StringIO('{"operation": "TRANSFER", "account": "B", "amount": 1.5, "target": "C"}\n'),
+                  results, rejects, "jsonl")
+    assert data.read_balance("B") == Decimal("2.50")
+    assert data.read_balance("C") == Decimal("1.50")
+
+
+def test_ingest_keyed_records_apply_once():
+    """
+    A fifth CSV column or a JSONL "key" makes a record safe to ingest twice.
+    """
+    text = "CREDIT,K,10,,i1\nTRANSFER,K,4,L,i2\nCREDIT,K,1\n"
+    for _ in range(2):
+        results, rejects = io.StringIO(), io.StringIO()
+        ingest.ingest(io.StringIO(text), results, rejects)
+        assert _rows(results)[:2] == [["1", "CREDIT", "K", "10.00"], ["2", "TRANSFER", "K", "6.00"]]
+    assert (data.read_balance("K"), data.read_balance("L")) == (Decimal("8.00"), Decimal("4.00"))
+    line = '{"operation": "CREDIT", "account": "J", "amount": 2, "key": 7}\n'
+    for _ in range(2):
+        ingest.ingest(io.StringIO(line), io.StringIO(), io.StringIO(), "jsonl")
+    assert data.read_balance("J") == Decimal("2.00")
+
+
+def test_ingest_reports_records_that_raise(monkeypatch):
+    """
+    A record whose operation raises is rejected with its reason; the rest of the file is applied.
+    """
+    monkeypatch.setattr(operations, "_REGISTRY", dict(operations._REGISTRY))
+    monkeypatch.setattr(operations, "_OPCODES", list(operations._OPCODES))
+
+    def boom(account_id, cents, status, target):
+        raise RuntimeError("disk on fire")
+
+    operations.register("BOOM", boom)
+    results, rejects = io.StringIO(), io.StringIO()
+    stats = ingest.ingest(io.StringIO("CREDIT,A,10\nBOOM,A,1\nDEBIT,A,4\n"), results, rejects)
+    assert _rows(results) == [["1", "CREDIT", "A", "10.00"], ["3", "DEBIT", "A", "6.00"]]
+    assert _rows(rejects) == [["2", "FAILED", "BOOM,A,1", "RuntimeError: disk on fire"]]
+    assert (stats.records, stats.applied, stats.rejected) == (3, 2, 1)
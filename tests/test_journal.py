@@ -0,0 +1,167 @@
+import os
+import stat
+import threading
+from decimal import Decimal
+
+import pytest
+import data
+import journal
+import operations
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    """
+    Provide a journal path and make sure no journal stays attached after the test.
+    """
+    yield str(tmp_path / "balances.journal")
+    data.close_journal()
+
+
+def test_replay_rebuilds_store(journal_path):
+    """
+    Journaled writes are replayed into a fresh store on the next open.
+    """
+    data.open_journal(journal_path)
+    operations.apply_batch([("CREDIT", "A", "10.00"), ("DEBIT", "A", "2.50"), ("CREDIT", "B", "1.00")])
+    data.close_journal()
+
+    data.reset()
+    assert data.read_balance("A") == Decimal("0.00")
+    data.open_journal(journal_path)
+    assert data.read_balance("A") == Decimal("7.50")
+    assert data.read_balance("B") == Decimal("1.00")
+    assert data.read_balance() == Decimal("1000.00")
+
+
+def test_apply_returns_only_after_commit(journal_path):
+    """
+    A result is acknowledged only once its journal record is durable.
+    """
+    j = data.open_journal(journal_path, max_batch=1000, max_delay=10)
+    operations.apply("CREDIT", "A", "1.00")
+    assert j.durable_seq == 1
+
+
+def test_group_commit_thresholds(tmp_path):
+    """
+    Appends stay pending until the batch size is reached, then share one commit.
+    """
+    j = journal.Journal(str(tmp_path / "j"), max_batch=3, max_delay=60)
+    j.append("A", 1)
+    j.append("A", 2)
+    assert j.durable_seq == 0
+    j.append("A", 3)
+    assert j.durable_seq == 3
+    j.close()
+
+
+def test_concurrent_commits_share_fsyncs(tmp_path, monkeypatch):
+    """
+    Concurrent committers are grouped into fewer fsyncs than records.
+    """
+    fsyncs = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(journal.os, "fsync", lambda fd: (fsyncs.append(fd), real_fsync(fd)))
+    j = journal.Journal(str(tmp_path / "j"), max_batch=64, max_delay=0.01)
+    fsyncs.clear()
+
+    def worker(n):
+        for i in range(20):
+            j.commit(j.append(f"W{n}", i))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert j.durable_seq == 160
+    assert len(fsyncs) < 160
+    j.close()
+    assert sum(1 for _ in journal.replay(j.path)) == 160
+
+
+def test_torn_tail_is_ignored_and_truncated(tmp_path):
+    """
+    A partial record left by a crash is skipped on replay and cut off on open.
+    """
+    path = str(tmp_path / "j")
+    j = journal.Journal(path)
+    j.append("A", 100)
+    j.append("B", 200)
+    j.close()
+    size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(journal._encode("C", 300)[:-2])
+    assert list(journal.replay(path)) == [("A", 100), ("B", 200)]
+    j = journal.Journal(path)
+    j.close()
+    assert os.path.getsize(path) == size
+
+
+def test_group_replays_all_or_none(tmp_path):
+    """
+    The records of a group replay together, and a torn group replays none of them.
+    """
+    path = str(tmp_path / "j")
+    j = journal.Journal(path)
+    j.append("A", 100)
+    j.append_group([("A", 40), ("B", 60)])
+    j.append_group([("L" * 40000, 1), ("M" * 40000, 2)])
+    j.close()
+    assert list(journal.replay(path)) == [("A", 100), ("A", 40), ("B", 60), ("L" * 40000, 1), ("M" * 40000, 2)]
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 2)
+    assert list(journal.replay(path)) == [("A", 100), ("A", 40), ("B", 60)]
+    with pytest.raises(ValueError):
+        journal._encode("\x00group", 1)
+
+
+def test_rejects_foreign_file(tmp_path):
+    """
+    Opening a file that is not a journal fails instead of overwriting it.
+    """
+    path = tmp_path / "other"
+    path.write_bytes(b"hello world, not a journal")
+    with pytest.raises(ValueError):
+        list(journal.replay(str(path)))
+
+
+def test_ids_the_journal_cannot_record_are_refused_before_any_change(tmp_path):
+    """
+    Ids over 65535 bytes, or not encodable, are refused before history or the journal see them.
+    """
+    data.open_journal(str(tmp_path / "j"))
+    history = data.open_history()
+    try:
+        for account_id in ("X" * (data.MAX_ID_BYTES + 1), "\ud800"):
+            assert operations.apply("CREDIT", account_id, "1.00").status == operations.INVALID_ACCOUNT
+            with pytest.raises(ValueError):
+                data.write_cents(1, account_id)
+        assert operations.apply("CREDIT", "X" * data.MAX_ID_BYTES, "1.00").status == operations.OK
+        assert len(history.between()) == 1 and data.account_count() == 2
+    finally:
+        data.close_history()
+        data.close_journal()
+    with pytest.raises(ValueError):
+        journal._encode("X" * (data.MAX_ID_BYTES + 1), 1)
+
+
+def test_discard_before_syncs_the_directory(tmp_path, monkeypatch):
+    """
+    Compaction keeps later records and fsyncs the directory after the rename.
+    """
+    j = journal.Journal(str(tmp_path / "j"))
+    j.commit(j.append("A", 1))
+    offset = j.mark()
+    j.commit(j.append("B", 2))
+    events = []
+    real_fsync, real_replace = os.fsync, os.replace
+    monkeypatch.setattr(journal.os, "replace", lambda *a: (events.append("replace"), real_replace(*a)))
+    monkeypatch.setattr(journal.os, "fsync",
+                        lambda fd: (events.append("dir" if stat.S_ISDIR(os.fstat(fd).st_mode) else "file"),
+                                    real_fsync(fd)))
+    j.discard_before(offset)
+    assert events[-2:] == ["replace", "dir"]
+    j.close()
+    assert [record[:2] for record in journal.replay(j.path)] == [("B", 2)]
@@ -1,6 +1,11 @@
 import builtins
 import importlib
+import os
 import runpy
+import subprocess
+import sys
+
+import main as main_module
 
 
 def test_exit_application(monkeypatch, capsys):
@@ -48,6 +53,7 @@ def test_run_main_as_script(monkeypatch, capsys):
     """
     inputs = iter(["4"])
     monkeypatch.setattr(builtins, "input", lambda _: next(inputs))
+    monkeypatch.setattr(sys, "argv", ["main.py"])
     runpy.run_path("main.py", run_name="__main__")
     out = capsys.readouterr().out
     assert "Exiting the program. Goodbye!" in out
@@ -94,4 +100,93 @@ def test_menu_debit_branch_dispatch(monkeypatch, capsys):
     out = capsys.readouterr().out
     assert "DISPATCH:DEBIT" in out
     assert calls == ["DEBIT"]
-    assert "Exiting the program. Goodbye!" in out
\ No newline at end of file
+    assert "Exiting the program. Goodbye!" in out
+
+def test_ingest_command(tmp_path, capsys):
+    """
+    `main.py ingest` streams a file and reports throughput without showing the menu.
+    """
+    import main
+    source = tmp_path / "tx.csv"
+    source.write_text("CREDIT,A,5.00\nDEBIT,A,9.00\n")
+    results = tmp_path / "results.csv"
+    rejects = tmp_path / "rejects.csv"
+    main.main(["ingest", str(source), "--results", str(results), "--rejects", str(rejects)])
+    out = capsys.readouterr().out
+    assert "Account Management System" not in out
+    assert "Processed 2 records (1 applied, 1 rejected)" in out
+    assert "records/s" in out
+    assert results.read_text().splitlines()[1] == "1,CREDIT,A,5.00"
+    assert rejects.read_text().splitlines()[1] == "2,INSUFFICIENT_FUNDS,\"DEBIT,A,9.00\""
+
+
+def test_journal_option_replays_at_startup(tmp_path, monkeypatch, capsys):
+    """
+    `--journal` persists menu operations and replays them on the next start.
+    """
+    import main
+    journal_path = str(tmp_path / "balances.journal")
+    inputs = iter(["2", "25.00", "4"])
+    monkeypatch.setattr(builtins, "input", lambda _: next(inputs))
+    main.main(["--journal", journal_path])
+
+    data = importlib.import_module("data")
+    data.reset()
+    inputs = iter(["1", "4"])
+    main.main(["--journal", journal_path])
+    out = capsys.readouterr().out
+    assert "Current balance: 1025.00" in out
+
+
+def test_piped_mode_skips_menu_and_batches_output():
+    """
+    Choices read from a pipe print only their results, the same lines as the menu, in batches.
+    """
+    import io
+    import main
+    import operations
+
+    class Sink(io.StringIO):
+        writes = 0
+
+        def write(self, text):
+            self.writes += 1
+            return super().write(text)
+
+    sink = Sink()
+    main._run_piped(io.StringIO("1\n2\n5.00\n3\n9999\n3\nabc\n7\n"), sink, batch=2)
+    assert sink.getvalue() == (
+        "Current balance: 1000.00\n"
+        "Amount credited. New balance: 1005.00\n"
+        "Insufficient funds for this debit.\n"
+        "Invalid amount.\n"
+        "Invalid choice, please select 1-4.\n"
+        "Exiting the program. Goodbye!\n"
+    )
+    assert sink.writes == 3
+    assert operations._READ_ANSWER is None
+
+
+def test_main_runs_piped_mode_when_stdin_is_not_a_terminal(monkeypatch, capsys):
+    """
+    Without arguments, main() reads the script from stdin when `_piped` says it is one.
+    """
+    import io
+    import main
+
+    monkeypatch.setattr(main, "_piped", lambda: True)
+    monkeypatch.setattr("sys.stdin", io.StringIO("1\n"))
+    main.main([])
+    assert capsys.readouterr().out == "Current balance: 1000.00\nExiting the program. Goodbye!\n"
+
+
+def test_piped_stdin_is_detected(tmp_path):
+    """
+    `python3 main.py < script` runs in piped mode: no menu and no prompts.
+    """
+    script = tmp_path / "script.txt"
+    script.write_text("2\n1.50\n4\n")
+    with open(script) as stdin:
+        out = subprocess.run([sys.executable, "main.py"], stdin=stdin, capture_output=True, text=True,
+                             check=True, cwd=os.path.dirname(os.path.abspath(main_module.__file__))).stdout
+    assert out == "Amount credited. New balance: 1001.50\nExiting the program. Goodbye!\n"
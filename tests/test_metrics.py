@@ -0,0 +1,102 @@
+from decimal import Decimal
+
+import pytest
+import data
+import main
+import metrics
+import operations
+
+
+@pytest.fixture
+def registry():
+    """
+    Enable metrics and disable them after the test.
+    """
+    yield metrics.enable()
+    metrics.disable()
+
+
+def test_histogram_quantiles_within_precision():
+    """
+    Quantiles land within the bucket precision of the exact values.
+    """
+    h = metrics.Histogram()
+    for v in range(1, 100001):
+        h.record(v)
+    assert (h.count, h.min, h.max) == (100000, 1, 100000)
+    for q in (0.5, 0.9, 0.99):
+        assert abs(h.quantile(q) - q * 100000) <= 0.016 * q * 100000
+    assert h.quantile(1.0) == 100000
+    h.record(-5)
+    assert h.min == 0
+    assert metrics.Histogram().quantile(0.5) == 0
+
+
+def test_operations_are_counted_and_timed(registry, monkeypatch):
+    """
+    Every operation path counts its outcome, rejections included, and records its latency.
+    """
+    operations.apply("CREDIT", "A", "1.00")
+    operations.apply_cents("DEBIT", "A", 500)
+    operations.apply_batch([("TOTAL", "A"), ("DEBIT", "A", "abc")])
+    inputs = iter(["5.00"])
+    monkeypatch.setattr("builtins.input", lambda _: next(inputs))
+    operations.credit()
+    data.write_balance(Decimal("1.00"))
+    snap = metrics.snapshot()
+    counters = snap["counters"]
+    assert counters["operations_total"] == {
+        ("CREDIT", "OK"): 2, ("DEBIT", "INSUFFICIENT_FUNDS"): 1,
+        ("TOTAL", "OK"): 1, ("DEBIT", "INVALID_AMOUNT"): 1,
+    }
+    assert counters["rejections_total"] == {("DEBIT", "INSUFFICIENT_FUNDS"): 1, ("DEBIT", "INVALID_AMOUNT"): 1}
+    histograms = snap["histograms"]
+    assert histograms["operation_latency_seconds"][("CREDIT",)]["count"] == 2
+    assert histograms["parse_amount_seconds"][()]["count"] == 1
+    assert histograms["write_balance_seconds"][()]["count"] == 1
+
+
+def test_unknown_operations_share_one_label(registry):
+    """
+    Operations that are not registered are counted under "unknown", whatever their name.
+    """
+    operations.apply_batch([("FOO", "A", "1.00"), ("BAR", "A", "1.00"), ("  baz", "A")])
+    counters = metrics.snapshot()["counters"]
+    assert counters["operations_total"] == {("unknown", "INVALID_OPERATION"): 3}
+    assert set(metrics.snapshot()["histograms"]["operation_latency_seconds"]) == {("unknown",)}
+
+
+def test_prometheus_dump(registry, tmp_path):
+    """
+    The dump is valid exposition text with counters and latency summaries in seconds.
+    """
+    operations.apply("DEBIT", "A", "1.00")
+    path = tmp_path / "bank.prom"
+    metrics.write_prometheus(str(path))
+    text = path.read_text()
+    assert '# TYPE account_operations_total counter' in text
+    assert 'account_operations_total{operation="DEBIT",status="INSUFFICIENT_FUNDS"} 1' in text
+    assert 'account_rejections_total{operation="DEBIT",reason="INSUFFICIENT_FUNDS"} 1' in text
+    assert 'account_operation_latency_seconds{operation="DEBIT",quantile="0.99"}' in text
+    assert 'account_operation_latency_seconds_count{operation="DEBIT"} 1' in text
+
+
+def test_disabled_metrics_record_nothing():
+    """
+    Without metrics, nothing is collected and the snapshot API refuses.
+    """
+    assert operations._METRICS is None and data._METRICS is None
+    with pytest.raises(ValueError):
+        metrics.snapshot()
+
+
+def test_main_metrics_option(tmp_path, monkeypatch):
+    """
+    --metrics writes the collected metrics on exit.
+    """
+    path = tmp_path / "bank.prom"
+    inputs = iter(["1", "4"])
+    monkeypatch.setattr("builtins.input", lambda _: next(inputs))
+    main.main(["--metrics", str(path)])
+    assert "account_operations_total" in path.read_text()
+    assert operations._METRICS is None
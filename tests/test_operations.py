@@ -464,3 +464,199 @@ def test_TC_9_10_large_credit_then_large_debit_to_penny(monkeypatch):
     _set_input(monkeypatch, ["999999.99"])
     operations.debit()
     assert data.read_balance() == Decimal("0.01")
+
+
+def test_apply_batch_mixed_records():
+    """
+    apply_batch applies records in order across accounts and returns one result per record.
+    """
+    results = operations.apply_batch([
+        ("CREDIT", "A", "100.00"),
+        ("debit", "A", "30.25"),
+        ("DEBIT", "B", "1.00"),
+        ("TOTAL", "A"),
+        ("CREDIT", "B", "abc"),
+        ("CREDIT", "B", "-5"),
+        ("REFUND", "A", "1.00"),
+    ])
+    assert results == [
+        operations.Result(operations.OK, Decimal("100.00")),
+        operations.Result(operations.OK, Decimal("69.75")),
+        operations.Result(operations.INSUFFICIENT_FUNDS),
+        operations.Result(operations.OK, Decimal("69.75")),
+        operations.Result(operations.INVALID_AMOUNT),
+        operations.Result(operations.NOT_POSITIVE),
+        operations.Result(operations.INVALID_OPERATION),
+    ]
+    assert data.read_balance("A") == Decimal("69.75")
+    assert data.read_balance() == Decimal("1000.00")
+
+
+def test_apply_batch_does_no_console_io(monkeypatch, capsys):
+    """
+    The batch API never prompts nor prints.
+    """
+    monkeypatch.setattr(builtins, "input", lambda _: pytest.fail("input() called"))
+    operations.apply_batch([("CREDIT", "A", Decimal("1.005")), ("DEBIT", "A", "0")])
+    assert capsys.readouterr().out == ""
+    assert data.read_balance("A") == Decimal("1.00")
+
+
+@pytest.mark.parametrize("raw", ["NaN", "Infinity", "-Infinity", None])
+def test_validate_amount_rejects_non_finite(raw):
+    """
+    Non-finite or missing amounts are invalid rather than raising.
+    """
+    assert operations.validate_amount(raw) == (None, operations.INVALID_AMOUNT)
+
+
+@pytest.mark.parametrize(
+    "raw",
+    ["12.34", "  7.125 ", "0.005", "0.015", "0.001", "1.", ".5", "+3", "-0", "-1.00", "0",
+     "", "abc", "1e3", "1E-2", "NaN", "Infinity", "1_000", "1.2.3", "٣", "9" * 26 + ".995", "9" * 26 + ".994"],
+)
+def test_parse_cents_matches_validate_amount(raw):
+    """
+    parse_cents accepts, rejects and rounds exactly like validate_amount.
+    """
+    amt, status = operations.validate_amount(raw)
+    expected = (None if amt is None else data.to_cents(amt), status)
+    assert operations.parse_cents(raw) == expected
+
+
+def test_apply_batch_cents():
+    """
+    The cents API takes int cents or decimal strings and returns balances in cents.
+    """
+    data.write_cents(1000, "A")
+    results = operations.apply_batch_cents([
+        ("CREDIT", "A", 250),
+        ("DEBIT", "A", "12.50"),
+        ("DEBIT", "A", 1),
+        ("DEBIT", "A", 10**6),
+        ("CREDIT", "A", 0),
+        ("CREDIT", "A", Decimal("1.00")),
+        ("TOTAL", "A"),
+    ])
+    assert results == [
+        operations.Result(operations.OK, 1250),
+        operations.Result(operations.OK, 0),
+        operations.Result(operations.INSUFFICIENT_FUNDS),
+        operations.Result(operations.INSUFFICIENT_FUNDS),
+        operations.Result(operations.NOT_POSITIVE),
+        operations.Result(operations.INVALID_AMOUNT),
+        operations.Result(operations.OK, 0),
+    ]
+    assert data.read_balance("A") == Decimal("0.00")
+
+
+def test_apply_transfer():
+    """
+    TRANSFER moves an amount between accounts and reports the source balance.
+    """
+    assert operations.apply("TRANSFER", data.DEFAULT_ACCOUNT, "250.00", "B") == \
+        operations.Result(operations.OK, Decimal("750.00"))
+    assert data.read_balance("B") == Decimal("250.00")
+    assert operations.apply_batch_cents([
+        ("transfer", "B", "300.00", "C"),
+        ("TRANSFER", "B", 100, " "),
+        ("TRANSFER", "B", "-1", "C"),
+        ("TRANSFER", "B", 5000, "C"),
+    ]) == [
+        operations.Result(operations.INSUFFICIENT_FUNDS),
+        operations.Result(operations.INVALID_TARGET),
+        operations.Result(operations.NOT_POSITIVE),
+        operations.Result(operations.OK, 20000),
+    ]
+    assert data.read_balance("C") == Decimal("50.00")
+
+
+def test_balances_stay_within_the_storable_range(monkeypatch, capsys):
+    """
+    Amounts and balances past the int64 cents range are INVALID_AMOUNT, and nothing is changed or recorded.
+    """
+    top = "92233720368547758.07"
+    data.open_history()
+    try:
+        assert operations.apply("CREDIT", "A", "92233720368547758.08").status == operations.INVALID_AMOUNT
+        assert operations.apply("CREDIT", "A", "100000000000000000").status == operations.INVALID_AMOUNT
+        assert operations.apply_cents("CREDIT", "A", data.MAX_CENTS + 1).status == operations.INVALID_AMOUNT
+        assert operations.apply("CREDIT", "A", top) == operations.Result(operations.OK, Decimal(top))
+        assert operations.apply_batch_cents([
+            ("CREDIT", "A", 1),
+            ("TRANSFER", data.DEFAULT_ACCOUNT, "0.01", "A"),
+            ("DEBIT", "A", "0.07"),
+        ]) == [
+            operations.Result(operations.INVALID_AMOUNT),
+            operations.Result(operations.INVALID_AMOUNT),
+            operations.Result(operations.OK, data.MAX_CENTS - 7),
+        ]
+        assert data.read_balance(data.DEFAULT_ACCOUNT) == Decimal("1000.00")
+        assert [e.balance for e in data.statement("A")] == [data.MAX_CENTS, data.MAX_CENTS - 7]
+    finally:
+        data.close_history()
+    _set_input(monkeypatch, ["99999999999999999999", "92233720368547758.07"])
+    operations.credit()
+    operations.credit()
+    assert capsys.readouterr().out == "Invalid amount.\nInvalid amount.\n"
+    assert data.read_balance() == Decimal("1000.00")
+
+
+def test_execute_transfer(monkeypatch, capsys):
+    """
+    The interactive TRANSFER asks for a target and an amount.
+    """
+    _set_input(monkeypatch, ["SAVINGS", "100.00", "", "SAVINGS", "5000"])
+    operations.execute(" transfer ")
+    operations.execute("TRANSFER")
+    operations.execute("TRANSFER")
+    out = capsys.readouterr().out
+    assert "Amount transferred. New balance: 900.00" in out
+    assert "Invalid target account." in out
+    assert "Insufficient funds for this debit." in out
+    assert data.read_balance("SAVINGS") == Decimal("100.00")
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """
+    Let a test register operations without leaking them into other tests.
+    """
+    monkeypatch.setattr(operations, "_REGISTRY", dict(operations._REGISTRY))
+    monkeypatch.setattr(operations, "_OPCODES", list(operations._OPCODES))
+
+
+def test_builtin_opcodes_dispatch_like_names():
+    """
+    Operations can be given by opcode, and opcodes follow registration order.
+    """
+    assert [operations.opcode(n) for n in ("TOTAL", "CREDIT", "DEBIT", "TRANSFER")] == [0, 1, 2, 3]
+    assert operations.lookup(" credit ").opcode == 1
+    assert operations.apply_cents(operations.opcode("CREDIT"), "A", 250).balance == 250
+    assert operations.apply(0, "A").balance == Decimal("2.50")
+    assert operations.apply_cents(99, "A", 1).status == operations.INVALID_OPERATION
+    assert operations.lookup("NOPE") is None
+
+
+def test_register_new_operation(registry, capsys):
+    """
+    A registered FEE operation works in the batch, network and interactive front ends.
+    """
+    import server
+
+    def fee(account_id, cents, status, target):
+        if cents is None:
+            return operations.Result(status)
+        return operations.Result(operations.OK, data.apply_delta_cents(-cents, account_id))
+
+    code = operations.register("fee", fee, lambda: print("FEE MENU"))
+    assert operations.opcode("FEE") == code == 4
+    assert operations.apply_batch_cents([("Fee", "A", 150), ("FEE", "A", "x")]) == [
+        operations.Result(operations.OK, -150), operations.Result(operations.INVALID_AMOUNT)]
+    assert server.handle_lines([b"FEE A 1.00"]) == b"OK -2.50\n"
+    operations.execute("fee")
+    assert "FEE MENU" in capsys.readouterr().out
+    with pytest.raises(ValueError):
+        operations.register("FEE", fee)
+    with pytest.raises(ValueError):
+        operations.register("TWO WORDS", fee)
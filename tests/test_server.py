@@ -0,0 +1,161 @@
+import asyncio
+from decimal import Decimal
+
+import data
+import client
+import operations
+import server
+
+
+def _run(coro):
+    """
+    Helper to run a coroutine against a freshly started server on a free port.
+    """
+    async def wrapper():
+        srv = await server.start_server("127.0.0.1", 0)
+        port = srv.sockets[0].getsockname()[1]
+        try:
+            return await coro(port)
+        finally:
+            srv.close()
+            await srv.wait_closed()
+    return asyncio.run(wrapper())
+
+
+def test_request_response():
+    """
+    Each request gets an OK/ERR response reflecting the shared store.
+    """
+    async def scenario(port):
+        c = await client.Client.connect("127.0.0.1", port)
+        try:
+            return [
+                await c.request("CREDIT A 10.00"),
+                await c.request("debit A 2.5"),
+                await c.request("DEBIT A 100"),
+                await c.request("TOTAL A"),
+                await c.request("TOTAL"),
+                await c.request("CREDIT A abc"),
+                await c.request("REFUND A 1"),
+                await c.request("CREDIT A 1 extra"),
+            ]
+        finally:
+            await c.close()
+
+    assert _run(scenario) == [
+        "OK 10.00",
+        "OK 7.50",
+        "ERR INSUFFICIENT_FUNDS",
+        "OK 7.50",
+        "OK 1000.00",
+        "ERR INVALID_AMOUNT",
+        "ERR INVALID_OPERATION",
+        "ERR MALFORMED",
+    ]
+    assert data.read_balance("A") == Decimal("7.50")
+
+
+def test_pipelined_requests_keep_order():
+    """
+    Pipelined requests are answered in order.
+    """
+    async def scenario(port):
+        c = await client.Client.connect("127.0.0.1", port)
+        try:
+            return await c.pipeline([f"CREDIT P {i}.00" for i in range(1, 201)])
+        finally:
+            await c.close()
+
+    responses = _run(scenario)
+    expected, total = [], 0
+    for i in range(1, 201):
+        total += i
+        expected.append(f"OK {total}.00")
+    assert responses == expected
+
+
+def test_line_too_long_closes_connection():
+    """
+    A line longer than MAX_LINE is answered with an error and the connection closed.
+    """
+    async def scenario(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"X" * (server.MAX_LINE + 10))
+        await writer.drain()
+        line = await reader.readline()
+        rest = await reader.read()
+        writer.close()
+        return line, rest
+
+    line, rest = _run(scenario)
+    assert line == b"ERR LINE_TOO_LONG\n"
+    assert rest == b""
+
+
+def test_load_generator_concurrent_clients():
+    """
+    The load generator drives concurrent pipelined connections and reports throughput.
+    """
+    async def scenario(port):
+        return await client.run_load("127.0.0.1", port, connections=20, requests=50, depth=8, accounts=10)
+
+    report = _run(scenario)
+    assert report.requests == 1000
+    assert len(report.latencies) == 20 * 7
+    assert report.rate > 0
+    assert report.percentile(50) <= report.percentile(99)
+
+
+def test_transfer_request():
+    """
+    TRANSFER takes a source, a target and an amount, and answers with the source balance.
+    """
+    assert server.parse_request(b"TRANSFER A B 1.00") == ("TRANSFER", "A", "1.00", "B")
+    assert server.parse_request(b"CREDIT A B 1.00") is None
+    assert server.handle_lines([b"TRANSFER DEFAULT B 10", b"TRANSFER B C 20"]) == \
+        b"OK 990.00\nERR INSUFFICIENT_FUNDS\n"
+
+
+def test_keyed_requests_apply_once():
+    """
+    A request ending with key=<key> is answered again, not applied again, on retry.
+    """
+    assert server.parse_request(b"CREDIT A 1 key=k1") == ("CREDIT", "A", "1", None, "k1")
+    assert server.parse_request(b"TRANSFER A B 1 key=k2") == ("TRANSFER", "A", "1", "B", "k2")
+    assert server.parse_request(b"CREDIT A 1 key=") is None
+    lines = [b"CREDIT K 5 key=s1", b"TRANSFER K L 2 key=s2"]
+    assert server.handle_lines(lines) == server.handle_lines(lines) == b"OK 5.00\nOK 3.00\n"
+    assert server.handle_lines([b"CREDIT K 6 key=s1"]) == b"ERR KEY_REUSED\n"
+    assert (data.read_balance("K"), data.read_balance("L")) == (Decimal("3.00"), Decimal("2.00"))
+
+
+def test_failures_are_answered_and_keep_the_connection(monkeypatch):
+    """
+    A request that raises gets ERR FAILED, a failed commit fails its whole batch,
+    and neither drops the other responses or the connection.
+    """
+    monkeypatch.setattr(operations, "_REGISTRY", dict(operations._REGISTRY))
+    monkeypatch.setattr(operations, "_OPCODES", list(operations._OPCODES))
+
+    def boom(account_id, cents, status, target):
+        raise RuntimeError("boom")
+
+    operations.register("BOOM", boom)
+    real_commit = data.commit
+
+    def failing_commit():
+        monkeypatch.setattr(data, "commit", real_commit)
+        raise OSError("disk full")
+
+    async def scenario(port):
+        c = await client.Client.connect("127.0.0.1", port)
+        try:
+            first = await c.pipeline(["CREDIT A 5", "BOOM A 1", "CREDIT A 1"])
+            monkeypatch.setattr(data, "commit", failing_commit)
+            second = await c.pipeline(["CREDIT A 1", "TOTAL A"])
+            return first, second, await c.request("TOTAL A")
+        finally:
+            await c.close()
+
+    assert _run(scenario) == (["OK 5.00", "ERR FAILED", "OK 6.00"],
+                              ["ERR FAILED", "ERR FAILED"], "OK 7.00")
@@ -0,0 +1,162 @@
+import random
+from array import array
+from decimal import Decimal
+
+import pytest
+import data
+import journal
+import operations
+import settle
+
+
+@pytest.fixture(params=["numpy", "sequential"])
+def engine(request, monkeypatch):
+    """
+    Run a test with the vectorized path (when NumPy is installed) and without it.
+    """
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(settle, "numpy", None)
+    return request.param
+
+
+def test_settle_applies_credits_and_debits(engine):
+    """
+    Postings to several accounts are applied and nothing is rejected.
+    """
+    a, b = data.account_slots(["A", "B"])
+    rejected = operations.settle_cents([a, b, a, b], [1000, 500, -300, -500])
+    assert list(rejected) == [False, False, False, False]
+    assert data.read_cents("A") == 700
+    assert data.read_cents("B") == 0
+
+
+def test_settle_rejects_in_sequential_order(engine):
+    """
+    A debit bounces only if the balance at its turn is too low; a later credit does not save it.
+    """
+    (a,) = data.account_slots(["A"])
+    rejected = operations.settle_cents([a, a, a, a, a], [500, -800, -200, 1000, -1500])
+    assert list(rejected) == [False, True, False, False, True]
+    assert data.read_cents("A") == 1300
+
+
+def test_settle_matches_sequential_debits(engine):
+    """
+    Balances and rejections match one `credit`/`debit` per posting, on a random workload.
+    """
+    rng = random.Random(7)
+    ids = [f"ACC{i}" for i in range(50)]
+    postings = [(rng.choice(ids), rng.randrange(-3000, 2000)) for _ in range(2000)]
+    for account_id in ids:
+        data.write_cents(rng.randrange(0, 5000), account_id)
+    start = {account_id: data.read_cents(account_id) for account_id in ids}
+
+    expected = []
+    for account_id, delta in postings:
+        floor = 0 if delta < 0 else None
+        expected.append(data.apply_delta_cents(delta, account_id, floor) is None)
+    final = {account_id: data.read_cents(account_id) for account_id in ids}
+
+    for account_id, cents in start.items():
+        data.write_cents(cents, account_id)
+    slots = data.account_slots(account_id for account_id, _ in postings)
+    rejected = operations.settle_cents(slots, [delta for _, delta in postings])
+    assert list(rejected) == expected
+    assert {account_id: data.read_cents(account_id) for account_id in ids} == final
+
+
+def test_settle_accepts_numpy_columns():
+    """
+    Columns may be NumPy arrays, and the store can still grow afterwards.
+    """
+    numpy = pytest.importorskip("numpy")
+    (a,) = data.account_slots(["A"])
+    rejected = operations.settle_cents(numpy.array([a, a]), numpy.array([100, -200]))
+    assert rejected.dtype == bool
+    assert rejected.tolist() == [False, True]
+    data.write_balance(Decimal("1.00"), "NEW")
+    assert data.read_balance("NEW") == Decimal("1.00")
+
+
+def test_settle_rejects_bad_columns(engine):
+    """
+    Columns of different lengths or unknown slots are refused before any change.
+    """
+    with pytest.raises(ValueError):
+        operations.settle_cents([0, 0], [100])
+    data.write_cents(5, "LAST")
+    for slots in ([0, data.account_count()], [0, -1]):
+        with pytest.raises(IndexError):
+            operations.settle_cents(slots, [100, 100])
+        assert data.read_cents() == 100000
+        assert data.read_cents("LAST") == 5
+
+
+def test_apply_without_floor_never_rejects(engine):
+    """
+    Without a floor, debits may take a balance below zero.
+    """
+    balances = array("q", [0, 10])
+    rejected, touched = settle.apply(balances, [1, 0, 1], [-50, -5, 5])
+    assert list(rejected) == [False, False, False]
+    assert list(balances) == [-5, -35]
+    assert touched == [0, 1]
+
+
+def test_overflow_leaves_every_balance_unchanged(engine, tmp_path):
+    """
+    A posting that would overflow refuses the whole settlement before any balance,
+    journal record or history entry changes.
+    """
+    path = str(tmp_path / "balances.journal")
+    data.open_journal(path)
+    history = data.open_history()
+    try:
+        a, b = data.account_slots(["A", "B"])
+        data.write_cents(data.MAX_CENTS - 10, "A")
+        with pytest.raises(OverflowError):
+            operations.settle_cents([b, a], [500, 11])
+        assert (data.read_cents("A"), data.read_cents("B")) == (data.MAX_CENTS - 10, 0)
+        assert len(history.between()) == 1
+    finally:
+        data.close_history()
+        data.close_journal()
+    assert [account_id for account_id, _ in journal.replay(path)] == ["A"]
+
+
+def test_only_changed_balances_are_journaled(engine, tmp_path):
+    """
+    Accounts whose postings cancel out are not reported as changed, nor journaled.
+    """
+    balances = array("q", [0, 10])
+    assert settle.apply(balances, [1, 0, 1], [5, 3, -5])[1] == [0]
+    path = str(tmp_path / "balances.journal")
+    data.open_journal(path)
+    try:
+        a, b = data.account_slots(["A", "B"])
+        operations.settle_cents([a, b, b], [250, 100, -100])
+    finally:
+        data.close_journal()
+    assert [account_id for account_id, _ in journal.replay(path)] == ["A"]
+
+
+def test_settle_is_journaled(tmp_path):
+    """
+    Settled balances survive a restart from the journal.
+    """
+    path = str(tmp_path / "balances.journal")
+    data.open_journal(path)
+    try:
+        a, b = data.account_slots(["A", "B"])
+        operations.settle_cents([a, b, b], [250, 100, -300])
+    finally:
+        data.close_journal()
+    data.reset()
+    data.open_journal(path)
+    try:
+        assert data.read_cents("A") == 250
+        assert data.read_cents("B") == 100
+    finally:
+        data.close_journal()
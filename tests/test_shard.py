@@ -0,0 +1,217 @@
+import random
+
+import pytest
+import data
+import operations
+import shard
+
+
+@pytest.fixture(scope="module")
+def engine():
+    """
+    Share one 3-shard engine between the tests of this module.
+    """
+    with shard.ShardedEngine(shards=3) as e:
+        yield e
+
+
+def test_shard_of_is_stable_and_in_range():
+    """
+    An account always maps to the same shard, whatever the process.
+    """
+    assert shard.shard_of("ACC1", 8) == shard.shard_of("ACC1", 8)
+    assert shard.shard_of("ACC1", 8) == 1
+    assert {shard.shard_of(f"ACC{i}", 8) for i in range(200)} == set(range(8))
+
+
+def test_results_match_single_process(engine):
+    """
+    A routed batch gives the same results, in the same order, as one process.
+    """
+    rng = random.Random(3)
+    ids = [f"MATCH{i}" for i in range(40)]
+    records = [(rng.choice(("TOTAL", "CREDIT", "DEBIT", "BOGUS")), rng.choice(ids),
+                f"{rng.randrange(1, 5000) / 100:.2f}") for _ in range(1000)]
+    records.append(("DEBIT", data.DEFAULT_ACCOUNT, "1.00"))
+    expected = operations.apply_batch_cents(records)
+    assert engine.apply_batch_cents(records) == expected
+    assert engine.read_cents("MATCH0") == data.read_cents("MATCH0")
+
+
+def test_random_transfers_match_single_process(engine):
+    """
+    Batches mixing transfers within and across shards give single-process results.
+    """
+    rng = random.Random(7)
+    ids = [f"RXFER{i}" for i in range(8)]
+    records = [("CREDIT", x, 5000, None) for x in ids]
+    for _ in range(500):
+        op = rng.choice(("TOTAL", "CREDIT", "DEBIT", "TRANSFER", "TRANSFER"))
+        records.append((op, rng.choice(ids), rng.randrange(1, 3000), rng.choice(ids)))
+    expected = operations.apply_batch_cents(records)
+    assert engine.apply_batch_cents(records) == expected
+    assert [engine.read_cents(x) for x in ids] == [data.read_cents(x) for x in ids]
+
+
+def test_apply_partitioned_returns_columns(engine):
+    """
+    Pre-split batches go straight to their shards and come back as columns.
+    """
+    batches = [[] for _ in range(engine.shards)]
+    for account_id in ("PART1", "PART2", "PART3", "PART4"):
+        batches[shard.shard_of(account_id, engine.shards)].append(("CREDIT", account_id, 250))
+    replies = engine.apply_partitioned(batches)
+    for batch, (statuses, balances) in zip(batches, replies):
+        assert statuses == [operations.OK] * len(batch)
+        assert balances == [250] * len(batch)
+
+
+def test_apply_partitioned_refuses_misrouted_records(engine):
+    """
+    A worker refuses a batch holding an account of another shard, and applies none of it.
+    """
+    owner = shard.shard_of("STRAY", engine.shards)
+    batches = [[] for _ in range(engine.shards)]
+    batches[(owner + 1) % engine.shards].append(("CREDIT", "STRAY", 100))
+    with pytest.raises(ValueError):
+        engine.apply_partitioned(batches)
+    assert engine.read_cents("STRAY") == 0
+    with pytest.raises(ValueError):
+        engine.apply_partitioned([[]])
+    with pytest.raises(ValueError):
+        engine.apply_partitioned([[("TOTAL", "X")]] + [[]] * (engine.shards - 1))
+
+
+def test_internal_operations_and_accounts_are_refused(engine):
+    """
+    The two-phase commit records and the NUL-prefixed internal accounts are
+    not reachable through the public entry points.
+    """
+    assert engine.apply_batch_cents([("_HOLD", "INT_A", 50), ("_ACCEPT", "INT_A", 50)]) == [
+        operations.Result(operations.INVALID_OPERATION)] * 2
+    assert engine.apply_batch_cents([("CREDIT", shard._HOLD + "INT_A", 50),
+                                     ("TRANSFER", "INT_A", 50, shard._SETTLED)]) == [
+        operations.Result(operations.INVALID_ACCOUNT)] * 2
+    batches = [[] for _ in range(engine.shards)]
+    batches[shard.shard_of("INT_A", engine.shards)].append(("_HOLD", "INT_A", 50))
+    with pytest.raises(ValueError):
+        engine.apply_partitioned(batches)
+    assert engine.read_cents("INT_A") == 0
+
+
+def test_shard_journals_survive_restart(tmp_path):
+    """
+    With a journal directory, every shard replays its own journal on restart.
+    """
+    with shard.ShardedEngine(shards=2, journal_dir=str(tmp_path)) as e:
+        e.apply_batch_cents([("CREDIT", f"J{i}", 100 * i) for i in range(10)])
+    with shard.ShardedEngine(shards=2, journal_dir=str(tmp_path)) as e:
+        assert [e.read_cents(f"J{i}") for i in range(10)] == [100 * i for i in range(10)]
+
+
+def test_transfers_within_and_across_shards(engine):
+    """
+    Transfers give the results of a single process and conserve money,
+    whichever shards own the accounts.
+    """
+    a = "XFER_A"
+    same = next(f"XFER_S{i}" for i in range(100)
+                if shard.shard_of(f"XFER_S{i}", engine.shards) == shard.shard_of(a, engine.shards))
+    other = next(f"XFER_O{i}" for i in range(100)
+                 if shard.shard_of(f"XFER_O{i}", engine.shards) != shard.shard_of(a, engine.shards))
+    results = engine.apply_batch_cents([
+        ("CREDIT", a, "10.00"),
+        ("TRANSFER", a, "3.00", same),
+        ("TRANSFER", a, "4.00", other),
+        ("TRANSFER", a, "5.00", other),
+        ("CREDIT", other, "1.00", "ignored"),
+        ("TRANSFER", a, "1.00", ""),
+    ])
+    assert results == [
+        operations.Result(operations.OK, 1000),
+        operations.Result(operations.OK, 700),
+        operations.Result(operations.OK, 300),
+        operations.Result(operations.INSUFFICIENT_FUNDS),
+        operations.Result(operations.OK, 500),
+        operations.Result(operations.INVALID_TARGET),
+    ]
+    assert [engine.read_cents(x) for x in (a, same, other)] == [300, 300, 500]
+
+    expected = [operations.Result(operations.OK, 200), operations.Result(operations.OK, 400),
+                operations.Result(operations.OK, 400), operations.Result(operations.OK, 400)]
+    assert engine.apply_batch_cents([
+        ("TRANSFER", other, 300, a),
+        ("TRANSFER", a, 200, other),
+        ("TOTAL", other, None),
+        ("TOTAL", a, None),
+    ]) == expected
+
+
+def _crash(engine):
+    """
+    Helper to kill the workers of an engine without letting it settle anything.
+    """
+    for proc in engine._procs:
+        proc.kill()
+        proc.join()
+    engine._log.close()
+
+
+def test_idempotency_keys_are_kept_by_the_shard_of_the_account(tmp_path):
+    """
+    Keyed records apply once, even after a restart, and a keyed TRANSFER
+    across shards is refused instead of losing its key.
+    """
+    a = "KEY_A"
+    same = next(f"KEY_S{i}" for i in range(100) if shard.shard_of(f"KEY_S{i}", 2) == shard.shard_of(a, 2))
+    other = next(f"KEY_O{i}" for i in range(100) if shard.shard_of(f"KEY_O{i}", 2) != shard.shard_of(a, 2))
+    batch = [
+        ("CREDIT", a, 1000, None, "k1"),
+        ("TRANSFER", a, 300, same, "k2"),
+        ("TRANSFER", a, 100, other),
+        ("TRANSFER", a, 100, other, "k3"),
+        ("CREDIT", other, 50),
+    ]
+    expected = [
+        operations.Result(operations.OK, 1000),
+        operations.Result(operations.OK, 700),
+        operations.Result(operations.OK, 600),
+        operations.Result(operations.INVALID_OPERATION),
+        operations.Result(operations.OK, 150),
+    ]
+    with shard.ShardedEngine(shards=2, journal_dir=str(tmp_path)) as e:
+        assert e.apply_batch_cents(batch) == expected
+        assert e.apply_batch_cents(batch[:2]) == expected[:2]
+    with shard.ShardedEngine(shards=2, journal_dir=str(tmp_path)) as e:
+        assert e.apply_batch_cents([("CREDIT", a, 1000, None, "k1"), ("DEBIT", a, 1000, None, "k1")]) == [
+            operations.Result(operations.OK, 1000), operations.Result(operations.KEY_REUSED)]
+        assert [e.read_cents(x) for x in (a, same, other)] == [600, 300, 150]
+
+
+def test_transfers_in_doubt_are_settled_on_restart(tmp_path, monkeypatch):
+    """
+    After a crash, logged commits are settled and undecided holds are refunded.
+    """
+    a = "DOUBT_A"
+    b = next(f"DOUBT_B{i}" for i in range(100) if shard.shard_of(f"DOUBT_B{i}", 2) != shard.shard_of(a, 2))
+    e = shard.ShardedEngine(shards=2, journal_dir=str(tmp_path))
+    e.apply_batch_cents([("CREDIT", a, 1000)])
+    exchange = e._exchange
+    monkeypatch.setattr(e, "_exchange", lambda batches, settles=None, internal=False:
+                        exchange(batches, settles, internal) if not settles else 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        e.apply_batch_cents([("TRANSFER", a, 300, b)])
+    assert exchange([[]] * 2)  # The hold is taken, the credit not yet applied.
+    _crash(e)
+
+    e = shard.ShardedEngine(shards=2, journal_dir=str(tmp_path))
+    assert [e.read_cents(a), e.read_cents(b)] == [700, 300]
+    monkeypatch.setattr(e, "_decide", lambda committed: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        e.apply_batch_cents([("TRANSFER", a, 200, b)])
+    _crash(e)
+
+    with shard.ShardedEngine(shards=2, journal_dir=str(tmp_path)) as e:
+        assert [e.read_cents(a), e.read_cents(b)] == [700, 300]
+        assert e.apply_batch_cents([("TRANSFER", b, 50, a)]) == [operations.Result(operations.OK, 250)]
+        assert [e.read_cents(a), e.read_cents(b)] == [750, 250]
@@ -0,0 +1,183 @@
+import os
+import time
+from array import array
+from decimal import Decimal
+
+import pytest
+import data
+import journal
+import operations
+import snapshot
+
+
+@pytest.fixture
+def paths(tmp_path):
+    """
+    Provide journal and snapshot paths and detach the journal after the test.
+    """
+    yield str(tmp_path / "balances.journal"), str(tmp_path / "balances.snapshot")
+    data.close_journal()
+
+
+def test_write_and_load_round_trip(tmp_path):
+    """
+    A snapshot restores the cents column and the ids in slot order.
+    """
+    path = str(tmp_path / "s")
+    snapshot.write(path, array("q", [100, -5, 0]), ["A", "B", "é"])
+    cents, ids = snapshot.load(path)
+    assert list(cents) == [100, -5, 0]
+    assert snapshot.split_ids(ids) == ["A", "B", "é"]
+
+
+def test_load_detects_corruption(tmp_path):
+    """
+    A flipped byte fails the checksum instead of loading wrong balances.
+    """
+    path = tmp_path / "s"
+    snapshot.write(str(path), array("q", [100, 200]), ["A", "B"])
+    raw = bytearray(path.read_bytes())
+    raw[-4] ^= 0xFF
+    path.write_bytes(bytes(raw))
+    with pytest.raises(ValueError):
+        snapshot.load(str(path))
+
+
+def test_write_rejects_newline_in_id(tmp_path):
+    """
+    Ids containing the column separator are refused.
+    """
+    with pytest.raises(ValueError):
+        snapshot.write(str(tmp_path / "s"), array("q", [1]), ["A\nB"])
+
+
+def test_checkpoint_truncates_journal_and_recovers(paths):
+    """
+    After a checkpoint the journal only holds later writes, and startup
+    loads the snapshot then replays that tail.
+    """
+    journal_path, snapshot_path = paths
+    data.open_journal(journal_path, snapshot_path=snapshot_path)
+    operations.apply_batch([("CREDIT", f"A{i}", "1.00") for i in range(50)])
+    data.checkpoint()
+    assert list(journal.replay(journal_path)) == []
+    operations.apply_batch([("CREDIT", "A1", "2.00"), ("CREDIT", "NEW", "3.00")])
+    assert len(list(journal.replay(journal_path))) == 2
+    data.close_journal()
+
+    data.reset()
+    data.open_journal(journal_path, snapshot_path=snapshot_path)
+    assert data.read_balance("A1") == Decimal("3.00")
+    assert data.read_balance("A49") == Decimal("1.00")
+    assert data.read_balance("NEW") == Decimal("3.00")
+    assert data.read_balance() == Decimal("1000.00")
+    assert data.read_balance("MISSING") == Decimal("0.00")
+    assert data.account_count() == 52
+
+
+def test_snapshot_index_is_built_in_chunks(paths, monkeypatch):
+    """
+    Snapshot accounts are found while the index is still partial, by searching only
+    the part of the ids column not indexed yet; new slots stay after snapshot slots.
+    """
+    journal_path, snapshot_path = paths
+    data.open_journal(journal_path, snapshot_path=snapshot_path)
+    operations.apply_batch([("CREDIT", f"A{i}", str(i + 1)) for i in range(40)])
+    data.checkpoint()
+    data.close_journal()
+
+    data.reset()
+    monkeypatch.setattr(data, "_index_in_background", lambda column: None)
+    monkeypatch.setattr(data, "_INDEX_CHUNK", 16)
+    data.load_snapshot(snapshot_path)
+    assert data._ACCOUNT_INDEX == {}
+    data.write_balance(Decimal("7.00"), "LATE")
+    assert data.read_balance("A30") == Decimal("31.00")
+    column = data._SNAPSHOT_IDS
+    assert data._index_chunk(column) and data._index_chunk(column)
+    assert 0 < len(data._SNAPSHOT_INDEX) < 40
+    for i in range(40):
+        assert data.read_balance(f"A{i}") == Decimal(i + 1)
+    while data._index_chunk(column):
+        pass
+    assert data._SNAPSHOT_IDS is None
+    assert list(data._ACCOUNT_INDEX)[-1] == "LATE"
+    assert data._ACCOUNT_INDEX["LATE"] == 41
+    assert data._account_ids() == [data.DEFAULT_ACCOUNT] + [f"A{i}" for i in range(40)] + ["LATE"]
+
+
+def test_first_lookups_after_load_stay_fast(tmp_path):
+    """
+    Lookups right after loading a large snapshot do not wait for the whole index.
+    """
+    path = str(tmp_path / "s")
+    count = 1_000_000
+    snapshot.write(path, array("q", range(count)), [f"ACCOUNT-{i:09d}" for i in range(count)])
+    data.load_snapshot(path)
+    worst = 0.0
+    for i in range(0, count, count // 50):
+        start = time.perf_counter()
+        assert data.read_cents(f"ACCOUNT-{i:09d}") == i
+        worst = max(worst, time.perf_counter() - start)
+    data._INDEXER.join()
+    assert data._SNAPSHOT_IDS is None and data.read_cents("ACCOUNT-000000007") == 7
+    assert worst < 0.2
+
+
+def test_periodic_checkpoint(paths):
+    """
+    A checkpoint is taken automatically once the configured number of writes is reached.
+    """
+    journal_path, snapshot_path = paths
+    data.open_journal(journal_path, snapshot_path=snapshot_path, checkpoint_every=5)
+    operations.apply_batch([("CREDIT", "A", "1.00")] * 4)
+    assert not os.path.exists(snapshot_path)
+    operations.apply_batch([("CREDIT", "A", "1.00")] * 2)
+    assert os.path.exists(snapshot_path)
+    assert list(journal.replay(journal_path)) == []
+
+
+def test_ids_snapshots_cannot_hold_are_refused(paths):
+    """
+    An id with a newline is refused up front, so periodic checkpoints keep working.
+    """
+    journal_path, snapshot_path = paths
+    data.open_journal(journal_path, snapshot_path=snapshot_path, checkpoint_every=2)
+    assert operations.apply("CREDIT", "A\nB", "1.00").status == operations.INVALID_ACCOUNT
+    assert operations.apply_batch([("CREDIT", "A", "1.00")] * 3)[-1].status == operations.OK
+    with pytest.raises(ValueError):
+        data.write_cents(1, "A\nB")
+    assert os.path.exists(snapshot_path) and "A\nB" not in data._account_ids()
+
+
+def test_failed_periodic_checkpoint_keeps_the_commit(paths, monkeypatch):
+    """
+    A periodic checkpoint that fails comes after the journal commit and does not fail it.
+    """
+    journal_path, snapshot_path = paths
+    data.open_journal(journal_path, snapshot_path=snapshot_path, checkpoint_every=1)
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(snapshot, "write", fail)
+    assert operations.apply("CREDIT", "A", "1.00").status == operations.OK
+    assert operations.apply("CREDIT", "A", "1.00").status == operations.OK
+    data.close_journal()
+    assert dict(journal.replay(journal_path))["A"] == 200
+
+
+def test_replay_over_older_snapshot_is_safe(paths):
+    """
+    A crash between snapshot and journal compaction replays records the
+    snapshot already holds; absolute records make this harmless.
+    """
+    journal_path, snapshot_path = paths
+    data.open_journal(journal_path)
+    operations.apply_batch([("CREDIT", "A", "1.00"), ("CREDIT", "A", "1.00")])
+    snapshot.write(snapshot_path, data._STORAGE_BALANCE, list(data._ACCOUNT_INDEX))
+    data.close_journal()
+
+    data.reset()
+    data.open_journal(journal_path, snapshot_path=snapshot_path)
+    assert data.read_balance("A") == Decimal("2.00")
@@ -0,0 +1,160 @@
+import sqlite3
+import threading
+from decimal import Decimal
+
+import pytest
+import data
+import main
+import operations
+import storage
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "balances.db")
+
+
+@pytest.fixture
+def backend(db_path):
+    """
+    Attach a SQLite backend and detach it after the test.
+    """
+    yield data.open_backend(storage.SQLiteBackend(db_path))
+    data.close_backend()
+
+
+def _stored(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return dict(conn.execute("SELECT account, cents FROM balances"))
+
+
+def test_sqlite_backend_uses_wal_and_buffers_until_commit(db_path):
+    """
+    Writes stay buffered (but readable) until commit upserts them in one transaction.
+    """
+    b = storage.SQLiteBackend(db_path)
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    b.write("A", 100)
+    b.write("A", 250)
+    assert b.read("A") == 250
+    assert b.read("B") is None
+    assert _stored(db_path) == {}
+    b.commit()
+    assert _stored(db_path) == {"A": 250}
+    assert b.count() == 1
+    b.close()
+
+
+class _FailingCommit:
+    """
+    Connection wrapper whose next COMMIT fails, as on a full disk.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.fail = True
+
+    def execute(self, sql, *args):
+        if sql == "COMMIT" and self.fail:
+            self.fail = False
+            raise sqlite3.OperationalError("disk I/O error")
+        return self.conn.execute(sql, *args)
+
+    def executemany(self, sql, rows):
+        return self.conn.executemany(sql, rows)
+
+    @property
+    def in_transaction(self):
+        return self.conn.in_transaction
+
+
+def test_failed_commit_rolls_back_and_keeps_the_batch(db_path):
+    """
+    A failed COMMIT leaves no open transaction, and its writes are retried by the next commit.
+    """
+    b = storage.SQLiteBackend(db_path, pool_size=1)
+    conn = _FailingCommit(b._pool.get())
+    b._pool.put(conn)
+    b.write("A", 100)
+    with pytest.raises(sqlite3.OperationalError):
+        b.commit()
+    assert not conn.in_transaction
+    assert b.read("A") == 100 and _stored(db_path) == {}
+    b.write("B", 5)
+    b.commit()
+    assert _stored(db_path) == {"A": 100, "B": 5}
+    b.close()
+
+
+def test_operations_persist_through_backend(backend, db_path):
+    """
+    Operations run unchanged on the backend, and their results survive a reopen.
+    """
+    assert operations.apply("TOTAL") == operations.Result(operations.OK, Decimal("1000.00"))
+    operations.apply("CREDIT", "A", "10.50")
+    operations.apply("TRANSFER", "A", "0.50", "B")
+    assert operations.apply("DEBIT", "B", "1.00").status == operations.INSUFFICIENT_FUNDS
+    assert _stored(db_path) == {"DEFAULT": 100000, "A": 1000, "B": 50}
+    assert data.account_count() == 3
+    assert data.compare_and_set(Decimal("0.50"), Decimal("0.75"), "B")
+    data.close_backend()
+    assert data.read_cents("A") == 0
+    data.open_backend(storage.SQLiteBackend(db_path))
+    assert (data.read_cents("A"), data.read_cents("B")) == (1000, 75)
+
+
+def test_backend_refuses_slot_apis(backend, db_path):
+    """
+    Slot-based, snapshot and journal APIs are unavailable on a backend.
+    """
+    with pytest.raises(ValueError):
+        data.account_slots(["A"])
+    with pytest.raises(ValueError):
+        operations.settle_cents([0], [100])
+    with pytest.raises(ValueError):
+        data.checkpoint(db_path + ".snap")
+    with pytest.raises(ValueError):
+        data.open_journal(db_path + ".journal")
+
+
+def test_backend_concurrent_deltas_are_not_lost(backend):
+    """
+    Threads updating shared accounts through the pool never lose an update.
+    """
+    def worker():
+        for i in range(200):
+            data.apply_delta_cents(1, f"ACC{i % 5}")
+            data.commit()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert [data.read_cents(f"ACC{i}") for i in range(5)] == [160] * 5
+
+
+def test_memory_backend_matches_default_store(tmp_path):
+    """
+    The dict backend gives the same results as the built-in store.
+    """
+    records = [("CREDIT", "A", "5.00"), ("DEBIT", "A", "7.00"), ("TRANSFER", "A", "2.00", "B"), ("TOTAL", "B", "")]
+    expected = operations.apply_batch(records)
+    data.open_backend(storage.MemoryBackend())
+    try:
+        assert operations.apply_batch(records) == expected
+    finally:
+        data.close_backend()
+
+
+def test_main_sqlite_option(db_path, monkeypatch, capsys):
+    """
+    --sqlite keeps balances across runs of the menu.
+    """
+    inputs = iter(["2", "25.00", "4"])
+    monkeypatch.setattr("builtins.input", lambda _: next(inputs))
+    main.main(["--sqlite", db_path])
+    inputs = iter(["1", "4"])
+    main.main(["--sqlite", db_path])
+    assert "Current balance: 1025.00" in capsys.readouterr().out
@@ -0,0 +1,97 @@
+import asyncio
+import collections
+from decimal import Decimal
+
+import pytest
+import data
+import operations
+import server
+import workload
+
+
+def test_generate_is_seeded_skewed_and_mixed():
+    """
+    A stream depends only on its seed and parameters, and follows the skew, mix and amounts asked for.
+    """
+    stream = list(workload.generate(20000, seed=3, accounts=100, skew=1.2,
+                                    mix={"TOTAL": 1, "CREDIT": 3}, amounts="uniform:1.00:2.00"))
+    assert stream == list(workload.generate(20000, seed=3, accounts=100, skew=1.2,
+                                            mix={"TOTAL": 1, "CREDIT": 3}, amounts="uniform:1.00:2.00"))
+    assert stream != list(workload.generate(20000, seed=4, accounts=100, skew=1.2,
+                                            mix={"TOTAL": 1, "CREDIT": 3}, amounts="uniform:1.00:2.00"))
+    ops = collections.Counter(r[0] for r in stream)
+    assert set(ops) == {"TOTAL", "CREDIT"} and 0.22 < ops["TOTAL"] / len(stream) < 0.28
+    hits = collections.Counter(r[1] for r in stream)
+    assert hits["ACC0"] > 1.8 * hits["ACC1"] > 1.8 * hits["ACC3"]
+    uniform = collections.Counter(r[1] for r in workload.generate(20000, accounts=100, skew=0))
+    assert max(uniform.values()) < 2 * min(uniform.values())
+    assert all(100 <= operations.parse_cents(r[2])[0] <= 200 for r in stream if r[0] == "CREDIT")
+    transfers = [r for r in workload.generate(500, accounts=2, mix={"TRANSFER": 1}) if r[1] == r[3]]
+    assert transfers == []
+    with pytest.raises(ValueError):
+        next(workload.generate(1, amounts="normal:1:2"))
+    with pytest.raises(ValueError):
+        next(workload.generate(1, accounts=1, mix={"TRANSFER": 1}))
+
+
+def test_stream_round_trips_through_csv(tmp_path):
+    """
+    A saved stream reads back as the same records.
+    """
+    path = str(tmp_path / "load.csv")
+    stream = list(workload.generate(300, seed=1))
+    assert workload.write(path, stream) == 300
+    assert workload.read(path) == stream
+
+
+@pytest.mark.parametrize("frontend", ["interactive", "inprocess", "batch"])
+def test_local_front_ends_apply_the_stream(frontend):
+    """
+    Every local front end applies the same operations and reports every one of them.
+    """
+    stream = list(workload.generate(400, seed=5, accounts=3, mix={"TOTAL": 1, "CREDIT": 2, "DEBIT": 2}))
+    if frontend == "interactive":
+        stream = [(r[0], data.DEFAULT_ACCOUNT) + r[2:] for r in stream]
+    expected = operations.apply_batch(stream)
+    reference = {a: data.read_cents(a) for a in (data.DEFAULT_ACCOUNT, "ACC0", "ACC1", "ACC2")}
+    data.reset()
+    data.write_balance(Decimal("1000.00"))
+    report = workload.replay(stream, frontend, batch=16)
+    assert {a: data.read_cents(a) for a in reference} == reference
+    assert report.requests == 400 and report.latency.count == 400
+    assert report.errors == sum(r.status != operations.OK for r in expected)
+    assert 0 < report.percentile(50) <= report.percentile(99) <= report.latency.max / 1e9
+
+
+def test_replay_keeps_the_target_rate():
+    """
+    An open-loop replay does not run ahead of its target rate.
+    """
+    report = workload.replay(workload.generate(50, mix={"TOTAL": 1}), "inprocess", rate=500)
+    assert report.seconds >= 49 / 500
+    assert report.rate <= 500 * 1.05
+
+
+def test_network_replay():
+    """
+    The network front end drives a server through pipelined windows.
+    """
+    stream = list(workload.generate(300, seed=9, accounts=5))
+    expected = operations.apply_batch(stream)
+    reference = {f"ACC{i}": data.read_cents(f"ACC{i}") for i in range(5)}
+    data.reset()
+
+    async def scenario():
+        srv = await server.start_server("127.0.0.1", 0)
+        port = srv.sockets[0].getsockname()[1]
+        try:
+            return await asyncio.to_thread(workload.replay, stream, "network", None, 8,
+                                           "127.0.0.1", port, 1)
+        finally:
+            srv.close()
+            await srv.wait_closed()
+
+    report = asyncio.run(scenario())
+    assert report.requests == report.latency.count == 300
+    assert report.errors == sum(r.status != operations.OK for r in expected)
+    assert {a: data.read_cents(a) for a in reference} == reference
@@ -0,0 +1,457 @@
+"""
+Workload module for the Account Management System.
+
+This module generates synthetic transaction streams and replays them
+against any front end, to measure capacity without real traffic:
+
+    python3 workload.py generate --count 100000 --accounts 10000 --skew 1.1 -o load.csv
+    python3 workload.py replay load.csv --frontend batch --rate 20000
+
+A stream is fully determined by its seed and parameters:
+- account skew: the account of each operation is drawn from a Zipf
+  distribution over `accounts` ids ("ACC0" is the busiest), where a skew
+  of 0 is uniform and higher skews concentrate the traffic;
+- op mix: the relative weight of each operation (TOTAL, CREDIT, DEBIT,
+  TRANSFER or any registered one);
+- amounts: a distribution in amounts, "fixed:10.00",
+  "uniform:0.01:100.00" or "lognormal:MU:SIGMA" (the log of the amount
+  is normal, so "lognormal:3:1" has a median of about 20.09).
+Streams are saved as `ingest` CSV files, so `main.py ingest` replays them too.
+
+The replayer is open-loop: with a target rate, request i is due at
+i / rate seconds after the start, whether or not earlier requests are
+done. Latencies are measured from the due time, so a front end that
+falls behind shows its queueing delay in the percentiles instead of
+silently lowering the offered load. Without a rate, requests are sent
+as fast as the front end takes them. Front ends:
+- "interactive": `operations.execute`, answering its prompts from the
+  stream (the menu operates on the default account, so stream accounts
+  are ignored);
+- "inprocess": `operations.apply`, one commit per operation;
+- "batch": `operations.apply_batch`, one commit per batch;
+- "network": a `server` reached with `client.Client`, pipelined windows
+  spread over several connections.
+"""
+
+import asyncio
+import itertools
+import math
+import random
+import time
+from bisect import bisect_right
+from typing import Iterable, Iterator, NamedTuple
+
+import data
+import metrics
+
+MIX = {"TOTAL": 20, "CREDIT": 40, "DEBIT": 35, "TRANSFER": 5}
+"""
+Default op mix: relative weight of each operation.
+"""
+
+AMOUNTS = "lognormal:3:1"
+"""
+Default amount distribution (median about 20.09).
+"""
+
+BATCH_SIZE = 64
+"""
+Operations per `apply_batch` call, and per pipelined window on the network.
+"""
+
+FRONTENDS = ("interactive", "inprocess", "batch", "network")
+"""
+Front ends the replayer can drive.
+"""
+
+_HEADER = "operation,account,amount,target\n"
+
+
+def _cumulative(weights: Iterable[float]) -> list[float]:
+    """
+    Return the running totals of weights, for sampling with `_pick`.
+    """
+    return list(itertools.accumulate(weights))
+
+
+def _pick(cumulative: list[float], rng: random.Random) -> int:
+    """
+    Draw an index with probability proportional to its weight.
+    """
+    return min(bisect_right(cumulative, rng.random() * cumulative[-1]), len(cumulative) - 1)
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    """
+    Parse an op mix given on the command line as "OP=WEIGHT,...",
+    e.g. "TOTAL=20,CREDIT=50,DEBIT=30".
+    Raises:
+        ValueError: If the text is not such a mix.
+    """
+    mix = {}
+    for part in text.split(","):
+        op, sep, weight = part.partition("=")
+        try:
+            mix[op.strip().upper()] = float(weight)
+        except ValueError:
+            raise ValueError(f"Invalid op mix {text!r}; expected OP=WEIGHT,...") from None
+        if not sep or not op.strip():
+            raise ValueError(f"Invalid op mix {text!r}; expected OP=WEIGHT,...")
+    return mix
+
+
+def parse_amounts(spec: str):
+    """
+    Parse an amount distribution: "fixed:AMOUNT", "uniform:LOW:HIGH" or
+    "lognormal:MU:SIGMA", in amounts (not cents).
+    Args:
+        spec (str): The distribution.
+    Returns:
+        Callable[[random.Random], int]: Draws one positive amount, in cents.
+    Raises:
+        ValueError: If the spec is not such a distribution.
+    """
+    kind, *params = spec.split(":")
+    try:
+        values = [float(p) for p in params]
+    except ValueError:
+        values = []
+    if not all(math.isfinite(v) for v in values):
+        values = []
+    if kind == "fixed" and len(values) == 1 and values[0] >= 0.01:
+        cents = round(values[0] * 100)
+        return lambda rng: cents
+    if kind == "uniform" and len(values) == 2 and 0.01 <= values[0] <= values[1]:
+        low, high = round(values[0] * 100), round(values[1] * 100)
+        return lambda rng: low + int(rng.random() * (high - low + 1))
+    if kind == "lognormal" and len(values) == 2 and values[1] >= 0:
+        mu, sigma = values
+        return lambda rng: max(1, round(rng.lognormvariate(mu, sigma) * 100))
+    raise ValueError(f"Invalid amount distribution {spec!r}; expected fixed:AMOUNT, "
+                     "uniform:LOW:HIGH or lognormal:MU:SIGMA.")
+
+
+def generate(count: int, seed: int = 0, accounts: int = 1000, skew: float = 1.0,
+             mix: dict[str, float] | None = None, amounts: str = AMOUNTS) -> Iterator[tuple]:
+    """
+    Generate a synthetic transaction stream. The same arguments always
+    give the same stream.
+    Args:
+        count (int): Number of operations.
+        seed (int): Seed of the generator.
+        accounts (int): Number of distinct accounts ("ACC0" to "ACC<accounts-1>").
+        skew (float): Zipf exponent of the account distribution; 0 is uniform.
+        mix (dict[str, float] | None): Relative weight of each operation
+                                       (defaults to `MIX`).
+        amounts (str): Amount distribution (see `parse_amounts`).
+    Yields:
+        tuple: (operation, account, amount) records, amount None for TOTAL,
+        and (operation, account, amount, target) for TRANSFER, amounts as
+        decimal strings: the records `operations.apply_batch` takes.
+    Raises:
+        ValueError: If a parameter is out of range.
+    """
+    mix = MIX if mix is None else mix
+    ops = [op for op, weight in mix.items() if weight > 0]
+    if not ops or any(weight < 0 for weight in mix.values()):
+        raise ValueError("The op mix needs a positive weight and no negative ones.")
+    if accounts < 1 or ("TRANSFER" in ops and accounts < 2):
+        raise ValueError("Too few accounts (TRANSFER needs two).")
+    if skew < 0:
+        raise ValueError("The skew must not be negative.")
+    draw_amount = parse_amounts(amounts)
+    rng = random.Random(seed)
+    op_weights = _cumulative(mix[op] for op in ops)
+    account_weights = _cumulative(rank ** -skew for rank in range(1, accounts + 1))
+    for _ in range(count):
+        op = ops[_pick(op_weights, rng)]
+        account = _pick(account_weights, rng)
+        if op == "TOTAL":
+            yield (op, f"ACC{account}", None)
+            continue
+        cents = draw_amount(rng)
+        amount = f"{cents // 100}.{cents % 100:02d}"
+        if op == "TRANSFER":
+            target = _pick(account_weights, rng)
+            if target == account:
+                target = (account + 1) % accounts
+            yield (op, f"ACC{account}", amount, f"ACC{target}")
+        else:
+            yield (op, f"ACC{account}", amount)
+
+
+def write(path: str, records: Iterable[tuple]) -> int:
+    """
+    Save a stream as an `ingest` CSV file.
+    Args:
+        path (str): The file to write.
+        records (Iterable[tuple]): The records, as yielded by `generate`.
+    Returns:
+        int: Number of records written.
+    """
+    n = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(_HEADER)
+        for record in records:
+            f.write(",".join("" if v is None else v for v in record) + "\n")
+            n += 1
+    return n
+
+
+def read(path: str) -> list[tuple]:
+    """
+    Load a stream saved by `write` (or any `ingest` CSV file).
+    Args:
+        path (str): The file to read.
+    Returns:
+        list[tuple]: The records, in file order.
+    Raises:
+        ValueError: If a line is not a record.
+    """
+    import ingest
+
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for lineno, record, raw in ingest.read_csv(f):
+            if record is None:
+                raise ValueError(f"{path}:{lineno}: not a record: {raw!r}")
+            # TOTAL rows have an empty amount.
+            records.append(record[:2] + (record[2] or None,) + record[3:])
+    return records
+
+
+class ReplayReport(NamedTuple):
+    """
+    Outcome of a replay.
+    Attributes:
+        frontend (str): The front end driven.
+        requests (int): Number of operations applied.
+        errors (int): Number of operations refused (any status but OK).
+        seconds (float): Wall-clock duration of the replay.
+        latency (metrics.Histogram): Latency of every operation, from its due
+                                     time to its result, in nanoseconds.
+    """
+    frontend: str
+    requests: int
+    errors: int
+    seconds: float
+    latency: metrics.Histogram
+
+    @property
+    def rate(self) -> float:
+        """
+        Throughput in operations per second.
+        """
+        return self.requests / self.seconds if self.seconds > 0 else 0.0
+
+    def percentile(self, p: float) -> float:
+        """
+        Return a latency percentile, in seconds.
+        Args:
+            p (float): The percentile, between 0 and 100.
+        """
+        return self.latency.quantile(p / 100) / 1e9
+
+
+def _interactive_sender():
+    """
+    Return the sender answering `operations.execute` prompts from records.
+    Errors are counted from the messages the front end prints.
+    """
+    import contextlib
+    import io
+    import operations
+
+    failures = set(operations.MESSAGES.values())
+
+    def send(chunk: list[tuple]) -> int:
+        errors = 0
+        for record in chunk:
+            # TRANSFER asks for the target first, then the amount.
+            answers = iter(record[3:4] + record[2:3])
+            buffer = io.StringIO()
+            operations._READ_ANSWER = lambda: next(answers)
+            try:
+                with contextlib.redirect_stdout(buffer):
+                    operations.execute(record[0])
+            finally:
+                operations._READ_ANSWER = None
+            errors += any(line in failures for line in buffer.getvalue().splitlines())
+        return errors
+
+    return send
+
+
+def _sender(frontend: str):
+    """
+    Return a function applying a chunk of records through a local front
+    end and returning how many were refused.
+    """
+    import operations
+
+    if frontend == "interactive":
+        return _interactive_sender()
+    if frontend == "inprocess":
+        apply = operations.apply
+        return lambda chunk: sum(apply(*r).status != operations.OK for r in chunk)
+    return lambda chunk: sum(r.status != operations.OK for r in operations.apply_batch(chunk))
+
+
+def _request_line(record: tuple) -> str:
+    """
+    Encode a record as a `server` request line.
+    """
+    if len(record) > 3:
+        op, source, amount, target = record[:4]
+        return f"{op} {source} {target} {amount}"
+    return " ".join(v for v in record if v is not None)
+
+
+def _record(latency: metrics.Histogram, due: list[int], done: int) -> None:
+    """
+    Record the latency of every operation of a chunk completed at `done`.
+    """
+    for d in due:
+        latency.record(done - d)
+
+
+async def _replay_network(records: list[tuple], rate: float | None, depth: int,
+                          host: str, port: int, connections: int) -> ReplayReport:
+    """
+    Replay records against a server, in pipelined windows spread round-robin over connections.
+    """
+    import client
+
+    lines = [_request_line(r) for r in records]
+    windows = [range(i, min(i + depth, len(lines))) for i in range(0, len(lines), depth)]
+    latency = metrics.Histogram()
+    errors = 0
+    clients = [await client.Client.connect(host, port) for _ in range(max(1, connections))]
+    start = time.perf_counter_ns()
+
+    async def worker(n: int) -> None:
+        nonlocal errors
+        for window in windows[n::len(clients)]:
+            if rate is None:
+                due = [time.perf_counter_ns()] * len(window)
+            else:
+                due = [start + int(i * 1e9 / rate) for i in window]
+                delay = (due[-1] - time.perf_counter_ns()) / 1e9
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            responses = await clients[n].pipeline([lines[i] for i in window])
+            _record(latency, due, time.perf_counter_ns())
+            errors += sum(1 for r in responses if r.startswith("ERR"))
+
+    try:
+        await asyncio.gather(*(worker(n) for n in range(len(clients))))
+    finally:
+        for c in clients:
+            await c.close()
+    return ReplayReport("network", len(lines), errors, (time.perf_counter_ns() - start) / 1e9, latency)
+
+
+def replay(records: Iterable[tuple], frontend: str = "batch", rate: float | None = None,
+           batch: int = BATCH_SIZE, host: str = "127.0.0.1", port: int = 7070,
+           connections: int = 1) -> ReplayReport:
+    """
+    Drive a front end with a stream at a target rate.
+    Args:
+        records (Iterable[tuple]): The records, as yielded by `generate`.
+        frontend (str): One of `FRONTENDS`.
+        rate (float | None): Target rate in operations per second, or None
+                             to send as fast as the front end takes them.
+        batch (int): Operations per batch ("batch") or pipelined window ("network").
+        host (str): The server address ("network").
+        port (int): The server port ("network").
+        connections (int): Concurrent connections ("network").
+    Returns:
+        ReplayReport: Counts, duration and latencies.
+    Raises:
+        ValueError: If the front end, rate or batch size is invalid.
+    """
+    if frontend not in FRONTENDS:
+        raise ValueError(f"Unknown front end {frontend!r}; expected one of {', '.join(FRONTENDS)}.")
+    if (rate is not None and rate <= 0) or batch < 1:
+        raise ValueError("The rate and batch size must be positive.")
+    records = list(records)
+    if frontend == "network":
+        return asyncio.run(_replay_network(records, rate, batch, host, port, connections))
+    send = _sender(frontend)
+    size = batch if frontend == "batch" else 1
+    latency = metrics.Histogram()
+    errors = 0
+    clock = time.perf_counter_ns
+    start = clock()
+    for i in range(0, len(records), size):
+        chunk = records[i:i + size]
+        if rate is None:
+            due = [clock()] * len(chunk)
+        else:
+            due = [start + int(j * 1e9 / rate) for j in range(i, i + len(chunk))]
+            delay = (due[-1] - clock()) / 1e9
+            if delay > 0:
+                time.sleep(delay)
+        errors += send(chunk)
+        _record(latency, due, clock())
+    return ReplayReport(frontend, len(records), errors, (clock() - start) / 1e9, latency)
+
+
+def format_report(report: ReplayReport) -> str:
+    """
+    Return a one-line summary of a replay: throughput and latency percentiles.
+    """
+    quantiles = " ".join(f"p{q * 100:g}={report.latency.quantile(q) / 1e6:.3f}ms"
+                         for q in metrics.QUANTILES)
+    return (f"{report.frontend}: {report.requests} operations ({report.errors} refused) "
+            f"in {report.seconds:.2f}s ({report.rate:.0f} ops/s); latency {quantiles}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    """
+    Generate or replay a workload from the command line.
+    Args:
+        argv (list[str] | None): Command-line arguments (defaults to sys.argv).
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Synthetic workload generator and replayer.")
+    parser.add_argument("--journal", help="replay against a journaled store (local front ends)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    gen = commands.add_parser("generate", help="write a seeded synthetic stream as CSV")
+    gen.add_argument("--count", type=int, default=100000)
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument("--accounts", type=int, default=1000)
+    gen.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of the accounts (0 = uniform)")
+    gen.add_argument("--mix", type=parse_mix, default=None, help="op weights, e.g. TOTAL=20,CREDIT=80")
+    gen.add_argument("--amounts", default=AMOUNTS, help="fixed:A, uniform:LOW:HIGH or lognormal:MU:SIGMA")
+    gen.add_argument("-o", "--output", required=True)
+    rep = commands.add_parser("replay", help="drive a front end with a stream and report latencies")
+    rep.add_argument("path")
+    rep.add_argument("--frontend", choices=FRONTENDS, default="batch")
+    rep.add_argument("--rate", type=float, default=None, help="target operations per second")
+    rep.add_argument("--batch", type=int, default=BATCH_SIZE, help="batch or pipelined window size")
+    rep.add_argument("--host", default="127.0.0.1")
+    rep.add_argument("--port", type=int, default=7070)
+    rep.add_argument("--connections", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        n = write(args.output, generate(args.count, args.seed, args.accounts, args.skew,
+                                        args.mix, args.amounts))
+        print(f"Wrote {n} operations to {args.output}")
+        return
+    records = read(args.path)
+    if args.journal:
+        data.open_journal(args.journal)
+    try:
+        report = replay(records, args.frontend, args.rate, args.batch, args.host, args.port,
+                        args.connections)
+    finally:
+        if args.journal:
+            data.close_journal()
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()